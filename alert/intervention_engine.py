@@ -4,29 +4,37 @@ Scans all customers and prints prioritised intervention recommendations.
 Compliant, no emojis, production-grade console output.
 
 Reads from Redis (populated by feature_engine) and uses policy_templates.json.
+
+Run:  python alert/intervention_engine.py
 """
-import redis
 import json
 import time
 import os
+import sys
 from datetime import datetime
 
-r = redis.Redis(host="localhost", port=6379, decode_responses=True)
-
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 POLICY_PATH = os.path.join(BASE_DIR, "risk", "policy_templates.json")
 
-try:
-    with open(POLICY_PATH, "r", encoding="utf-8") as f:
-        POLICIES = json.load(f)
-except Exception:
-    POLICIES = {}
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+sys.path.insert(0, os.path.join(BASE_DIR, "features"))
+from metrics import start_metrics
+from redis_store import get_store, customer_key
+from profile_codec import decode_profile
+
+# ── Policy templates (loaded on first use) ──
+_policy_cache = None
 
-print("=" * 60)
-print("   EQUILIBRATE — Intervention Engine v3.0")
-print("   Monitoring customer risk in real-time...")
-print("=" * 60)
-print()
+
+def _load_policies():
+    global _policy_cache
+    if _policy_cache is None:
+        try:
+            with open(POLICY_PATH, "r", encoding="utf-8") as f:
+                _policy_cache = json.load(f)
+        except Exception:
+            _policy_cache = {}
+    return _policy_cache
 
 
 def get_risk_factors(profile):
@@ -72,72 +80,90 @@ def get_risk_factors(profile):
 
 def get_policy_action(hardship_type, risk_level):
     """Look up the approved action from policy templates."""
-    hardship_key = hardship_type if hardship_type in POLICIES else "NONE"
-    policy = POLICIES.get(hardship_key, {}).get(risk_level, {})
+    policies = _load_policies()
+    hardship_key = hardship_type if hardship_type in policies else "NONE"
+    policy = policies.get(hardship_key, {}).get(risk_level, {})
     return policy.get("action", "Continue monitoring")
 
 
-cycle = 0
-
-while True:
-    cycle += 1
-    customers = r.keys("customer:*")
-    now = datetime.now().strftime("%H:%M:%S")
-
-    counts = {"HIGH": 0, "MEDIUM": 0, "LOW": 0}
-    hardship_counts = {}
-
-    print(f"\n{'=' * 60}")
-    print(f"   SCAN #{cycle} | Time: {now} | Customers: {len(customers)}")
-    print(f"{'=' * 60}")
-
-    for cust in customers:
-        profile = r.hgetall(cust)
-        if not profile:
-            continue
-
-        risk_level = profile.get("risk_level", "LOW")
-        risk_score = int(profile.get("risk_score", 0))
-        hardship = profile.get("hardship_type", "NONE")
-        persona = profile.get("persona", "UNKNOWN")
-
-        counts[risk_level] = counts.get(risk_level, 0) + 1
-
-        if hardship != "NONE":
-            hardship_counts[hardship] = hardship_counts.get(hardship, 0) + 1
-
-        # Only print details for HIGH and MEDIUM risk customers
-        if risk_level in ("HIGH", "MEDIUM"):
-            factors = get_risk_factors(profile)
-            action = get_policy_action(hardship, risk_level)
-
-            level_tag = f"[{risk_level}]"
-            print(f"\n  +--- {level_tag:>8} | {cust} | Score: {risk_score}/10 | "
-                  f"Hardship: {hardship.replace('_', ' ').title()}")
-            print(f"  |  Persona: {persona.replace('_', ' ').title()}")
-
-            if factors:
-                print(f"  |  Risk Factors:")
-                for f_text in factors:
-                    print(f"  |    - {f_text}")
-
-            print(f"  |  Recommended Action: {action}")
-            print(f"  +{'─' * 55}")
-
-    total = len(customers)
-    h_pct = 100 * counts.get("HIGH", 0) / total if total else 0
-    m_pct = 100 * counts.get("MEDIUM", 0) / total if total else 0
-    l_pct = 100 * counts.get("LOW", 0) / total if total else 0
-
-    print(f"\n  +{'=' * 44}+")
-    print(f"  |  HIGH:   {counts.get('HIGH', 0):>4}  ({h_pct:.1f}%)  |  "
-          f"MEDIUM: {counts.get('MEDIUM', 0):>4}  ({m_pct:.1f}%)  |")
-    print(f"  |  LOW:    {counts.get('LOW', 0):>4}  ({l_pct:.1f}%)  |  "
-          f"TOTAL:  {total:>4}           |")
-    print(f"  +{'=' * 44}+")
-
-    if hardship_counts:
-        h_str = " | ".join(f"{k.replace('_', ' ').title()}: {v}" for k, v in sorted(hardship_counts.items()))
-        print(f"  Hardship: {h_str}")
-
-    time.sleep(10)
+def main():
+    print("=" * 60)
+    print("   EQUILIBRATE — Intervention Engine v3.0")
+    print("   Monitoring customer risk in real-time...")
+    print("=" * 60)
+    print()
+
+    store = get_store()
+    metrics = start_metrics("intervention_engine")
+    cycle = 0
+    while True:
+        cycle += 1
+        t0 = time.perf_counter()
+        customers = list(store.scan())
+        now = datetime.now().strftime("%H:%M:%S")
+
+        counts = {"HIGH": 0, "MEDIUM": 0, "LOW": 0}
+        hardship_counts = {}
+
+        print(f"\n{'=' * 60}")
+        print(f"   SCAN #{cycle} | Time: {now} | Customers: {len(customers)}")
+        print(f"{'=' * 60}")
+
+        for cid, profile in zip(customers, store.batch_get(customers)):
+            cust = customer_key(cid)
+            if not profile:
+                continue
+            profile = decode_profile(profile)
+
+            risk_level = profile.get("risk_level", "LOW")
+            risk_score = int(profile.get("risk_score", 0))
+            hardship = profile.get("hardship_type", "NONE")
+            persona = profile.get("persona", "UNKNOWN")
+
+            counts[risk_level] = counts.get(risk_level, 0) + 1
+
+            if hardship != "NONE":
+                hardship_counts[hardship] = hardship_counts.get(hardship, 0) + 1
+
+            # Only print details for HIGH and MEDIUM risk customers
+            if risk_level in ("HIGH", "MEDIUM"):
+                factors = get_risk_factors(profile)
+                action = get_policy_action(hardship, risk_level)
+
+                level_tag = f"[{risk_level}]"
+                print(f"\n  +--- {level_tag:>8} | {cust} | Score: {risk_score}/10 | "
+                      f"Hardship: {hardship.replace('_', ' ').title()}")
+                print(f"  |  Persona: {persona.replace('_', ' ').title()}")
+
+                if factors:
+                    print(f"  |  Risk Factors:")
+                    for f_text in factors:
+                        print(f"  |    - {f_text}")
+
+                print(f"  |  Recommended Action: {action}")
+                print(f"  +{'─' * 55}")
+
+        total = len(customers)
+        metrics.observe("scan", time.perf_counter() - t0)
+        metrics.inc("scans")
+        metrics.inc("interventions", counts.get("HIGH", 0) + counts.get("MEDIUM", 0))
+        h_pct = 100 * counts.get("HIGH", 0) / total if total else 0
+        m_pct = 100 * counts.get("MEDIUM", 0) / total if total else 0
+        l_pct = 100 * counts.get("LOW", 0) / total if total else 0
+
+        print(f"\n  +{'=' * 44}+")
+        print(f"  |  HIGH:   {counts.get('HIGH', 0):>4}  ({h_pct:.1f}%)  |  "
+              f"MEDIUM: {counts.get('MEDIUM', 0):>4}  ({m_pct:.1f}%)  |")
+        print(f"  |  LOW:    {counts.get('LOW', 0):>4}  ({l_pct:.1f}%)  |  "
+              f"TOTAL:  {total:>4}           |")
+        print(f"  +{'=' * 44}+")
+
+        if hardship_counts:
+            h_str = " | ".join(f"{k.replace('_', ' ').title()}: {v}" for k, v in sorted(hardship_counts.items()))
+            print(f"  Hardship: {h_str}")
+
+        time.sleep(10)
+
+
+if __name__ == "__main__":
+    main()
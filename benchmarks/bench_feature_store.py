@@ -0,0 +1,123 @@
+"""
+Equilibrate — Feature Store Backend Benchmark
+Compares memory / sqlite / redis backends on the same workload:
+
+  put          single-profile writes
+  get          single-profile reads
+  batch_get    pipelined reads (1,000 per batch)
+  batch_update pipelined writes (1,000 per batch)
+  cas          compare_and_set on txn_count
+  pipeline     update_customer_features over recorded transactions
+
+The redis backend is skipped when no server is reachable.
+
+Run:  python benchmarks/bench_feature_store.py [--customers 5000] [--txns 5000]
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for d in ("config", "storage", "risk", "features"):
+    sys.path.insert(0, os.path.join(BASE_DIR, d))
+
+from redis_store import MemoryFeatureStore, SQLiteFeatureStore, RedisFeatureStore, set_store
+import customer_features
+
+TXN_CSV = os.path.join(BASE_DIR, "data", "transactions_raw.csv")
+
+SAMPLE_PROFILE = {
+    "txn_count": "12", "total_spend": "18250.0", "withdrawals": "3", "salary_count": "1",
+    "last_salary_date": "2026-02-17 10:00:00", "essential_spend": "9100.0",
+    "discretionary_spend": "9150.0", "atm_withdrawals_7d": "3", "txn_frequency_7d": "12",
+    "spending_change_pct": "-12.5", "days_since_salary": "4", "hardship_type": "NONE",
+    "risk_score": "1", "risk_level": "LOW", "recommended_action": "Continue standard monitoring",
+    "persona": "STABLE", "last_updated": "2026-02-18 09:14:39", "first_seen": "2026-02-17 09:00:00",
+}
+
+
+def _rate(n, seconds):
+    return n / seconds if seconds > 0 else float("inf")
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def _load_transactions(limit):
+    with open(TXN_CSV, "r", newline="", encoding="utf-8") as f:
+        rows = []
+        for row in csv.DictReader(f):
+            rows.append(row)
+            if len(rows) >= limit:
+                break
+    return rows
+
+
+def bench_store(store, n_customers, txns):
+    ids = [f"bench{i}" for i in range(n_customers)]
+    results = {}
+
+    results["put"] = _rate(n_customers, _timed(lambda: [store.put(c, SAMPLE_PROFILE) for c in ids]))
+    results["get"] = _rate(n_customers, _timed(lambda: [store.get(c) for c in ids]))
+    results["batch_get"] = _rate(n_customers, _timed(lambda: store.batch_get(ids)))
+    results["batch_update"] = _rate(
+        n_customers, _timed(lambda: store.batch_update({c: SAMPLE_PROFILE for c in ids}))
+    )
+    results["cas"] = _rate(
+        n_customers,
+        _timed(lambda: [store.compare_and_set(c, "txn_count", "12", {"txn_count": "12"}) for c in ids]),
+    )
+    store.delete(ids)
+
+    # Replay under a bench- prefix so a live Redis book is never touched
+    txns = [dict(t, customer_id=f"bench-{t['customer_id']}") for t in txns]
+    set_store(store)
+    results["pipeline"] = _rate(len(txns), _timed(
+        lambda: [customer_features.update_customer_features(t, store=store, snapshot=False) for t in txns]
+    ))
+    store.delete({t["customer_id"] for t in txns})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feature store backend throughput")
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--txns", type=int, default=5000)
+    args = parser.parse_args()
+
+    txns = _load_transactions(args.txns)
+    tmp = tempfile.mkdtemp(prefix="eq-bench-")
+    backends = [
+        ("memory", MemoryFeatureStore),
+        ("sqlite", lambda: SQLiteFeatureStore(os.path.join(tmp, "store.db"))),
+        ("redis", RedisFeatureStore),
+    ]
+
+    print("=" * 72)
+    print(f"  EQUILIBRATE — Feature Store Benchmark "
+          f"({args.customers:,} customers, {len(txns):,} transactions)")
+    print("=" * 72)
+    ops = ["put", "get", "batch_get", "batch_update", "cas", "pipeline"]
+    print(f"  {'backend':<8}" + "".join(f"{op:>13}" for op in ops) + "   (ops/s)")
+
+    for name, factory in backends:
+        try:
+            store = factory()
+            if name == "redis":
+                store.r.ping()
+        except Exception as e:
+            print(f"  {name:<8} SKIP ({e.__class__.__name__}: {e})")
+            continue
+        results = bench_store(store, args.customers, txns)
+        print(f"  {name:<8}" + "".join(f"{results[op]:>13,.0f}" for op in ops))
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Equilibrate — Profile Encoding Benchmark
+Compares the hash and packed profile encodings (features/profile_codec.py)
+over synthetic customer profiles:
+
+  bytes/customer   field names + values as sent to the store
+  encode / decode  microseconds per profile (decode_profile is what every
+                   reader calls)
+
+Profiles are generated and measured in chunks, so 1M customers run in
+constant memory. With --redis N, N sample profiles per encoding are also
+written under a bench- prefix and sized with MEMORY USAGE (the real
+per-key footprint including Redis overhead), then deleted.
+
+Run:  python benchmarks/bench_profile_codec.py [--customers 1000000] [--redis 1000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for d in ("config", "storage", "risk", "features"):
+    sys.path.insert(0, os.path.join(BASE_DIR, d))
+
+from profile_codec import decode_profile, encode_profile
+from customer_features import FEATURE_FIELDS, _new_profile
+
+CHUNK = 10_000
+ENCODINGS = ("hash", "packed")
+PERSONAS = ("STABLE", "SALARY_DELAY", "OVERSPENDER", "CASH_HEAVY", "GIG_WORKER")
+
+
+def synthetic_profile(rng, now_ts):
+    """A plausible steady-state profile with partly filled rolling windows."""
+    p = _new_profile(rng.choice(PERSONAS), "2026-02-18 09:14:39")
+    n_txn = rng.randint(5, 200)
+    n_atm = rng.randint(0, min(n_txn, 40))
+    p.update({
+        "txn_count": rng.randint(n_txn, 5000),
+        "total_spend": round(rng.uniform(1e3, 5e5), 2),
+        "essential_spend": round(rng.uniform(1e3, 2e5), 2),
+        "discretionary_spend": round(rng.uniform(1e3, 2e5), 2),
+        "withdrawals": rng.randint(0, 300),
+        "salary_count": rng.randint(0, 24),
+        "days_since_salary": rng.randint(-1, 60),
+        "atm_withdrawals_7d": n_atm,
+        "txn_frequency_7d": n_txn,
+        "spending_change_pct": round(rng.uniform(-80, 200), 1),
+        "risk_score": rng.randint(0, 10),
+        "_txn_timestamps": sorted(now_ts - rng.uniform(0, 604800) for _ in range(n_txn)),
+        "_atm_timestamps": sorted(now_ts - rng.uniform(0, 604800) for _ in range(n_atm)),
+        "_spend_history": [round(rng.uniform(10, 25000), 2) for _ in range(30)],
+    })
+    return p
+
+
+def _payload_bytes(mapping):
+    total = 0
+    for k, v in mapping.items():
+        total += len(k) + len(v if isinstance(v, bytes) else v.encode("utf-8"))
+    return total
+
+
+def run_chunk(profiles, stats):
+    for encoding in ENCODINGS:
+        t0 = time.perf_counter()
+        encoded = [encode_profile(p, FEATURE_FIELDS, encoding) for p in profiles]
+        t1 = time.perf_counter()
+        for raw in encoded:
+            decode_profile(raw)
+        t2 = time.perf_counter()
+        s = stats[encoding]
+        s["bytes"] += sum(_payload_bytes(m) for m in encoded)
+        s["fields"] += sum(len(m) for m in encoded)
+        s["encode"] += t1 - t0
+        s["decode"] += t2 - t1
+
+
+def redis_memory_usage(n, rng, now_ts):
+    """Average MEMORY USAGE per key for each encoding, or None without Redis."""
+    try:
+        from redis_client import get_redis
+        r = get_redis(decode_responses=False)
+        r.ping()
+    except Exception as e:
+        print(f"  [Redis] SKIP ({e.__class__.__name__}: {e})")
+        return None
+
+    profiles = [synthetic_profile(rng, now_ts) for _ in range(n)]
+    usage = {}
+    for encoding in ENCODINGS:
+        keys = [f"bench-codec:{encoding}:{i}" for i in range(n)]
+        pipe = r.pipeline(transaction=False)
+        for key, p in zip(keys, profiles):
+            pipe.hset(key, mapping=encode_profile(p, FEATURE_FIELDS, encoding))
+        pipe.execute()
+        pipe = r.pipeline(transaction=False)
+        for key in keys:
+            pipe.memory_usage(key, samples=0)
+        usage[encoding] = sum(pipe.execute()) / n
+        r.delete(*keys)
+    return usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hash vs packed profile encoding")
+    parser.add_argument("--customers", type=int, default=1_000_000)
+    parser.add_argument("--redis", type=int, default=0, metavar="N",
+                        help="also measure MEMORY USAGE over N sample keys per encoding")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now_ts = time.time()
+    stats = {e: {"bytes": 0, "fields": 0, "encode": 0.0, "decode": 0.0} for e in ENCODINGS}
+
+    print("=" * 72)
+    print(f"  EQUILIBRATE — Profile Encoding Benchmark ({args.customers:,} customers)")
+    print("=" * 72)
+
+    done = 0
+    while done < args.customers:
+        n = min(CHUNK, args.customers - done)
+        run_chunk([synthetic_profile(rng, now_ts) for _ in range(n)], stats)
+        done += n
+        print(f"  [Bench] {done:,}/{args.customers:,}", end="\r")
+    print()
+
+    n = max(args.customers, 1)
+    print(f"  {'encoding':<10}{'bytes/cust':>12}{'fields':>8}{'encode us':>12}"
+          f"{'decode us':>12}{'total MB':>12}")
+    for encoding in ENCODINGS:
+        s = stats[encoding]
+        print(f"  {encoding:<10}{s['bytes'] / n:>12,.0f}{s['fields'] / n:>8.1f}"
+              f"{s['encode'] / n * 1e6:>12.1f}{s['decode'] / n * 1e6:>12.1f}"
+              f"{s['bytes'] / 1e6:>12,.1f}")
+    ratio = stats["hash"]["bytes"] / max(stats["packed"]["bytes"], 1)
+    print(f"\n  packed is {ratio:.1f}x smaller on the wire")
+
+    if args.redis:
+        usage = redis_memory_usage(args.redis, rng, now_ts)
+        if usage:
+            print(f"\n  Redis MEMORY USAGE ({args.redis:,} keys per encoding):")
+            for encoding in ENCODINGS:
+                est = usage[encoding] * args.customers / 1e6
+                print(f"  {encoding:<10}{usage[encoding]:>12,.0f} B/key   "
+                      f"~{est:,.0f} MB at {args.customers:,} customers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+"""
+Equilibrate — Pipeline Benchmark Suite
+Times the hot paths on an in-process store, writes the results to JSON and
+compares them with a stored baseline:
+
+  features.update_per_txn         update_customer_features(), recorded transactions
+  features.update_batch           update_customer_features_batch(), 500 per call
+  risk.evaluate_customer          one customer re-scored and written back
+  risk.scan_portfolio[N]          full-portfolio rescan (risk monitor pass)
+  dashboard.fetch_all_customers[N]  portfolio DataFrame build, without the Streamlit cache
+  snapshot.write                  snapshot rows appended (temporary CSV)
+  policy.message                  get_policy_message() across every template
+  producer.generate               generate_transaction() + trace sampling
+
+Portfolios of N customers (--sizes, default 5k/100k/1M) are seeded from
+real profiles built by replaying data/transactions_raw.csv. Randomness is
+seeded (--seed), so runs differ only by machine noise. Each case reports
+the best of --repeat runs (one run for portfolios over 100k); the
+committed baseline is recorded with --repeat 5, and --repeat defaults to
+the baseline's so both sides are minima over as many runs. Cases whose
+baseline took under SHORT_CASE seconds get twice the tolerance.
+
+Results go to benchmarks/results/bench-<timestamp>.json and are compared
+on ops/s with the committed baseline (--baseline, default
+benchmarks/baseline.json). The run exits with status 1 when any case is
+more than --tolerance slower, or when there is no baseline to compare
+against. To move the baseline (new machine, intended speed change), run
+with --save-baseline --repeat 5 on a quiet machine and commit
+benchmarks/baseline.json with the change that explains it. The baseline
+stores the machine and run settings next to the numbers, and a run
+recorded on a different setup lists the differences.
+
+The memory store is the default. --store sqlite uses a temporary file;
+--store fakeredis needs the fakeredis package (with lupa for the CAS
+script); --store redis uses the configured server, so point
+EQ_REDIS_DB at a scratch database: portfolio cases scan everything in it.
+
+Run:  python benchmarks/bench_suite.py [--sizes 5000,100000] [--save-baseline]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for d in ("config", "storage", "risk", "features", "kafka", "dashboard"):
+    sys.path.insert(0, os.path.join(BASE_DIR, d))
+
+from redis_store import MemoryFeatureStore, RedisFeatureStore, SQLiteFeatureStore, set_store
+from replay_transactions import TXN_CSV, read_transactions, to_message
+import customer_features
+import customer_snapshot_writer
+import policy_engine
+import risk_engine
+import transaction_producer
+from customer_data import build_customer_frame, load_static_customers
+from profile_codec import decode_profile
+from settings import get_setting
+from tracing import stamp
+
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmarks", "results")
+BASELINE_PATH = os.path.join(BASE_DIR, "benchmarks", "baseline.json")
+BATCH = 500
+SEED_CHUNK = 10_000
+SHORT_CASE = 0.5  # seconds: cases quicker than this get twice the tolerance (timer and scheduler noise)
+
+
+def _label(n):
+    return f"{n // 1_000_000}M" if n >= 1_000_000 and n % 1_000_000 == 0 else f"{n // 1000}k"
+
+
+def make_store(kind):
+    if kind == "memory":
+        return MemoryFeatureStore()
+    if kind == "sqlite":
+        return SQLiteFeatureStore(os.path.join(tempfile.mkdtemp(prefix="eq-bench-"), "bench.db"))
+    if kind == "fakeredis":
+        import fakeredis  # optional, only for this backend
+        return RedisFeatureStore(client=fakeredis.FakeRedis())
+    return RedisFeatureStore()
+
+
+def _clear(store):
+    store.delete(list(store.scan()))
+
+
+def _best(fn, repeat):
+    """(ops, best seconds) over `repeat` runs of fn() -> ops; fn may return (ops, seconds)."""
+    best, ops = None, 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - t0
+        ops, elapsed = out if isinstance(out, tuple) else (out, elapsed)
+        best = elapsed if best is None else min(best, elapsed)
+    return ops, best
+
+
+# ═══════════════════════════════════════════════════════════════
+# CASES
+# ═══════════════════════════════════════════════════════════════
+
+def bench_updates(args, txns):
+    def per_txn():
+        store = _fresh(args)
+        t0 = time.perf_counter()
+        for txn in txns:
+            customer_features.update_customer_features(txn, snapshot=False)
+        elapsed = time.perf_counter() - t0
+        _clear(store)
+        return len(txns), elapsed
+
+    def batched():
+        store = _fresh(args)
+        t0 = time.perf_counter()
+        for i in range(0, len(txns), BATCH):
+            customer_features.update_customer_features_batch(txns[i:i + BATCH], snapshot=False)
+        elapsed = time.perf_counter() - t0
+        _clear(store)
+        return len(txns), elapsed
+
+    yield "features.update_per_txn", per_txn, args.repeat
+    yield "features.update_batch", batched, args.repeat
+
+
+def build_variants(txns):
+    """Profiles as stored after replaying txns: the seed pool for portfolios."""
+    store = set_store(MemoryFeatureStore())
+    for i in range(0, len(txns), BATCH):
+        customer_features.update_customer_features_batch(txns[i:i + BATCH], snapshot=False)
+    ids = list(store.scan())
+    return [mapping for mapping in store.batch_get(ids) if mapping]
+
+
+def seed_portfolio(store, variants, n):
+    for start in range(0, n, SEED_CHUNK):
+        store.batch_update({f"bench{i}": variants[i % len(variants)]
+                            for i in range(start, min(n, start + SEED_CHUNK))})
+
+
+def bench_risk(args, variants):
+    store = _fresh(args)
+    seed_portfolio(store, variants, len(variants))
+    ids = list(store.scan())
+
+    def evaluate():
+        for cid in ids:
+            risk_engine.evaluate_customer(cid, store)
+        return len(ids)
+
+    yield "risk.evaluate_customer", evaluate, args.repeat
+    _clear(store)
+
+
+def bench_portfolios(args, variants):
+    static_pool = list(load_static_customers().values()) or [{}]
+    for n in args.sizes:
+        fetch_name = f"dashboard.fetch_all_customers[{_label(n)}]"
+        scan_name = f"risk.scan_portfolio[{_label(n)}]"
+        if not (args.wanted(fetch_name) or args.wanted(scan_name)):
+            continue  # don't seed a portfolio nobody measures
+        store = _fresh(args)
+        print(f"  [Bench] Seeding {n:,} customers...")
+        seed_portfolio(store, variants, n)
+        static = {f"bench{i}": static_pool[i % len(static_pool)] for i in range(n)}
+        repeat = args.repeat if n <= 100_000 else 1
+
+        def fetch():
+            return len(build_customer_frame(store, static))
+
+        def scan():
+            return risk_engine.scan_portfolio(store)[0]
+
+        yield fetch_name, fetch, repeat
+        yield scan_name, scan, repeat
+        del static
+        _clear(store)
+
+
+def bench_snapshots(args, variants):
+    n = min(args.snapshots, len(variants))
+    profiles = [decode_profile(mapping) for mapping in variants[:n]]
+    tmp = tempfile.mkdtemp(prefix="eq-bench-")
+    customer_snapshot_writer._load_static_data()  # loaded once per process, not per row
+    path = customer_snapshot_writer.HISTORY_CSV
+
+    def write():
+        customer_snapshot_writer._last_write_time.clear()  # every row passes the cooldown
+        customer_snapshot_writer.HISTORY_CSV = os.path.join(tmp, "customer_history.csv")
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")  # one console line per row
+        try:
+            for i in range(n):
+                customer_snapshot_writer.write_customer_snapshot(f"bench{i}", profile=profiles[i])
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+            customer_snapshot_writer.HISTORY_CSV = path
+        return n
+
+    yield "snapshot.write", write, args.repeat
+
+
+def bench_policy(args):
+    policies = policy_engine._load_policies()
+    combos = [(h, level) for h, levels in policies.items() if not h.startswith("_") for level in levels]
+
+    def messages():
+        for i in range(args.calls):
+            hardship, level = combos[i % len(combos)]
+            policy_engine.get_policy_message(hardship, level, customer_id=i, ref_id=f"REF{i}")
+        return args.calls
+
+    yield "policy.message", messages, args.repeat
+
+
+def bench_producer(args):
+    customers = transaction_producer.load_customers().to_dict("records")
+
+    def generate():
+        random.seed(args.seed)
+        for i in range(args.calls):
+            stamp(transaction_producer.generate_transaction(customers[i % len(customers)]))
+        return args.calls
+
+    yield "producer.generate", generate, args.repeat
+
+
+def _fresh(args):
+    store = set_store(make_store(args.store))
+    _clear(store)
+    return store
+
+
+# ═══════════════════════════════════════════════════════════════
+# REPORT
+# ═══════════════════════════════════════════════════════════════
+
+def _cpu_model():
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def _environment_diff(current, recorded):
+    """Environment keys (other than the commit) that differ from the baseline's."""
+    return [(key, recorded.get(key), value) for key, value in current.items()
+            if key != "commit" and recorded.get(key) != value]
+
+
+def _environment(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_model": _cpu_model(),
+        "cpus": os.cpu_count(),
+        "store": args.store,
+        "profile_encoding": get_setting("store", "profile_encoding", "hash"),
+        "seed": args.seed,
+        "repeat": args.repeat,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print each case against the baseline; returns the names that regressed.
+
+    A case whose baseline run took under SHORT_CASE seconds is allowed
+    twice the tolerance.
+    """
+    regressions = []
+    print(f"  {'case':<38}{'ops/s':>12}{'us/op':>10}{'baseline':>12}{'change':>9}")
+    for name, r in results.items():
+        base = baseline.get(name, {}).get("ops_per_sec")
+        change = (r["ops_per_sec"] / base - 1) if base else None
+        allowed = tolerance * (2 if baseline.get(name, {}).get("seconds", 0) < SHORT_CASE else 1)
+        flag = ""
+        if change is not None and change < -allowed:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"  {name:<38}{r['ops_per_sec']:>12,.0f}{r['us_per_op']:>10.1f}"
+              + (f"{base:>12,.0f}{100 * change:>+8.1f}%" if base else f"{'-':>12}{'':>9}") + flag)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline hot paths")
+    parser.add_argument("--store", choices=("memory", "sqlite", "fakeredis", "redis"), default="memory")
+    parser.add_argument("--sizes", default="5000,100000,1000000", help="portfolio sizes (customers)")
+    parser.add_argument("--txns", type=int, default=20_000, help="recorded transactions to replay")
+    parser.add_argument("--snapshots", type=int, default=5_000)
+    parser.add_argument("--calls", type=int, default=100_000, help="policy / producer calls")
+    parser.add_argument("--repeat", type=int, default=None,
+                        help="runs per case, best taken (default: the baseline's, else 3)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", default="", help="comma-separated case name prefixes")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="also write the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    baseline, recorded_env = {}, {}
+    missing_baseline = not args.save_baseline and not os.path.exists(args.baseline)
+    if not args.save_baseline and not missing_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+        baseline, recorded_env = stored.get("results", {}), stored.get("environment", {})
+    if args.repeat is None:
+        args.repeat = recorded_env.get("repeat", 3)
+    args.sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    only = tuple(p.strip() for p in args.only.split(",") if p.strip())
+    args.wanted = lambda name: not only or name.startswith(only)
+
+    random.seed(args.seed)
+    txns = [to_message(t) for t in read_transactions([TXN_CSV], limit=args.txns)]
+
+    print("=" * 72)
+    print(f"  EQUILIBRATE — Pipeline Benchmark Suite ({args.store} store, {len(txns):,} transactions)")
+    print("=" * 72)
+
+    variants = build_variants(txns)
+    groups = [
+        lambda: bench_updates(args, txns),
+        lambda: bench_risk(args, variants),
+        lambda: bench_portfolios(args, variants),
+        lambda: bench_snapshots(args, variants),
+        lambda: bench_policy(args),
+        lambda: bench_producer(args),
+    ]
+    results = {}
+    for group in groups:
+        for name, fn, repeat in group():
+            if not args.wanted(name):
+                continue
+            ops, seconds = _best(fn, repeat)
+            results[name] = {"ops": ops, "seconds": round(seconds, 6),
+                             "ops_per_sec": round(ops / seconds, 1) if seconds else 0.0,
+                             "us_per_op": round(1e6 * seconds / ops, 3) if ops else 0.0}
+            print(f"  [Bench] {name}: {results[name]['ops_per_sec']:,.0f} ops/s")
+
+    report = {"created_at": time.strftime("%Y-%m-%d %H:%M:%S"), "environment": _environment(args),
+              "results": results}
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print("-" * 72)
+    regressions = compare(results, baseline, args.tolerance)
+    print("-" * 72)
+    print(f"  Results: {os.path.relpath(output, BASE_DIR)}")
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"  Baseline saved: {os.path.relpath(args.baseline, BASE_DIR)}")
+    elif missing_baseline:
+        print(f"  [Bench] FAIL: no baseline at {os.path.relpath(args.baseline, BASE_DIR)}, nothing was compared."
+              f" Record one with --save-baseline and commit it.")
+    else:
+        new = [name for name in results if name not in baseline]
+        if new:
+            print(f"  [Bench] {len(new)} case(s) not in the baseline: {', '.join(new)}")
+        print(f"  {len(regressions)} regression(s) beyond {100 * args.tolerance:.0f}% "
+              f"({200 * args.tolerance:.0f}% for cases under {SHORT_CASE}s) "
+              f"against {os.path.relpath(args.baseline, BASE_DIR)}")
+        differences = _environment_diff(report["environment"], recorded_env)
+        if differences:
+            print(f"  [Bench] {'Regressions may not be' if regressions else 'Numbers are not'} comparable;"
+                  f" the baseline was recorded with a different setup:")
+            for key, was, now in differences:
+                print(f"          {key:<17} baseline {was!s:<40} this run {now}")
+    sys.exit(1 if regressions or missing_baseline else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Equilibrate — Transport Benchmark
+Pushes the same recorded transactions through each transport backend and
+through the feature pipeline, to show where the broker adds cost:
+
+  direct    update_customer_features() called in a loop (no transport)
+  memory    in-process broadcast queue
+  redis     Redis Streams (skipped when no server is reachable)
+  kafka     Kafka broker (skipped when kafka-python or the broker is missing)
+
+For each backend: delivery rate with a no-op consumer, end-to-end rate
+with the feature engine on an in-process store, and send -> receive
+latency. Broker backends use the configured wire format
+(EQ_TRANSPORT_WIRE_FORMAT). Messages go to a separate bench topic, never
+"transactions".
+
+Run:  python benchmarks/bench_transport.py [--txns 20000]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for d in ("config", "storage", "risk", "features", "kafka"):
+    sys.path.insert(0, os.path.join(BASE_DIR, d))
+
+from redis_store import MemoryFeatureStore, set_store
+from replay_transactions import TXN_CSV, lag_summary, read_transactions, to_message
+from transport import KafkaTransport, MemoryTransport, RedisStreamTransport
+import customer_features
+
+TOPIC = "bench-transactions"
+
+
+def _rate(n, seconds):
+    return n / seconds if seconds > 0 else float("inf")
+
+
+def run_transport(transport, msgs, apply):
+    """Send msgs through transport to one subscriber. Returns (rate, lags)."""
+    sub = transport.subscribe(TOPIC, group="bench")
+    sub.wait_ready(30)
+    sent_at, lags, done = {}, [], threading.Event()
+
+    def consume():
+        received = 0
+        while received < len(msgs):
+            for msg in sub.poll(timeout_ms=1000):
+                lags.append(time.time() - sent_at[msg["transaction_id"]])
+                apply(msg)
+                received += 1
+        done.set()
+
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    t0 = time.perf_counter()
+    for msg in msgs:
+        sent_at[msg["transaction_id"]] = time.time()
+        transport.send(TOPIC, msg, key=msg["customer_id"])
+    transport.flush()
+    finished = done.wait(timeout=300)
+    elapsed = time.perf_counter() - t0
+    sub.close()
+    if not finished:
+        raise TimeoutError(f"only {len(lags):,}/{len(msgs):,} messages delivered")
+    return _rate(len(msgs), elapsed), lags
+
+
+def _pipeline_apply():
+    store = set_store(MemoryFeatureStore())
+    return lambda txn: customer_features.update_customer_features(txn, store=store, snapshot=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transport backend throughput and latency")
+    parser.add_argument("--input", default=TXN_CSV)
+    parser.add_argument("--txns", type=int, default=20_000)
+    args = parser.parse_args()
+
+    msgs = [to_message(t) for t in read_transactions([args.input], args.txns)]
+
+    print("=" * 72)
+    print(f"  EQUILIBRATE — Transport Benchmark ({len(msgs):,} transactions)")
+    print("=" * 72)
+    print(f"  {'backend':<8}{'deliver/s':>12}{'pipeline/s':>12}   send -> receive latency")
+
+    apply = _pipeline_apply()
+    t0 = time.perf_counter()
+    for msg in msgs:
+        apply(dict(msg))
+    print(f"  {'direct':<8}{'-':>12}{_rate(len(msgs), time.perf_counter() - t0):>12,.0f}")
+
+    backends = [("memory", MemoryTransport), ("redis", RedisStreamTransport), ("kafka", KafkaTransport)]
+    for name, factory in backends:
+        try:
+            transport = factory()
+            if name == "redis":
+                transport.r.ping()
+                transport.r.delete(TOPIC)
+            deliver, lags = run_transport(transport, msgs, lambda _txn: None)
+            pipeline, _ = run_transport(transport, msgs, _pipeline_apply())
+        except Exception as e:
+            print(f"  {name:<8} SKIP ({e.__class__.__name__}: {e})")
+            continue
+        print(f"  {name:<8}{deliver:>12,.0f}{pipeline:>12,.0f}   {lag_summary(lags)}")
+        if name == "redis":
+            transport.r.delete(TOPIC)
+        transport.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Equilibrate — Wire Format Benchmark
+Serializes recorded transactions with the previous JSON path
+(json.dumps/json.loads, as the producer and consumers used) and with each
+kafka/wire_format.py format, and reports message size, encode/decode rate
+and whether every message round-trips exactly.
+
+Run:  python benchmarks/bench_wire_format.py [--txns 100000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for d in ("config", "kafka"):
+    sys.path.insert(0, os.path.join(BASE_DIR, d))
+
+from replay_transactions import TXN_CSV, read_transactions, to_message
+from wire_format import FORMATS, decode_message, encode_message
+
+
+def _timed(fn, items):
+    t0 = time.perf_counter()
+    out = [fn(x) for x in items]
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transaction serialization benchmark")
+    parser.add_argument("--input", default=TXN_CSV)
+    parser.add_argument("--txns", type=int, default=100_000)
+    args = parser.parse_args()
+
+    msgs = [to_message(t) for t in read_transactions([args.input], limit=args.txns)]
+    while msgs and len(msgs) < args.txns:  # short input: repeat it up to --txns
+        msgs.extend(msgs[:args.txns - len(msgs)])
+    msgs = msgs[:args.txns]
+
+    codecs = [("json (before)", lambda v: json.dumps(v).encode("utf-8"), lambda m: json.loads(m.decode("utf-8")))]
+    codecs += [(fmt, lambda v, f=fmt: encode_message(v, f), decode_message) for fmt in FORMATS]
+
+    print("=" * 72)
+    print(f"  EQUILIBRATE — Wire Format Benchmark ({len(msgs):,} transactions)")
+    print("=" * 72)
+    print(f"  {'format':<15}{'bytes/msg':>10}{'encode/s':>12}{'decode/s':>12}{'round-trip':>13}")
+    for name, encode, decode in codecs:
+        encoded, t_enc = _timed(encode, msgs)
+        decoded, t_dec = _timed(decode, encoded)
+        size = sum(len(b) for b in encoded) / len(encoded)
+        exact = sum(d == m for d, m in zip(decoded, msgs))
+        print(f"  {name:<15}{size:>10.1f}{len(msgs) / t_enc:>12,.0f}{len(msgs) / t_dec:>12,.0f}"
+              f"{exact:>8,}/{len(msgs):,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""
+Equilibrate — Capacity Report
+Measures what one customer and one transaction cost, then extrapolates to
+a target portfolio (default 10M customers at 5,000 TPS) and names the
+resource that runs out first.
+
+Measured on a synthetic portfolio (--customers, default 5,000, each with
+--activity generated transactions; customer attributes cycled from
+data/customers.csv):
+
+  Redis bytes per customer   MEMORY USAGE on a sample of customer:{id}
+                             keys (--server), for the hash and packed
+                             profile encodings and a cold-tier stub; without
+                             a server, estimated from the field sizes and
+                             Redis's hash encodings (marked "est.")
+  snapshot row               bytes per customer_history.csv row
+  raw transaction            bytes per transaction as archive CSV, gzipped
+                             CSV, each wire format, and a Redis stream entry
+  commands per transaction   Redis commands / round-trips per transaction on
+                             the batch path (feature engine, stream processor)
+                             and the per-transaction path, counted on fakeredis;
+                             without it, the redis_budget.py budgets are used
+  CPU per transaction        feature update cost on an in-process store
+  risk scan, dashboard       risk monitor CPU per customer; dashboard frame
+                             build time and DataFrame bytes per customer
+
+Extrapolation (one Redis instance, one feature engine process per core):
+
+  Redis memory     customers x bytes per customer + a full transport stream
+  Redis ops/s      feature updates + continuous risk monitor passes +
+                   dashboard refreshes (full portfolio every --dashboard-refresh s)
+  disk             archive + snapshot rows kept for --retention-days
+  feature CPU      cores needed for the target TPS
+  dashboard memory the portfolio DataFrame held by each dashboard process
+
+Each need is divided by its limit (--redis-memory-gb, --redis-ops,
+--disk-gb, --cores, --dashboard-memory-gb); the highest ratio is the
+limiting resource. Redis memory is before allocator fragmentation; leave
+20-50% headroom on top.
+
+--server uses the configured Redis; keys go under capacity:* in the
+configured database and are deleted afterwards.
+
+Run:  python benchmarks/capacity_report.py [--customers 5000] [--target-customers 10000000] [--target-tps 5000]
+"""
+import argparse
+import contextlib
+import csv
+import gzip
+import io
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for d in ("config", "storage", "risk", "features", "kafka", "dashboard", "benchmarks"):
+    sys.path.insert(0, os.path.join(BASE_DIR, d))
+
+from settings import get_setting
+from command_count import count_commands
+from redis_store import KEY_PREFIX, MemoryFeatureStore, RedisFeatureStore, set_store
+from profile_codec import decode_profile, encode_profile, get_encoding
+from profile_tiering import COLD_MARKER, STUB_FIELDS
+from transactions_consumer import CSV_FIELDS
+from wire_format import FORMATS, encode_message
+
+BATCH = 500
+FIRST_ID = 900_000_000        # synthetic ids stay clear of the real customer book
+RISK_SCAN_PAUSE = 5           # risk_engine sleeps this long between passes
+STREAM_ENTRY_OVERHEAD = 12    # est. bytes per stream entry besides the payload (listpack, id delta)
+GB = 1e9
+
+
+# ═══════════════════════════════════════════════════════════════
+# SYNTHETIC PORTFOLIO
+# ═══════════════════════════════════════════════════════════════
+
+def synthetic_transactions(customers, activity, seed):
+    """activity rounds of one generated transaction per customer (ids from FIRST_ID)."""
+    import transaction_producer
+    book = transaction_producer.load_customers().to_dict("records")
+    random.seed(seed)
+    people = [dict(book[i % len(book)], customer_id=FIRST_ID + i) for i in range(customers)]
+    return [transaction_producer.generate_transaction(c) for _ in range(activity) for c in people]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def build_portfolio(txns):
+    """Replay txns into an in-process store; returns (store, batch µs/txn, single µs/txn)."""
+    import customer_features
+    store = set_store(MemoryFeatureStore())
+
+    def replay():
+        for i in range(0, len(txns), BATCH):
+            customer_features.update_customer_features_batch(txns[i:i + BATCH], store=store, snapshot=False)
+
+    seconds, _ = timed(replay)
+    sample = [dict(t, transaction_id=f"single{i}") for i, t in enumerate(txns[:2000])]
+    single, _ = timed(lambda: [customer_features.update_customer_features(t, store=store, snapshot=False)
+                               for t in sample])
+    return store, 1e6 * seconds / len(txns), 1e6 * single / max(len(sample), 1)
+
+
+# ═══════════════════════════════════════════════════════════════
+# REDIS MEMORY
+# ═══════════════════════════════════════════════════════════════
+
+def _size(value):
+    return len(value) if isinstance(value, bytes) else len(str(value).encode("utf-8"))
+
+
+def estimate_hash_bytes(key, mapping):
+    """Approximate Redis 7 memory for one hash key (default listpack thresholds)."""
+    fields = [(_size(k), _size(v)) for k, v in mapping.items()]
+    key_bytes = _size(key) + 56                          # key sds, robj, main dict entry
+    if len(fields) <= 128 and all(f <= 64 and v <= 64 for f, v in fields):
+        return key_bytes + 16 + 7 + sum(f + v + 4 for f, v in fields)       # listpack
+    return key_bytes + 16 + 64 + sum(f + v + 48 for f, v in fields)         # hashtable
+
+
+def profile_variants(mappings):
+    """{variant: [mapping]} for the hash / packed encodings and the cold-tier stub."""
+    profiles = [decode_profile(m) for m in mappings]
+    import customer_features
+    variants = {enc: [encode_profile(p, customer_features.FEATURE_FIELDS, enc) for p in profiles]
+                for enc in ("hash", "packed")}
+    variants["cold stub"] = [dict({f: m[f] for f in STUB_FIELDS if f in m}, **{COLD_MARKER: "1"})
+                             for m in variants["hash"]]
+    return variants
+
+
+def _memory_usage(client, key):
+    return client.memory_usage(key, samples=0)
+
+
+def measure_redis_bytes(client, variants, ids, stream_payloads):
+    """MEMORY USAGE per customer key and per stream entry; None where the server cannot say."""
+    measured = {}
+    try:
+        for variant, mappings in variants.items():
+            total = 0
+            for i, (cid, mapping) in enumerate(zip(ids, mappings)):
+                key = f"capacity:{i}"
+                client.hset(key, mapping=mapping)
+                # same byte count as the real key name, customer:{id}
+                total += _memory_usage(client, key) + _size(KEY_PREFIX + str(cid)) - _size(key)
+                client.delete(key)
+            measured[variant] = total / len(mappings)
+        for fmt, payloads in stream_payloads.items():
+            key = "capacity:stream"
+            pipe = client.pipeline(transaction=False)
+            for payload in payloads:
+                pipe.xadd(key, {b"v": payload})
+            pipe.execute()
+            measured[f"stream {fmt}"] = _memory_usage(client, key) / len(payloads)
+            client.delete(key)
+    except Exception as e:
+        print(f"  [Capacity] MEMORY USAGE unavailable ({e.__class__.__name__}: {e}); using estimates")
+        for key in client.scan_iter(match="capacity:*"):
+            client.delete(key)
+        return None
+    return measured
+
+
+# ═══════════════════════════════════════════════════════════════
+# ROWS, TRANSACTIONS, COMMANDS, SCANS
+# ═══════════════════════════════════════════════════════════════
+
+def snapshot_row_bytes(store, ids):
+    import customer_snapshot_writer
+    with tempfile.TemporaryDirectory(prefix="eq-capacity-") as tmp:
+        path = customer_snapshot_writer.HISTORY_CSV = os.path.join(tmp, "customer_history.csv")
+        customer_snapshot_writer._last_write_time.clear()
+        with contextlib.redirect_stdout(io.StringIO()):  # one console line per row
+            static = customer_snapshot_writer._load_static_data()
+            book = list(static.values())
+            for cid in ids:  # synthetic ids take the attributes they were generated from
+                if book:
+                    static.setdefault(cid, book[(int(cid) - FIRST_ID) % len(book)])
+                customer_snapshot_writer.write_customer_snapshot(cid, profile=store.get(cid))
+        with open(path, "rb") as f:
+            header = len(f.readline())
+        return (os.path.getsize(path) - header) / len(ids)
+
+
+def transaction_bytes(txns):
+    """{format: bytes per transaction} and the wire payloads, for a sample of txns."""
+    out = io.StringIO()
+    csv.DictWriter(out, fieldnames=CSV_FIELDS, extrasaction="ignore").writerows(txns)
+    archive = out.getvalue().encode("utf-8")
+    sizes = {"archive CSV": len(archive) / len(txns),
+             "archive CSV (gzip)": len(gzip.compress(archive)) / len(txns)}
+    payloads = {fmt: [encode_message(t, fmt) for t in txns] for fmt in FORMATS}
+    for fmt, encoded in payloads.items():
+        sizes[f"wire {fmt}"] = sum(len(p) for p in encoded) / len(txns)
+    return sizes, payloads
+
+
+def count_redis_commands(txns):
+    """Commands and round-trips per transaction on fakeredis: (batch, single) or None."""
+    try:
+        import fakeredis  # optional, only for measurement
+    except ImportError:
+        return None
+    import customer_features
+    store = RedisFeatureStore(client=fakeredis.FakeRedis())
+    seed, rest = txns[:len(txns) // 2], txns[len(txns) // 2:]
+    customer_features.update_customer_features_batch(seed, store=store, snapshot=False)
+    batch, single = rest[:BATCH], rest[BATCH:BATCH + 200]
+    with count_commands() as batched:
+        customer_features.update_customer_features_batch(batch, store=store, snapshot=False)
+    with count_commands() as each:
+        for t in single:
+            customer_features.update_customer_features(t, store=store, snapshot=False)
+    return ((batched.commands / len(batch), batched.round_trips / len(batch)),
+            (each.commands / max(len(single), 1), each.round_trips / max(len(single), 1)))
+
+
+def budget_commands():
+    """Fallback: the per-call budgets from redis_budget.py (upper bounds)."""
+    from redis_budget import REDIS_BUDGETS
+    budgets = {name: (c, r) for name, c, r in REDIS_BUDGETS}
+    c, r = budgets["update_customer_features_batch"]
+    return (c / BATCH, r / BATCH), budgets["update_customer_features"]
+
+
+def scan_costs(store, customers):
+    """(risk scan µs/customer, dashboard build µs/customer, DataFrame bytes/customer)."""
+    import risk_engine
+    from customer_data import build_customer_frame
+    with contextlib.redirect_stdout(io.StringIO()):
+        scan, _ = timed(lambda: risk_engine.scan_portfolio(store))
+    build, df = timed(lambda: build_customer_frame(store, static={}))
+    return (1e6 * scan / customers, 1e6 * build / customers,
+            df.memory_usage(deep=True).sum() / max(len(df), 1))
+
+
+# ═══════════════════════════════════════════════════════════════
+# EXTRAPOLATION
+# ═══════════════════════════════════════════════════════════════
+
+def extrapolate(args, m):
+    """[(resource, need, limit, unit, how)] at the target portfolio and rate."""
+    import customer_snapshot_writer
+    customers, tps = args.target_customers, args.target_tps
+    stream_len = get_setting("transport", "stream_maxlen", 1_000_000)
+    wire = get_setting("transport", "wire_format", "json")
+
+    memory = customers * m["customer_bytes"] + stream_len * m["stream_entry_bytes"][wire]
+    pass_seconds = customers * m["scan_us"] / 1e6 + RISK_SCAN_PAUSE
+    risk_ops = customers * m["scan_cmds"] / pass_seconds
+    dashboard_ops = customers * m["fetch_cmds"] / args.dashboard_refresh if args.dashboard_refresh else 0
+    feature_ops = tps * m["txn_cmds"]
+    # a customer's next snapshot waits out the cooldown: at tps/customers txns per
+    # customer per second, the chance a txn lands after it is exp(-cooldown * rate)
+    snapshot_rate = tps * math.exp(-customer_snapshot_writer.WRITE_COOLDOWN * tps / customers)
+    disk_day = 86400 * (tps * m["archive_bytes"] + snapshot_rate * m["snapshot_bytes"])
+
+    return [
+        ("Redis memory", memory / GB, args.redis_memory_gb, "GB",
+         f"{customers:,} x {m['customer_bytes']:.0f} B + stream {stream_len:,} x "
+         f"{m['stream_entry_bytes'][wire]:.0f} B ({wire})"),
+        ("Redis ops/s", feature_ops + risk_ops + dashboard_ops, args.redis_ops, "ops/s",
+         f"features {feature_ops:,.0f} + risk {risk_ops:,.0f} (pass {pass_seconds:,.0f}s)"
+         f" + dashboard {dashboard_ops:,.0f}"),
+        ("Disk", disk_day * args.retention_days / GB, args.disk_gb, "GB",
+         f"{disk_day / GB:,.1f} GB/day (archive + {snapshot_rate:,.0f} snapshot rows/s)"
+         f" x {args.retention_days} days"),
+        ("Feature CPU", tps * m["txn_us"] / 1e6, args.cores, "cores",
+         f"{tps:,} TPS x {m['txn_us']:.0f} µs (batch path)"),
+        ("Dashboard memory", customers * m["frame_bytes"] / GB, args.dashboard_memory_gb, "GB",
+         f"{customers:,} x {m['frame_bytes']:.0f} B per process"),
+    ]
+
+
+# ═══════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes and ops per customer, extrapolated to a target portfolio")
+    parser.add_argument("--customers", type=int, default=5000, help="synthetic portfolio size")
+    parser.add_argument("--activity", type=int, default=20, help="transactions per synthetic customer")
+    parser.add_argument("--sample", type=int, default=500, help="customers measured with MEMORY USAGE")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--server", action="store_true", help="measure MEMORY USAGE on the configured Redis")
+    parser.add_argument("--target-customers", type=int, default=10_000_000)
+    parser.add_argument("--target-tps", type=int, default=5000)
+    parser.add_argument("--retention-days", type=int, default=90)
+    parser.add_argument("--dashboard-refresh", type=float, default=10, help="seconds (0 = no dashboard)")
+    parser.add_argument("--redis-memory-gb", type=float, default=64)
+    parser.add_argument("--redis-ops", type=float, default=200_000)
+    parser.add_argument("--disk-gb", type=float, default=2000)
+    parser.add_argument("--cores", type=float, default=16)
+    parser.add_argument("--dashboard-memory-gb", type=float, default=16)
+    args = parser.parse_args()
+
+    print("=" * 78)
+    print("  EQUILIBRATE — Capacity Report")
+    print("=" * 78)
+    print(f"  [Capacity] {args.customers:,} synthetic customers x {args.activity} transactions ...")
+    txns = synthetic_transactions(args.customers, args.activity, args.seed)
+    store, batch_us, single_us = build_portfolio(txns)
+    ids = sorted(store.scan())
+    sample_ids = random.Random(args.seed).sample(ids, min(args.sample, len(ids)))
+    variants = profile_variants(store.batch_get(sample_ids))
+    txn_sizes, payloads = transaction_bytes(txns[:5000])
+
+    measured = None
+    if args.server:
+        from redis_client import get_redis
+        measured = measure_redis_bytes(get_redis(decode_responses=False), variants, sample_ids,
+                                       {fmt: p[:2000] for fmt, p in payloads.items()})
+    customer_bytes = {}
+    for variant, mappings in variants.items():
+        if measured:
+            customer_bytes[variant] = (measured[variant], "")
+        else:
+            customer_bytes[variant] = (sum(estimate_hash_bytes(KEY_PREFIX + str(cid), m)
+                                           for cid, m in zip(sample_ids, mappings)) / len(mappings), "est.")
+    stream_bytes = {fmt: (measured[f"stream {fmt}"] if measured
+                          else txn_sizes[f"wire {fmt}"] + STREAM_ENTRY_OVERHEAD) for fmt in FORMATS}
+
+    commands = count_redis_commands(txns)
+    command_source = "fakeredis"
+    if commands is None:
+        commands, command_source = budget_commands(), "budget"
+    scan_us, fetch_us, frame_bytes = scan_costs(store, len(ids))
+    row_bytes = snapshot_row_bytes(store, sample_ids)
+
+    print(f"\n  ── Per customer ({len(ids):,} customers, {len(sample_ids)} sampled) ──")
+    for variant, (size, how) in customer_bytes.items():
+        print(f"    Redis, {variant:<22}{size:>10,.0f} B  {how}")
+    print(f"    snapshot row              {row_bytes:>10,.0f} B")
+    print(f"    risk scan CPU             {scan_us:>10,.1f} µs")
+    print(f"    dashboard build CPU       {fetch_us:>10,.1f} µs")
+    print(f"    dashboard DataFrame       {frame_bytes:>10,.0f} B")
+
+    print("\n  ── Per transaction ──")
+    for name, size in txn_sizes.items():
+        print(f"    {name:<26}{size:>10,.0f} B")
+    for fmt, size in stream_bytes.items():
+        print(f"    {'Redis stream ' + fmt:<26}{size:>10,.0f} B  {'' if measured else 'est.'}")
+    (batch_cmds, batch_rts), (single_cmds, single_rts) = commands
+    print(f"    commands (batch path)     {batch_cmds:>10,.2f}    round-trips {batch_rts:.3f}  {command_source}")
+    print(f"    commands (single path)    {single_cmds:>10,.2f}    round-trips {single_rts:.3f}  {command_source}")
+    print(f"    feature CPU (batch path)  {batch_us:>10,.1f} µs")
+    print(f"    feature CPU (single path) {single_us:>10,.1f} µs")
+
+    encoding = get_encoding()
+    metrics = {
+        "customer_bytes": customer_bytes[encoding][0],
+        "stream_entry_bytes": stream_bytes,
+        "snapshot_bytes": row_bytes,
+        "archive_bytes": txn_sizes["archive CSV"],
+        "txn_cmds": batch_cmds,
+        "txn_us": batch_us,
+        "scan_us": scan_us,
+        "scan_cmds": 2,    # HGETALL + HSET per customer (redis_budget.py)
+        "fetch_cmds": 1,   # HGETALL per customer
+        "frame_bytes": frame_bytes,
+    }
+    rows = extrapolate(args, metrics)
+    print(f"\n  ── {args.target_customers:,} customers at {args.target_tps:,} TPS"
+          f" ({encoding} profiles, {args.retention_days} days retention) ──")
+    print(f"    {'resource':<18}{'need':>14}{'limit':>12}  {'use':>7}")
+    for name, need, limit, unit, how in rows:
+        print(f"    {name:<18}{need:>14,.1f}{limit:>12,.0f}  {100 * need / limit:>6.0f}%  {unit}")
+        print(f"    {'':<18}{how}")
+    name, need, limit, unit, _ = max(rows, key=lambda r: r[1] / r[2])
+    print("=" * 78)
+    verdict = "exceeds" if need > limit else "is closest to"
+    print(f"  LIMITING RESOURCE: {name} — {need:,.1f} {unit} {verdict} the {limit:,.0f} {unit} limit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Equilibrate — Redis Command Counting
+Counts the Redis commands and round-trips issued inside a block, for the
+benchmarks and checks (redis_budget.py, capacity_report.py). It patches
+the redis-py client classes while a counter is open, which is why it
+lives here and not in storage/redis_client.py.
+
+Usage:
+    from command_count import count_commands
+    with count_commands() as count:
+        ...
+    print(count.commands, count.round_trips, count.by_command)
+"""
+import threading
+from contextlib import contextmanager
+
+import redis
+
+
+class CommandCount:
+    """Commands and round-trips seen inside one count_commands() block."""
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.commands = 0
+        self.round_trips = 0
+        self.by_command = {}
+
+    def add(self, names):
+        self.round_trips += 1
+        for name in names:
+            name = name.decode() if isinstance(name, bytes) else str(name)
+            self.commands += 1
+            self.by_command[name.upper()] = self.by_command.get(name.upper(), 0) + 1
+
+
+_counters = []
+_unpatched = {}
+
+
+def _record(names):
+    thread = threading.get_ident()
+    for counter in _counters:
+        if counter.thread == thread:
+            counter.add(names)
+
+
+def _patch():
+    from redis.client import Pipeline
+    execute_command = redis.Redis.execute_command
+    execute = Pipeline.execute
+    load_scripts = Pipeline.load_scripts
+
+    def counted_execute_command(self, *args, **options):
+        _record(args[:1])
+        return execute_command(self, *args, **options)
+
+    def counted_execute(self, *args, **kwargs):
+        if self.command_stack:
+            _record([command[0][0] for command in self.command_stack])
+        return execute(self, *args, **kwargs)
+
+    def counted_load_scripts(self):
+        _record(["SCRIPT EXISTS"])
+        return load_scripts(self)
+
+    _unpatched.update({(redis.Redis, "execute_command"): execute_command,
+                       (Pipeline, "execute"): execute, (Pipeline, "load_scripts"): load_scripts})
+    redis.Redis.execute_command = counted_execute_command
+    Pipeline.execute = counted_execute
+    Pipeline.load_scripts = counted_load_scripts
+
+
+@contextmanager
+def count_commands():
+    """Count the Redis commands and round-trips this thread issues in the block.
+
+    A command is one round-trip; a pipeline (or MULTI/EXEC transaction) is
+    one round-trip for all of its commands (MULTI/EXEC themselves are not
+    counted), plus one for the SCRIPT EXISTS check redis-py sends before a
+    pipeline that runs scripts. Works with any redis-py client by patching
+    the client classes while a counter is open.
+    """
+    counter = CommandCount()
+    if not _counters:
+        _patch()
+    _counters.append(counter)
+    try:
+        yield counter
+    finally:
+        _counters.remove(counter)
+        if not _counters:
+            for (cls, name), original in _unpatched.items():
+                setattr(cls, name, original)
+            _unpatched.clear()
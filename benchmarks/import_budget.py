@@ -0,0 +1,158 @@
+"""
+Equilibrate — Import & Startup Budget Check
+Imports every pipeline module in a fresh interpreter and checks that:
+
+  * the import finishes within its time budget, and
+  * the import is side-effect free (prints nothing; engines only start
+    from their main() entry point).
+
+Startup checks then time the lazy resources each module creates on first
+use (static customer data, policy templates) against their own budget.
+
+Modules whose third-party dependencies are not installed are reported as
+SKIP rather than failing the run.
+
+Run:  python benchmarks/import_budget.py [--repeat 3]
+Exit code is 1 if any budget is exceeded or any import has side effects.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (module, directory, import budget in ms)
+IMPORT_BUDGETS = [
+    ("settings", "config", 20),
+    ("clock", "config", 20),
+    ("metrics", "config", 20),
+    ("tracing", "config", 20),
+    ("profiling", "config", 20),
+    ("policy_engine", "risk", 20),
+    ("redis_client", "storage", 250),
+    ("profile_codec", "features", 50),
+    ("profile_tiering", "features", 100),
+    ("customer_snapshot_writer", "storage", 150),
+    ("customer_features", "features", 250),
+    ("risk_rules", "risk", 50),
+    ("risk_engine", "risk", 150),
+    ("alert_engine", "risk", 150),
+    ("intervention_engine", "alert", 150),
+    ("wire_format", "kafka", 20),
+    ("transport", "kafka", 50),
+    ("feature_engine", "features", 500),
+    ("transactions_consumer", "kafka", 400),
+    ("transaction_producer", "kafka", 800),
+    ("replay_transactions", "kafka", 50),
+    ("stream_processor", "kafka", 100),
+    ("run_local", "kafka", 100),
+    ("audit_log", "dashboard", 600),
+]
+
+# (name, module, directory, setup expression, budget in ms)
+STARTUP_BUDGETS = [
+    ("policy templates", "policy_engine", "risk", "mod._load_policies()", 20),
+    ("risk rules", "risk_rules", "risk", "mod.get_rules()", 20),
+    ("static customer data", "customer_snapshot_writer", "storage", "mod._load_static_data()", 150),
+]
+
+MODULE_DIRS = ["config", "storage", "risk", "features", "alert", "dashboard", "kafka"]
+
+_PROBE = r"""
+import importlib, io, contextlib, json, sys, time
+sys.path[:0] = {paths!r}
+buf = io.StringIO()
+t0 = time.perf_counter()
+try:
+    with contextlib.redirect_stdout(buf):
+        mod = importlib.import_module({module!r})
+except ImportError as e:
+    print(json.dumps({{"skip": str(e)}}))
+    sys.exit(0)
+t1 = time.perf_counter()
+setup_ms = None
+if {setup!r}:
+    with contextlib.redirect_stdout(io.StringIO()):
+        t2 = time.perf_counter()
+        eval({setup!r})
+        setup_ms = (time.perf_counter() - t2) * 1000
+print(json.dumps({{"import_ms": (t1 - t0) * 1000, "setup_ms": setup_ms,
+                  "output": buf.getvalue()}}))
+"""
+
+
+def _probe(module, directory, setup=""):
+    """Run one import (+ optional setup) in a fresh interpreter."""
+    paths = [os.path.join(BASE_DIR, directory)] + [
+        os.path.join(BASE_DIR, d) for d in MODULE_DIRS if d != directory
+    ]
+    code = _PROBE.format(paths=paths, module=module, setup=setup)
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=os.path.join(BASE_DIR, directory),
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"error": (proc.stderr.strip().splitlines() or ["unknown error"])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _best_of(module, directory, repeat, setup=""):
+    best = None
+    for _ in range(repeat):
+        res = _probe(module, directory, setup)
+        if "skip" in res or "error" in res:
+            return res
+        key = "setup_ms" if setup else "import_ms"
+        if best is None or res[key] < best[key]:
+            best = res
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and startup budget check")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per module (best is kept)")
+    args = parser.parse_args()
+
+    failures = 0
+    print("=" * 60)
+    print("  EQUILIBRATE — Import & Startup Budget")
+    print("=" * 60)
+
+    for module, directory, budget in IMPORT_BUDGETS:
+        res = _best_of(module, directory, args.repeat)
+        if "skip" in res:
+            print(f"  SKIP  {module:<26} missing dependency ({res['skip']})")
+            continue
+        if "error" in res:
+            failures += 1
+            print(f"  FAIL  {module:<26} {res['error']}")
+            continue
+        ok = res["import_ms"] <= budget and not res["output"]
+        failures += 0 if ok else 1
+        note = "" if not res["output"] else "  <- prints on import"
+        print(f"  {'OK  ' if ok else 'FAIL'}  {module:<26} {res['import_ms']:7.1f} ms "
+              f"(budget {budget} ms){note}")
+
+    print("-" * 60)
+    for name, module, directory, setup, budget in STARTUP_BUDGETS:
+        res = _best_of(module, directory, args.repeat, setup)
+        if "skip" in res:
+            print(f"  SKIP  {name:<26} missing dependency ({res['skip']})")
+            continue
+        if "error" in res:
+            failures += 1
+            print(f"  FAIL  {name:<26} {res['error']}")
+            continue
+        ok = res["setup_ms"] <= budget
+        failures += 0 if ok else 1
+        print(f"  {'OK  ' if ok else 'FAIL'}  {name:<26} {res['setup_ms']:7.1f} ms (budget {budget} ms)")
+
+    print("=" * 60)
+    print(f"  {failures} budget violation(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
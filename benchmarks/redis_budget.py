@@ -0,0 +1,194 @@
+"""
+Equilibrate — Redis Command Budget Check
+Counts the Redis commands and round-trips each hot-path operation issues
+(command_count.count_commands()) and fails when one goes over its budget.
+A performance regression here nearly always means an extra round-trip per
+event, which no single-machine timing shows but every production Redis
+hop pays for.
+
+Operations (hash profile encoding, on a portfolio seeded by replaying the
+first --txns recorded transactions):
+
+  update_customer_features           one transaction, existing customer
+  update_customer_features (new)     one transaction, first for the customer
+  update_customer_features_batch     one 500-transaction micro-batch (a
+                                     replay slice touching ~500 customers)
+  evaluate_customer                  one customer re-scored
+  scan_portfolio                     a full risk monitor pass
+  write_customer_snapshot            one snapshot row (profile read from Redis)
+  fetch_all_customers                a dashboard refresh (trace collect + frame build)
+  log_audit_event                    one officer action
+
+Per-call operations are checked on their worst call over --calls calls.
+Portfolio operations (scan, fetch) are budgeted per 1,000 customers, with
+a few commands to spare for SCAN paging, so the check does not depend on
+the portfolio size.
+
+Runs against fakeredis (pip install fakeredis lupa) by default, or the
+configured server with --server; the server database must be empty
+(EQ_REDIS_DB) because the portfolio operations touch every key in it.
+Without either, the check is skipped. CSV output goes to a temporary
+directory.
+
+Run:  python benchmarks/redis_budget.py [--server] [--calls 50]
+Exit code is 1 if any budget is exceeded.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for d in ("config", "storage", "risk", "features", "kafka", "dashboard"):
+    sys.path.insert(0, os.path.join(BASE_DIR, d))
+
+from command_count import count_commands
+from redis_store import RedisFeatureStore, set_store
+from replay_transactions import TXN_CSV, read_transactions, to_message
+from tracing import Tracer, set_tracer
+
+# (operation, commands, round-trips): per call, or per 1,000 customers for "/1k"
+REDIS_BUDGETS = [
+    ("update_customer_features", 2, 2),
+    ("update_customer_features (new)", 2, 2),
+    ("update_customer_features_batch", 1001, 3),
+    ("evaluate_customer", 2, 2),
+    ("scan_portfolio /1k", 2005, 4),
+    ("write_customer_snapshot", 1, 1),
+    ("fetch_all_customers /1k", 1005, 4),
+    ("log_audit_event", 1, 1),
+]
+BATCH = 500
+
+
+def connect(server):
+    """(bytes client, text client) on fakeredis or the configured server; None if unavailable."""
+    if server:
+        from redis_client import get_redis
+        client = get_redis(decode_responses=False)
+        try:
+            if client.dbsize():
+                sys.exit("[Budget] The Redis database is not empty; point EQ_REDIS_DB at a scratch database.")
+        except Exception as e:
+            print(f"  SKIP  Redis unreachable ({e.__class__.__name__}: {e})")
+            return None
+        return client, get_redis()
+    try:
+        import fakeredis  # optional, only for this check
+    except ImportError:
+        print("  SKIP  fakeredis not installed (pip install fakeredis lupa) and --server not given")
+        return None
+    fake = fakeredis.FakeServer()
+    return fakeredis.FakeRedis(server=fake), fakeredis.FakeRedis(server=fake, decode_responses=True)
+
+
+def measure(fn, calls):
+    """Worst (commands, round-trips) and the last count over calls to fn(i)."""
+    worst, last = (0, 0), None
+    for i in range(calls):
+        with count_commands() as last:
+            fn(i)
+        worst = max(worst, (last.commands, last.round_trips))
+    return worst, last
+
+
+def run_operations(args, store, txns):
+    import audit_log
+    import customer_features
+    import customer_snapshot_writer
+    import risk_engine
+    from customer_data import build_customer_frame
+    from tracing import get_tracer
+
+    tmp = tempfile.mkdtemp(prefix="eq-budget-")
+    customer_snapshot_writer.HISTORY_CSV = os.path.join(tmp, "customer_history.csv")
+    audit_log.INTERVENTION_LOG_PATH = os.path.join(tmp, "intervention_log.csv")
+
+    seed, rest = txns[:args.txns], txns[args.txns:]
+    for i in range(0, len(seed), BATCH):
+        customer_features.update_customer_features_batch(seed[i:i + BATCH], snapshot=False)
+    ids = sorted(store.scan())
+    known = set(ids)
+    repeat = [t for t in rest if str(t["customer_id"]) in known]
+    fresh = [dict(t, customer_id=f"new{i}", transaction_id=f"new{i}") for i, t in enumerate(rest)]
+    calls = min(args.calls, len(ids), len(repeat), len(fresh))
+
+    def per_1k(count, customers):
+        scale = 1000 / max(customers, 1)
+        return (round(count.commands * scale), round(count.round_trips * scale)), count
+
+    def fetch():
+        tracer = get_tracer()
+        armed = tracer.collect("dashboard")
+        build_customer_frame(store, static={})
+        tracer.complete(armed, "dashboard")
+
+    results = {}
+    results["update_customer_features"] = measure(
+        lambda i: customer_features.update_customer_features(repeat[i], snapshot=False), calls)
+    results["update_customer_features (new)"] = measure(
+        lambda i: customer_features.update_customer_features(fresh[i], snapshot=False), calls)
+
+    batch = rest[calls:calls + BATCH]
+    with count_commands() as count:
+        customer_features.update_customer_features_batch(batch, snapshot=False)
+    results["update_customer_features_batch"] = (count.commands, count.round_trips), count
+
+    results["evaluate_customer"] = measure(lambda i: risk_engine.evaluate_customer(ids[i], store), calls)
+    n_customers = len(list(store.scan()))
+    with count_commands() as count:
+        risk_engine.scan_portfolio(store)
+    results["scan_portfolio /1k"] = per_1k(count, n_customers)
+
+    with contextlib.redirect_stdout(io.StringIO()):  # one console line per row / event
+        customer_snapshot_writer._last_write_time.clear()
+        results["write_customer_snapshot"] = measure(
+            lambda i: customer_snapshot_writer.write_customer_snapshot(ids[i]), calls)
+        results["log_audit_event"] = measure(
+            lambda i: audit_log.log_audit_event(ids[i], "CONTACTED", officer="budget-check"), calls)
+
+    with count_commands() as count:
+        fetch()
+    results["fetch_all_customers /1k"] = per_1k(count, n_customers)
+    return results, n_customers, calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Redis commands / round-trips per operation budget check")
+    parser.add_argument("--server", action="store_true", help="use the configured Redis instead of fakeredis")
+    parser.add_argument("--txns", type=int, default=5000, help="recorded transactions replayed to seed the portfolio")
+    parser.add_argument("--calls", type=int, default=50, help="calls per per-call operation")
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print("  EQUILIBRATE — Redis Command Budget")
+    print("=" * 72)
+    clients = connect(args.server)
+    if clients is None:
+        sys.exit(0)
+    store = set_store(RedisFeatureStore(client=clients[0]))
+    set_tracer(Tracer(client=clients[1]))
+    txns = [to_message(t) for t in read_transactions([TXN_CSV], limit=args.txns + args.calls + BATCH)]
+
+    results, n_customers, calls = run_operations(args, store, txns)
+    print(f"  {n_customers:,} customers, {calls} calls per operation"
+          f" ({'configured server' if args.server else 'fakeredis'})")
+    print(f"  {'':6}{'operation':<38}{'commands':>10}{'round-trips':>13}")
+    failures = 0
+    for name, max_commands, max_round_trips in REDIS_BUDGETS:
+        (commands, round_trips), count = results[name]
+        ok = commands <= max_commands and round_trips <= max_round_trips
+        failures += 0 if ok else 1
+        print(f"  {'OK  ' if ok else 'FAIL'}  {name:<38}{commands:>5}/{max_commands:<4}{round_trips:>7}/{max_round_trips:<5}")
+        if not ok:
+            top = sorted(count.by_command.items(), key=lambda kv: -kv[1])[:6]
+            print(f"        last call: {', '.join(f'{k} x{v}' for k, v in top)}")
+    print("=" * 72)
+    print(f"  {failures} budget violation(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
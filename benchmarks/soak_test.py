@@ -0,0 +1,327 @@
+"""
+Equilibrate — Soak Test
+Runs the pipeline at a fixed rate for a long time and reports what keeps
+growing. Leaks such as unbounded caches, ever-longer sys.path or Redis keys
+that never expire only show up after hours; short benchmarks miss them.
+
+The pipeline runs as threads of this process, on the in-process transport
+(as kafka/run_local.py does):
+
+  producer    generate_transaction() at --tps, customers weighted by persona
+  features    stream processor feature sink (the feature engine's work)
+  snapshots   stream processor snapshot sink
+  consumer    stream processor archive sink (the raw consumer's CSV append)
+  risk        scan_portfolio() every --risk-interval seconds
+
+CSV output goes to --workdir (a temporary directory by default), never to
+data/. Pipeline console output goes to <workdir>/soak.log.
+
+Profiles go to an in-process memory store by default. --store configured
+uses the configured feature store (Redis, or SQLite under data/), which
+adds Redis memory and key counts to the samples. The soak writes
+synthetic profiles for the customers.csv ids and rescans the whole store,
+so that store must be an empty scratch one (e.g. EQ_REDIS_DB=15); the run
+refuses to start otherwise.
+
+Every --interval seconds the harness samples process RSS, Python objects,
+threads, sys.path length, the snapshot cooldown cache, Redis used_memory
+and key count (Redis store only), consumer backlog, output file sizes and
+the per-stage throughput since the last sample. The report judges
+everything after --warmup:
+
+  GROWING   rose in at least 80% of intervals and by more than 1% overall
+            (projected growth per hour shown); append-only files are
+            expected to grow and are marked "log"
+  DECAY     a stage's throughput in the last third is 10% or more below
+            the first third
+
+The warm-up must cover the first pass over the customer book: until every
+customer has been seen the profile count and the snapshot cooldown cache
+grow, and snapshot rows fall off once each customer is inside the
+5-minute cooldown. The default (10% of an hour) does.
+
+Samples and findings are written to benchmarks/results/soak-<timestamp>.json;
+the exit status is 1 when anything other than a log file grew or decayed.
+
+Run:  python benchmarks/soak_test.py [--tps 200] [--duration 3600] [--store memory]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for d in ("config", "storage", "risk", "features", "kafka"):
+    sys.path.insert(0, os.path.join(BASE_DIR, d))
+
+from metrics import get_metrics
+from transport import MemoryTransport, set_transport
+
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmarks", "results")
+GROWTH_STEPS = 0.80    # share of intervals that must rise to call a series growing
+GROWTH_MIN = 0.01      # ... and the overall rise, relative to the first value
+DECAY_MIN = 0.10       # throughput drop (last third vs first third) worth flagging
+
+# Stage throughput: name -> metrics counter
+STAGES = {
+    "producer": "soak_produced",
+    "features": "sink_features_written",
+    "snapshots": "snapshots_written",     # rows (the cooldown skips most updates)
+    "consumer": "sink_archive_written",
+    "risk": "soak_customers_scanned",
+}
+LOG_SERIES = ("archive_csv_mb", "history_csv_mb", "soak_log_mb")
+
+
+def rss_mb():
+    """Resident set size of this process in MiB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2**20 if sys.platform == "darwin" else 1024)
+
+
+def _file_mb(path):
+    return os.path.getsize(path) / 2**20 if os.path.exists(path) else 0.0
+
+
+def _redis_memory(store):
+    """(used_memory MiB, key count) for a Redis store, else (None, None)."""
+    if getattr(store, "name", "") != "redis":
+        return None, None
+    try:
+        return store.r.info("memory")["used_memory"] / 2**20, store.r.dbsize()
+    except Exception:
+        return None, None
+
+
+# ═══════════════════════════════════════════════════════════════
+# DRIVERS
+# ═══════════════════════════════════════════════════════════════
+
+def run_producer(transport, tps, stop):
+    import transaction_producer
+    from tracing import stamp
+    customers = transaction_producer.load_customers()
+    records = customers.to_dict("records")
+    weights = [transaction_producer.persona_tx_weight.get(transaction_producer.persona_map[int(c["customer_id"])], 1.0)
+               for c in records]
+    metrics = get_metrics()
+    started, sent = time.monotonic(), 0
+    while not stop.is_set():
+        due = int((time.monotonic() - started) * tps) - sent
+        if due <= 0:
+            time.sleep(0.005)
+            continue
+        for customer in random.choices(records, weights=weights, k=min(due, 1000)):
+            txn = stamp(transaction_producer.generate_transaction(customer))
+            transport.send("transactions", txn, key=txn["customer_id"])
+            sent += 1
+        metrics.inc("soak_produced", min(due, 1000))
+
+
+def run_processor(processor, stop):
+    while not stop.is_set():
+        processor.step(timeout_ms=200)
+    processor.close()
+
+
+def run_risk(interval, stop):
+    from risk_engine import scan_portfolio
+    metrics = get_metrics()
+    while not stop.wait(interval):
+        total, _counts, _hardship = scan_portfolio()
+        metrics.inc("soak_customers_scanned", total)
+
+
+# ═══════════════════════════════════════════════════════════════
+# SAMPLING + ANALYSIS
+# ═══════════════════════════════════════════════════════════════
+
+def take_sample(started, processor, store, paths, previous):
+    import customer_snapshot_writer
+    counters = dict(get_metrics().counters)
+    now = time.monotonic()
+    elapsed = now - (previous["_t"] if previous else started)
+    redis_mb, redis_keys = _redis_memory(store)
+    try:
+        backlog = processor.sub.backlog()
+    except Exception:
+        backlog = None
+    sample = {
+        "_t": now,
+        "t": round(now - started, 1),
+        "rss_mb": round(rss_mb(), 2),
+        "py_objects": len(gc.get_objects()),
+        "threads": threading.active_count(),
+        "sys_path": len(sys.path),
+        "snapshot_cooldown_entries": len(customer_snapshot_writer._last_write_time),
+        "redis_used_mb": None if redis_mb is None else round(redis_mb, 2),
+        "redis_keys": redis_keys,
+        "backlog": backlog,
+        "archive_csv_mb": round(_file_mb(paths["archive"]), 3),
+        "history_csv_mb": round(_file_mb(paths["history"]), 3),
+        "soak_log_mb": round(_file_mb(paths["log"]), 3),
+        "counters": {stage: counters.get(name, 0) for stage, name in STAGES.items()},
+    }
+    prev_counters = previous["counters"] if previous else {}
+    sample["rates"] = {stage: round((n - prev_counters.get(stage, 0)) / max(elapsed, 1e-9), 1)
+                       for stage, n in sample["counters"].items()}
+    return sample
+
+
+def growth(values, times):
+    """(share of rising steps, relative rise, slope per hour) for a series."""
+    steps = list(zip(values, values[1:]))
+    rising = sum(b > a for a, b in steps) / len(steps)
+    relative = (values[-1] - values[0]) / max(abs(values[0]), 1e-9)
+    mean_t, mean_v = sum(times) / len(times), sum(values) / len(values)
+    var_t = sum((t - mean_t) ** 2 for t in times)
+    slope = sum((t - mean_t) * (v - mean_v) for t, v in zip(times, values)) / var_t if var_t else 0.0
+    return rising, relative, slope * 3600
+
+
+def analyse(samples, warmup):
+    """Findings for every numeric series and stage rate after the warm-up."""
+    steady = [s for s in samples if s["t"] >= warmup]
+    if len(steady) < 3:
+        steady = samples[len(samples) // 2:]
+    findings = []
+    if len(steady) < 3:
+        return findings
+    times = [s["t"] for s in steady]
+    series = [k for k, v in steady[0].items()
+              if not k.startswith("_") and k != "t" and isinstance(v, (int, float))]
+    for key in series:
+        values = [s[key] for s in steady]
+        if any(v is None for v in values):
+            continue
+        rising, relative, per_hour = growth(values, times)
+        if rising >= GROWTH_STEPS and relative > GROWTH_MIN:
+            findings.append({"series": key, "kind": "log" if key in LOG_SERIES else "GROWING",
+                             "first": values[0], "last": values[-1], "per_hour": round(per_hour, 3),
+                             "rising_share": round(rising, 2)})
+
+    third = max(1, len(steady) // 3)
+    for stage in STAGES:
+        early = sorted(s["rates"][stage] for s in steady[:third])
+        late = sorted(s["rates"][stage] for s in steady[-third:])
+        before, after = early[len(early) // 2], late[len(late) // 2]
+        if before > 0 and (before - after) / before >= DECAY_MIN:
+            findings.append({"series": f"{stage}_rate", "kind": "DECAY", "first": before, "last": after,
+                             "change_pct": round(100 * (after - before) / before, 1)})
+    return findings
+
+
+# ═══════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(description="Sustained-rate soak test with growth reporting")
+    parser.add_argument("--tps", type=float, default=200)
+    parser.add_argument("--duration", type=float, default=3600, help="seconds")
+    parser.add_argument("--interval", type=float, default=10, help="seconds between samples")
+    parser.add_argument("--warmup", type=float, default=None,
+                        help="seconds excluded from the analysis (default 10%% of --duration)")
+    parser.add_argument("--risk-interval", type=float, default=5)
+    parser.add_argument("--store", choices=("memory", "configured"), default="memory",
+                        help="configured = the configured feature store, which must be empty (scratch DB)")
+    parser.add_argument("--workdir", default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    warmup = args.duration * 0.10 if args.warmup is None else args.warmup
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="eq-soak-")
+    os.makedirs(workdir, exist_ok=True)
+    paths = {"archive": os.path.join(workdir, "transactions_raw.csv"),
+             "history": os.path.join(workdir, "customer_history.csv"),
+             "log": os.path.join(workdir, "soak.log")}
+
+    from redis_store import MemoryFeatureStore, get_store, set_store
+    if args.store == "memory":
+        set_store(MemoryFeatureStore())
+    store = get_store()
+    if args.store == "configured" and next(iter(store.scan()), None) is not None:
+        sys.exit(f"[Soak] The configured {store.name} store is not empty; point it at a scratch database "
+                 f"(e.g. EQ_REDIS_DB) or use --store memory.")
+    import customer_snapshot_writer
+    from stream_processor import ArchiveSink, FeatureSink, SnapshotSink, StreamProcessor, TOPIC
+    customer_snapshot_writer.HISTORY_CSV = paths["history"]
+
+    console = sys.stdout
+    print("=" * 72)
+    print(f"  EQUILIBRATE — Soak Test ({args.tps:g} TPS for {args.duration:g}s, {store.name} store)")
+    print(f"  Workdir: {workdir}")
+    print("=" * 72)
+
+    transport = set_transport(MemoryTransport())
+    # Subscribe first: the in-process transport only delivers to live subscriptions
+    processor = StreamProcessor(transport.subscribe(TOPIC, group="soak"),
+                                [ArchiveSink(path=paths["archive"]), FeatureSink(), SnapshotSink()])
+    stop = threading.Event()
+    log = open(paths["log"], "a", encoding="utf-8", buffering=1)
+    sys.stdout = log  # one line per snapshot row etc.; the harness prints to the console
+    threads = [threading.Thread(target=target, args=a, name=name, daemon=True) for name, target, a in (
+        ("soak-processor", run_processor, (processor, stop)),
+        ("soak-producer", run_producer, (transport, args.tps, stop)),
+        ("soak-risk", run_risk, (args.risk_interval, stop)),
+    )]
+    for thread in threads:
+        thread.start()
+
+    started = time.monotonic()
+    samples, previous = [], None
+    try:
+        while time.monotonic() - started < args.duration:
+            time.sleep(min(args.interval, max(0.0, args.duration - (time.monotonic() - started))))
+            previous = take_sample(started, processor, store, paths, previous)
+            samples.append(previous)
+            rates = " ".join(f"{k} {v:,.0f}/s" for k, v in previous["rates"].items())
+            print(f"  [Soak] t={previous['t']:>7,.0f}s rss {previous['rss_mb']:,.1f} MiB | {rates}"
+                  + (f" | backlog {previous['backlog']:,}" if previous["backlog"] else ""), file=console)
+    except KeyboardInterrupt:
+        print("  [Soak] Interrupted, analysing the samples so far", file=console)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=10)
+        sys.stdout = console
+        log.close()
+
+    findings = analyse(samples, warmup)
+    produced = samples[-1]["counters"]["producer"] if samples else 0
+    elapsed = samples[-1]["t"] if samples else 0
+    print("-" * 72)
+    print(f"  Produced {produced:,} transactions in {elapsed:,.0f}s "
+          f"({produced / max(elapsed, 1e-9):,.1f} TPS of {args.tps:g} requested)")
+    if not findings:
+        print("  No growth or throughput decay after warm-up.")
+    for f in findings:
+        if f["kind"] == "DECAY":
+            print(f"  {f['kind']:<8} {f['series']:<28} {f['first']:>10,.1f} -> {f['last']:>10,.1f}/s "
+                  f"({f['change_pct']:+.1f}%)")
+        else:
+            print(f"  {f['kind']:<8} {f['series']:<28} {f['first']:>10,.2f} -> {f['last']:>10,.2f} "
+                  f"({f['per_hour']:+,.2f}/h, rose in {100 * f['rising_share']:.0f}% of intervals)")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, f"soak-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"args": vars(args), "workdir": workdir, "findings": findings,
+                   "samples": [{k: v for k, v in s.items() if not k.startswith("_")} for s in samples]},
+                  f, indent=2)
+    print(f"  Report: {os.path.relpath(output, BASE_DIR)}")
+    sys.exit(1 if any(f["kind"] != "log" for f in findings) else 0)
+
+
+if __name__ == "__main__":
+    main()
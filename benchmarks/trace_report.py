@@ -0,0 +1,71 @@
+"""
+Equilibrate — Trace Report
+Reads the sampled transaction traces (config/tracing.py) from Redis and
+prints the latency of every hop, from producer send to the dashboard:
+count, p50, p95, p99 and max per "previous -> hop" step, then the same
+from emit to each hop.
+
+Missing hops are skipped: a trace with no snapshot (cooldown) is measured
+from features straight to risk_pickup.
+
+Run:  python benchmarks/trace_report.py [--last 1000] [--watch 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+sys.path.insert(0, os.path.join(BASE_DIR, "storage"))  # redis_client, for load_traces()
+
+from tracing import HOPS, hop_latencies, load_traces
+
+
+def _quantile(values, q):
+    """Nearest-rank quantile of sorted values."""
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def report(limit):
+    traces = load_traces(limit=limit)
+    steps, totals = hop_latencies(traces)
+    complete = sum(1 for t in traces if HOPS[-1] in t)
+
+    print("=" * 72)
+    print(f"  EQUILIBRATE — Trace Report ({len(traces):,} traces, {complete:,} reached the dashboard)")
+    print("=" * 72)
+    if not steps:
+        print("  No traces yet (producer samples trace.sample_rate of transactions).")
+        return
+    header = f"{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(f"  {'hop':<26}{header}")
+    for step in sorted(steps, key=lambda s: (HOPS.index(s.split(" -> ")[1]), s)):
+        _print_row(step, steps[step])
+    print(f"\n  {'since emit':<26}{header}")
+    for hop in sorted(totals, key=HOPS.index):
+        _print_row(f"emit -> {hop}", totals[hop])
+
+
+def _print_row(label, values):
+    values = sorted(values)
+    print(f"  {label:<26}{len(values):>8}"
+          f"{1000 * _quantile(values, 0.50):>10.1f}{1000 * _quantile(values, 0.95):>10.1f}"
+          f"{1000 * _quantile(values, 0.99):>10.1f}{1000 * values[-1]:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-hop latency of sampled transaction traces")
+    parser.add_argument("--last", type=int, default=None, help="only the newest N traces")
+    parser.add_argument("--watch", type=float, default=0, help="reprint every N seconds")
+    args = parser.parse_args()
+
+    report(args.last)
+    while args.watch > 0:
+        time.sleep(args.watch)
+        print()
+        report(args.last)
+
+
+if __name__ == "__main__":
+    main()
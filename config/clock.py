@@ -0,0 +1,137 @@
+"""
+Equilibrate — Injectable Clock
+Everything that reasons about elapsed time (salary gaps, 7-day ATM
+windows, the snapshot cooldown, last_risk_eval, producer timestamps,
+tiering cutoffs) asks this clock instead of datetime.now()/time.time(),
+so multi-week scenarios can run in minutes.
+
+Modes (clock.mode):
+  wall        real time (default)
+  simulated   starts at clock.start and runs clock.speed x faster than
+              real time; speed 0 = discrete steps, time only moves when
+              advance() or sleep() is called
+
+Configuration (env var overrides config/equilibrate.json):
+  EQ_CLOCK_MODE    wall | simulated
+  EQ_CLOCK_SPEED   simulated seconds per real second (default 1440 =
+                   one day per minute; 0 = step mode)
+  EQ_CLOCK_START   simulated start, "YYYY-MM-DD HH:MM:SS" (default: now)
+  EQ_CLOCK_ANCHOR  real epoch seconds at which the simulation started
+
+Separate processes agree on simulated time when they share START, SPEED
+and ANCHOR, e.g.  export EQ_CLOCK_ANCHOR=$(date +%s)  before launching
+the producer, feature engine and risk monitor.
+
+Usage:
+    from clock import get_clock
+    clock = get_clock()
+    clock.now()          # naive local datetime
+    clock.time()         # epoch seconds
+    clock.sleep(60)      # 60 clock seconds (60/speed real seconds)
+"""
+import threading
+import time as _time
+from datetime import datetime, timedelta
+
+from settings import get_setting
+
+
+class WallClock:
+    """Real time."""
+
+    mode = "wall"
+    speed = 1.0
+
+    def now(self):
+        return datetime.now()
+
+    def time(self):
+        return _time.time()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            _time.sleep(seconds)
+
+    def advance(self, seconds):
+        raise RuntimeError("The wall clock cannot be advanced (set EQ_CLOCK_MODE=simulated)")
+
+
+class SimulatedClock:
+    """Scaled or stepped time starting at `start`.
+
+    now = start + (real elapsed since anchor) * speed + manual advances
+    """
+
+    mode = "simulated"
+
+    def __init__(self, start=None, speed=1440.0, anchor=None):
+        self.speed = float(speed)
+        self.anchor = float(anchor) if anchor else _time.time()
+        self.start = start or datetime.fromtimestamp(self.anchor)
+        self._offset = 0.0
+        self._lock = threading.Lock()
+
+    def _elapsed(self):
+        scaled = (_time.time() - self.anchor) * self.speed if self.speed > 0 else 0.0
+        return scaled + self._offset
+
+    def now(self):
+        return self.start + timedelta(seconds=self._elapsed())
+
+    def time(self):
+        return self.now().timestamp()
+
+    def sleep(self, seconds):
+        """Wait `seconds` of clock time: scaled real sleep, or a step in step mode."""
+        if seconds <= 0:
+            return
+        if self.speed > 0:
+            _time.sleep(seconds / self.speed)
+        else:
+            self.advance(seconds)
+
+    def advance(self, seconds):
+        """Jump the clock forward (both simulated modes)."""
+        with self._lock:
+            self._offset += float(seconds)
+
+    def advance_to(self, when):
+        """Move the clock forward to `when` (a datetime); never moves it back."""
+        with self._lock:
+            delta = (when - self.start).total_seconds() - self._elapsed()
+            if delta > 0:
+                self._offset += delta
+
+
+# ── Process-wide clock (created on first use) ──
+_clock = None
+
+
+def clock_from_settings():
+    """Build the clock described by the clock.* settings."""
+    mode = get_setting("clock", "mode", "wall")
+    if mode == "wall":
+        return WallClock()
+    if mode != "simulated":
+        raise ValueError(f"Unknown clock mode '{mode}' (expected wall or simulated)")
+    start = get_setting("clock", "start", "")
+    return SimulatedClock(
+        start=datetime.fromisoformat(start) if start else None,
+        speed=get_setting("clock", "speed", 1440.0),
+        anchor=get_setting("clock", "anchor", 0.0) or None,
+    )
+
+
+def get_clock():
+    """Return the process-wide clock (clock.mode, default wall)."""
+    global _clock
+    if _clock is None:
+        _clock = clock_from_settings()
+    return _clock
+
+
+def set_clock(clock):
+    """Install a specific clock (simulations, benchmarks, tests)."""
+    global _clock
+    _clock = clock
+    return clock
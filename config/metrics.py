@@ -0,0 +1,321 @@
+"""
+Equilibrate — Process Metrics
+Counters and fixed-bucket latency histograms for the long-running
+processes. Recording a sample is a bisect and a few increments under a
+lock, so hot stages are timed on every call rather than sampled.
+
+Stages (histograms, seconds):
+  decode        wire bytes -> message dict (transport)
+  redis_update  feature store read + compare-and-set
+  classify      hardship classification
+  score         risk score + level
+  snapshot      snapshot row write
+  end_to_end    transaction timestamp -> features written (real seconds,
+                scaled down from clock seconds under a simulated clock)
+  scan          one pass over the portfolio (risk, alert, intervention)
+  archive       raw CSV append (transactions consumer)
+  lag_drain     duration of each feature engine lag episode
+
+Counters (monotonic, e.g. transactions, duplicates_skipped) and gauges
+(last value, e.g. backlog, batch_size) are named by the caller.
+
+Export (start_metrics(process) in each main(); recording works without it):
+  http://127.0.0.1:<port>/metrics   Prometheus text format, port from
+                                    metrics.<process>_port (0 = off)
+  Redis key metrics:<process>       JSON summary for the dashboard: per
+                                    stage count, rate, mean, p50/p95/p99,
+                                    counters and gauges, refreshed every
+                                    metrics.publish_interval seconds and
+                                    expiring shortly after the process stops
+
+Histograms cover the whole process lifetime. Percentiles are estimated
+from the buckets (linear within a bucket, capped at the largest sample),
+so they are as precise as the bucket edges around them.
+
+Usage:
+    from metrics import get_metrics, start_metrics
+    m = get_metrics()
+    m.inc("transactions", len(batch))
+    m.set("backlog", 1200)
+    with m.timer("snapshot"):
+        ...
+    m.observe("end_to_end", seconds)
+    start_metrics("feature_engine")
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from settings import get_setting
+
+# ── Bucket upper bounds in seconds (Prometheus "le"); +Inf is implicit ──
+BUCKETS = (
+    0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0,
+)
+STAGES = ("decode", "redis_update", "classify", "score", "snapshot", "end_to_end", "scan", "archive", "lag_drain")
+
+KEY_PREFIX = "metrics:"
+DEFAULT_PORTS = {
+    "feature_engine": 9401,
+    "stream_processor": 9402,
+    "risk_engine": 9403,
+    "alert_engine": 9404,
+    "intervention_engine": 9405,
+    "transactions_consumer": 9406,
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram (counts per bucket, plus sum, count and max)."""
+
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.max
+
+
+class Metrics:
+    """Per-process registry of counters and stage histograms."""
+
+    def __init__(self, process="equilibrate"):
+        self.process = process
+        self.started = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name, value):
+        self.gauges[name] = value
+
+    def observe(self, stage, seconds):
+        i = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            h = self.histograms.get(stage)
+            if h is None:
+                h = self.histograms[stage] = Histogram()
+            h.counts[i] += 1
+            h.sum += seconds
+            h.count += 1
+            if seconds > h.max:
+                h.max = seconds
+
+    def timer(self, stage):
+        return _Timer(self, stage)
+
+    # ── Export ──
+
+    def _copy(self):
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {}
+            for stage, h in self.histograms.items():
+                c = Histogram()
+                c.counts, c.sum, c.count, c.max = list(h.counts), h.sum, h.count, h.max
+                histograms[stage] = c
+        return counters, gauges, histograms
+
+    def prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        counters, gauges, histograms = self._copy()
+        label = f'process="{self.process}"'
+        lines = [
+            "# HELP equilibrate_uptime_seconds Seconds since the process started.",
+            "# TYPE equilibrate_uptime_seconds gauge",
+            f"equilibrate_uptime_seconds{{{label}}} {time.time() - self.started:.3f}",
+        ]
+        for name in sorted(counters):
+            metric = f"equilibrate_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{{{label}}} {counters[name]}")
+        for name in sorted(gauges):
+            if gauges[name] is None:
+                continue
+            lines.append(f"# TYPE equilibrate_{name} gauge")
+            lines.append(f"equilibrate_{name}{{{label}}} {gauges[name]}")
+        if histograms:
+            lines.append("# HELP equilibrate_stage_seconds Latency per pipeline stage.")
+            lines.append("# TYPE equilibrate_stage_seconds histogram")
+        for stage in sorted(histograms):
+            h = histograms[stage]
+            cumulative = 0
+            for le, n in zip(BUCKETS + ("+Inf",), h.counts):
+                cumulative += n
+                lines.append(f'equilibrate_stage_seconds_bucket{{{label},stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'equilibrate_stage_seconds_sum{{{label},stage="{stage}"}} {h.sum:.6f}')
+            lines.append(f'equilibrate_stage_seconds_count{{{label},stage="{stage}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self, previous=None, interval=None):
+        """JSON-ready summary; rates are per second since `previous` (an older summary)."""
+        counters, gauges, histograms = self._copy()
+        prev_counters = (previous or {}).get("counters", {})
+        prev_stages = (previous or {}).get("stages", {})
+        elapsed = interval or max(time.time() - self.started, 1.0)
+        stages = {}
+        for stage, h in histograms.items():
+            stages[stage] = {
+                "count": h.count,
+                "rate": round((h.count - prev_stages.get(stage, {}).get("count", 0)) / elapsed, 2),
+                "mean_ms": round(1000 * h.sum / h.count, 3) if h.count else 0.0,
+                "p50_ms": round(1000 * h.quantile(0.50), 3),
+                "p95_ms": round(1000 * h.quantile(0.95), 3),
+                "p99_ms": round(1000 * h.quantile(0.99), 3),
+                "max_ms": round(1000 * h.max, 3),
+            }
+        return {
+            "process": self.process,
+            "pid": os.getpid(),
+            "updated_at": time.time(),
+            "uptime_s": round(time.time() - self.started, 1),
+            "counters": counters,
+            "rates": {k: round((v - prev_counters.get(k, 0)) / elapsed, 2) for k, v in counters.items()},
+            "gauges": gauges,
+            "stages": stages,
+        }
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "t0")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.t0)
+        return False
+
+
+# ═══════════════════════════════════════════════════════════════
+# EXPORTERS
+# ═══════════════════════════════════════════════════════════════
+
+def _serve_http(metrics, port):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # only processes that export
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # keep scrapes out of the process log
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def _publish_loop(metrics, interval):
+    from redis_client import get_redis
+    key = KEY_PREFIX + metrics.process
+    previous, last, failing = None, time.time(), False
+    while True:
+        time.sleep(interval)
+        now = time.time()
+        summary = metrics.summary(previous, now - last)
+        try:
+            get_redis().set(key, json.dumps(summary), ex=max(30, int(3 * interval)))
+            if failing:
+                print(f"  [Metrics] Publishing {key} again")
+            failing = False
+        except Exception as e:
+            if not failing:  # report once per outage, not every interval
+                print(f"  [Metrics] Could not publish {key}: {e.__class__.__name__}: {e}")
+            failing = True
+        previous, last = summary, now
+
+
+def start_metrics(process):
+    """Name this process's metrics and start the HTTP and Redis exporters.
+
+    Returns the registry. Safe to call more than once (later calls only
+    return the registry).
+    """
+    global _exporting
+    metrics = get_metrics()
+    if _exporting:
+        return metrics
+    _exporting = True
+    metrics.process = process
+    if not get_setting("metrics", "enabled", True):
+        return metrics
+
+    port = get_setting("metrics", f"{process}_port", DEFAULT_PORTS.get(process, 0))
+    if port:
+        try:
+            _serve_http(metrics, port)
+            print(f"  [Metrics] Serving http://127.0.0.1:{port}/metrics")
+        except OSError as e:
+            print(f"  [Metrics] HTTP endpoint disabled (port {port}: {e.strerror})")
+    interval = get_setting("metrics", "publish_interval", 5.0)
+    if interval > 0:
+        threading.Thread(target=_publish_loop, args=(metrics, interval),
+                         name="metrics-publish", daemon=True).start()
+    return metrics
+
+
+def read_summaries(client=None):
+    """{process: summary} for every process currently publishing to Redis."""
+    if client is None:
+        from redis_client import get_redis
+        client = get_redis()
+    keys = sorted(client.scan_iter(match=KEY_PREFIX + "*", count=100))
+    out = {}
+    for key, raw in zip(keys, client.mget(keys) if keys else []):
+        if raw:
+            summary = json.loads(raw)
+            out[summary.get("process", str(key)[len(KEY_PREFIX):])] = summary
+    return out
+
+
+# ═══════════════════════════════════════════════════════════════
+# SINGLETON
+# ═══════════════════════════════════════════════════════════════
+
+_metrics = None
+_exporting = False
+
+
+def get_metrics():
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
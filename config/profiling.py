@@ -0,0 +1,319 @@
+"""
+Equilibrate — On-Demand Profiling
+Profiles a running engine without restarting it under cProfile.
+
+Triggers (in any process that calls start_profiling(process)):
+
+  SIGUSR1                      statistical stack sampling
+  SIGUSR2                      cProfile
+  EQ_PROFILE_ON_START=<mode>   profile from the first batch (sample | cprofile)
+  Redis key profile:<process>  "sample", "cprofile" or JSON {"mode", "seconds", "txns"};
+                               checked every profile.poll_interval seconds and
+                               deleted when taken. Set it with
+                               python config/profiling.py feature_engine --mode cprofile
+
+A profile runs for profile.seconds (30) or until profile.txns transactions
+have been processed (0 = no limit), whichever comes first. It covers the
+engine loop only: the loop calls tick() once per batch or scan, and
+profiles start and stop at those calls. Sampling reads the loop thread's
+stack every profile.sample_interval seconds from a helper thread, so it
+costs almost nothing; cProfile traces every call and slows the loop down.
+
+Output (profile.dir, default data/profiles/; <stamp> is local YYYYmmdd-HHMMSS):
+
+  <process>-<stamp>.prof          cProfile stats (pstats, snakeviz)
+  <process>-<stamp>-cprofile.txt  top functions by cumulative time
+  <process>-<stamp>.folded        sampled stacks, one "a;b;c count" line each
+                                  (flamegraph.pl, speedscope)
+  <process>-<stamp>-sample.txt    top functions by own and total samples
+  <process>-<stamp>-memory.txt    tracemalloc growth since the previous
+                                  snapshot, every profile.tracemalloc_interval
+                                  seconds (0 = off; tracing slows allocation)
+
+Usage:
+    from profiling import start_profiling
+    profiler = start_profiling("feature_engine")
+    while True:
+        ...
+        profiler.tick(len(batch))
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from settings import get_setting
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILE_DIR = os.path.join(BASE_DIR, "data", "profiles")
+KEY_PREFIX = "profile:"
+MODES = ("sample", "cprofile")
+TOP_N = 40
+
+
+def parse_request(value):
+    """"sample" / "cprofile" / JSON object -> (mode, seconds, txns); raises ValueError."""
+    value = value.decode("utf-8") if isinstance(value, bytes) else str(value)
+    request = json.loads(value) if value.lstrip().startswith("{") else {"mode": value.strip()}
+    mode = request.get("mode", "sample")
+    if mode not in MODES:
+        raise ValueError(f"Unknown profile mode {mode!r} (expected one of {MODES})")
+    return mode, request.get("seconds"), request.get("txns")
+
+
+class StackSampler:
+    """Counts the stacks of one thread, sampled from a daemon thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def write(self, base):
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+        own, total = Counter(), Counter()
+        for stack, n in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += n
+            for func in set(frames):
+                total[func] += n
+        with open(base + "-sample.txt", "w", encoding="utf-8") as f:
+            f.write(f"{self.samples} samples every {self.interval * 1000:g} ms\n\n")
+            for title, counts in (("own", own), ("total", total)):
+                f.write(f"{'samples':>8} {'%':>6}  function ({title})\n")
+                for func, n in counts.most_common(TOP_N):
+                    f.write(f"{n:>8} {100 * n / max(self.samples, 1):>6.1f}  {func}\n")
+                f.write("\n")
+        return [base + ".folded", base + "-sample.txt"]
+
+
+class Profiler:
+    """Starts and stops requested profiles at the engine loop's tick() calls."""
+
+    def __init__(self, process, out_dir=None):
+        self.process = process
+        self.out_dir = out_dir or get_setting("profile", "dir", PROFILE_DIR)
+        self.seconds = get_setting("profile", "seconds", 30.0)
+        self.txns = get_setting("profile", "txns", 0)
+        self.sample_interval = get_setting("profile", "sample_interval", 0.005)
+        self._requested = None
+        self._session = None
+
+    def request(self, mode, seconds=None, txns=None):
+        """Ask for a profile; it starts at the next tick(). Safe from signal handlers and threads."""
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode {mode!r} (expected one of {MODES})")
+        self._requested = (mode, seconds or self.seconds, self.txns if txns is None else txns)
+
+    @property
+    def active(self):
+        return self._session is not None
+
+    def tick(self, n=0):
+        """Call once per batch/scan from the loop thread, with the transactions it processed."""
+        session = self._session
+        if session is not None:
+            session["count"] += n
+            if (time.monotonic() - session["started"] >= session["seconds"]
+                    or (session["txns"] and session["count"] >= session["txns"])):
+                self.stop()
+        elif self._requested is not None:
+            self._start(*self._requested)
+            self._requested = None
+
+    def _start(self, mode, seconds, txns):
+        session = {"mode": mode, "seconds": seconds, "txns": txns, "count": 0,
+                   "stamp": time.strftime("%Y%m%d-%H%M%S")}
+        if mode == "cprofile":
+            import cProfile  # only when asked for
+            session["profiler"] = cProfile.Profile()
+            session["profiler"].enable()
+        else:
+            session["profiler"] = StackSampler(threading.get_ident(), self.sample_interval)
+            session["profiler"].start()
+        limit = f"{seconds:g}s" + (f" or {txns:,} transactions" if txns else "")
+        print(f"  [Profile] {self.process}: {mode} profile started ({limit})")
+        session["started"] = time.monotonic()
+        self._session = session
+
+    def stop(self):
+        """Finish the running profile and write it out; returns the files written."""
+        session, self._session = self._session, None
+        if session is None:
+            return []
+        profiler = session["profiler"]
+        if session["mode"] == "cprofile":
+            profiler.disable()
+        else:
+            profiler.stop()
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, f"{self.process}-{session['stamp']}")
+        if session["mode"] == "cprofile":
+            paths = _write_cprofile(profiler, base)
+        else:
+            paths = profiler.write(base)
+        elapsed = time.monotonic() - session["started"]
+        print(f"  [Profile] {self.process}: {session['mode']} profile of {elapsed:.1f}s / "
+              f"{session['count']:,} transactions -> {', '.join(os.path.relpath(p, BASE_DIR) for p in paths)}")
+        return paths
+
+
+def _write_cprofile(profiler, base):
+    import io
+    import pstats
+    profiler.dump_stats(base + ".prof")
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(TOP_N)
+    with open(base + "-cprofile.txt", "w", encoding="utf-8") as f:
+        f.write(out.getvalue())
+    return [base + ".prof", base + "-cprofile.txt"]
+
+
+# ═══════════════════════════════════════════════════════════════
+# TRIGGERS
+# ═══════════════════════════════════════════════════════════════
+
+def _install_signals(profiler):
+    import signal
+    for name, mode in (("SIGUSR1", "sample"), ("SIGUSR2", "cprofile")):
+        if not hasattr(signal, name):
+            return  # Windows: use the Redis key or EQ_PROFILE_ON_START
+        signal.signal(getattr(signal, name), lambda _sig, _frame, m=mode: profiler.request(m))
+
+
+def _poll_control_key(profiler, interval):
+    from redis_client import get_redis
+    key = KEY_PREFIX + profiler.process
+    failing = False
+    while True:
+        time.sleep(interval)
+        try:
+            pipe = get_redis().pipeline(transaction=True)
+            pipe.get(key)
+            pipe.delete(key)
+            value, _deleted = pipe.execute()
+            failing = False
+        except Exception as e:
+            if not failing:  # report once per outage
+                print(f"  [Profile] Could not read {key}: {e.__class__.__name__}: {e}")
+            failing = True
+            continue
+        if value:
+            try:
+                profiler.request(*parse_request(value))
+            except ValueError as e:  # includes malformed JSON
+                print(f"  [Profile] Ignoring {key}={value!r}: {e}")
+
+
+def _memory_loop(process, out_dir, interval, frames):
+    import tracemalloc
+    tracemalloc.start(frames)
+    exclude = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen *>")]
+    previous = tracemalloc.take_snapshot().filter_traces(exclude)
+    while True:
+        time.sleep(interval)
+        snapshot = tracemalloc.take_snapshot().filter_traces(exclude)
+        stats = snapshot.compare_to(previous, "lineno")
+        previous = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        growth = sum(s.size_diff for s in stats)
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, f"{process}-{time.strftime('%Y%m%d-%H%M%S')}-memory.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"traced {current / 2**20:.1f} MiB (peak {peak / 2**20:.1f} MiB), "
+                    f"{growth / 2**20:+.2f} MiB in the last {interval:g}s\n\n")
+            for stat in stats[:TOP_N]:
+                f.write(f"{stat}\n")
+        top = stats[0].traceback[0] if stats and stats[0].size_diff > 0 else None
+        print(f"  [Profile] Memory {current / 2**20:.1f} MiB ({growth / 2**20:+.2f} MiB)"
+              + (f", most growth at {os.path.basename(top.filename)}:{top.lineno}" if top else "")
+              + f" -> {os.path.relpath(path, BASE_DIR)}")
+
+
+def start_profiling(process):
+    """Create this process's profiler and install its triggers; returns it.
+
+    Call from the main thread (signal handlers can only be installed there).
+    Safe to call more than once.
+    """
+    global _profiler
+    if _profiler is not None:
+        return _profiler
+    profiler = _profiler = Profiler(process)
+    _install_signals(profiler)
+
+    on_start = get_setting("profile", "on_start", "")
+    if on_start:
+        try:
+            profiler.request(on_start)
+        except ValueError as e:
+            print(f"  [Profile] {e}")
+    interval = get_setting("profile", "poll_interval", 5.0)
+    if interval > 0:
+        threading.Thread(target=_poll_control_key, args=(profiler, interval),
+                         name="profile-control", daemon=True).start()
+    memory_interval = get_setting("profile", "tracemalloc_interval", 0.0)
+    if memory_interval > 0:
+        threading.Thread(target=_memory_loop,
+                         args=(process, profiler.out_dir, memory_interval,
+                               get_setting("profile", "tracemalloc_frames", 1)),
+                         name="profile-memory", daemon=True).start()
+    return profiler
+
+
+_profiler = None
+
+
+def get_profiler():
+    return _profiler
+
+
+# ═══════════════════════════════════════════════════════════════
+# CLI — request a profile from a running process
+# ═══════════════════════════════════════════════════════════════
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Ask a running engine for a profile (Redis key profile:<process>)")
+    parser.add_argument("process", help="e.g. feature_engine, risk_engine, stream_processor")
+    parser.add_argument("--mode", choices=MODES, default="sample")
+    parser.add_argument("--seconds", type=float, default=None)
+    parser.add_argument("--txns", type=int, default=None)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.join(BASE_DIR, "storage"))
+    from redis_client import get_redis
+    request = {k: v for k, v in vars(args).items() if k != "process" and v is not None}
+    get_redis().set(KEY_PREFIX + args.process, json.dumps(request), ex=300)
+    print(f"[Profile] Requested {json.dumps(request)} from {args.process}; "
+          f"output in {os.path.relpath(get_setting('profile', 'dir', PROFILE_DIR), BASE_DIR)}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Equilibrate — Runtime Settings
+Single place where every process reads its configuration.
+
+Lookup order for get_setting("redis", "host", "localhost"):
+  1. environment variable  EQ_REDIS_HOST
+  2. config file           {"redis": {"host": ...}}
+  3. the default passed in
+
+The config file defaults to config/equilibrate.json (optional) and can be
+pointed elsewhere with EQ_CONFIG. See config/equilibrate.example.json.
+Values from the environment are cast to the type of the default.
+"""
+import json
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.environ.get("EQ_CONFIG", os.path.join(BASE_DIR, "config", "equilibrate.json"))
+
+_config_cache = None
+
+_TRUE = {"1", "true", "yes", "on"}
+
+
+def load_config():
+    """Load the JSON config file once. A missing file means all defaults."""
+    global _config_cache
+    if _config_cache is None:
+        try:
+            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+                _config_cache = json.load(f)
+        except FileNotFoundError:
+            _config_cache = {}
+        except Exception as e:
+            print(f"  [Settings] Warning: Could not read {CONFIG_PATH} — {e}")
+            _config_cache = {}
+    return _config_cache
+
+
+def _cast(value, default):
+    if default is None or not isinstance(value, str):
+        return value
+    if isinstance(default, bool):
+        return value.strip().lower() in _TRUE
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, float):
+        return float(value)
+    return value
+
+
+def get_setting(section, key, default=None):
+    """Resolve one setting from env, then config file, then default."""
+    env_name = f"EQ_{section}_{key}".upper()
+    if env_name in os.environ:
+        return _cast(os.environ[env_name], default)
+    value = load_config().get(section, {}).get(key)
+    if value is None:
+        return default
+    return _cast(value, default)
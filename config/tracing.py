@@ -0,0 +1,224 @@
+"""
+Equilibrate — Transaction Tracing
+Follows a sample of transactions from the producer to the dashboard, so
+"how long until an officer sees it" has a measured answer.
+
+The producer stamps a sampled transaction (trace.sample_rate, default 1%)
+with two extra message fields:
+
+  trace_id     16 hex chars
+  emitted_at   epoch seconds when it was sent
+
+Each stage that handles a traced transaction records the wall time of
+its hop:
+
+  emit          producer send
+  decode        consumer decoded it from the wire (broker transports)
+  score         features, hardship and risk score computed
+  features      profile written to the feature store
+  snapshot      snapshot row written (absent when the cooldown skipped it)
+  risk_pickup   end of the first risk monitor scan that started after the write
+  dashboard     first dashboard data refresh that started after the write
+
+Storage (Redis, written in the background once a second, never on the
+hot path):
+
+  trace:{trace_id}         hash of hop -> epoch seconds (+ customer_id),
+                           expires after trace.ttl seconds
+  traces                   list of the newest trace.ring_size trace ids
+  trace:pending:{hop}      customer_id -> trace_id waiting for the
+                           risk_pickup / dashboard hop (the newest
+                           trace per customer; older ones end at features)
+
+Hop times come from each process's wall clock, so every process should
+run on the same host (or NTP-synced hosts). Report with
+benchmarks/trace_report.py.
+
+Usage:
+    from tracing import get_tracer, stamp
+    txn = stamp(txn)                                  # producer
+    get_tracer().record(txn["trace_id"], "decode")    # any stage
+    armed = get_tracer().collect("risk_pickup")       # risk monitor / dashboard,
+    ...                                               # before a full pass
+    get_tracer().complete(armed, "risk_pickup")       # after it
+"""
+import random
+import threading
+import time
+import uuid
+
+from settings import get_setting
+
+TRACE_FIELDS = ("trace_id", "emitted_at")
+HOPS = ("emit", "decode", "score", "features", "snapshot", "risk_pickup", "dashboard")
+PENDING_HOPS = ("risk_pickup", "dashboard")
+
+RING_KEY = "traces"
+TRACE_PREFIX = "trace:"
+PENDING_PREFIX = "trace:pending:"
+FLUSH_INTERVAL = 1.0
+
+
+def trace_key(trace_id):
+    return f"{TRACE_PREFIX}{trace_id}"
+
+
+def stamp(txn, rate=None):
+    """Add trace_id/emitted_at to a sampled transaction (in place); returns txn."""
+    rate = get_setting("trace", "sample_rate", 0.01) if rate is None else rate
+    if rate > 0 and random.random() < rate:
+        txn["trace_id"] = uuid.uuid4().hex[:16]
+        txn["emitted_at"] = time.time()
+    return txn
+
+
+class Tracer:
+    """Buffers hop timestamps and writes them to Redis from a daemon thread."""
+
+    def __init__(self, client=None, ttl=None, ring_size=None):
+        self._client = client
+        self.ttl = ttl or get_setting("trace", "ttl", 3600)
+        self.ring_size = ring_size or get_setting("trace", "ring_size", 10_000)
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._failing = False
+
+    @property
+    def r(self):
+        if self._client is None:
+            from redis_client import get_redis
+            self._client = get_redis()
+        return self._client
+
+    def record(self, trace_id, hop, at=None, customer_id=None, pending=()):
+        """Queue one hop; pending hops are armed for this customer (see collect())."""
+        with self._lock:
+            self._buffer.append((trace_id, hop, time.time() if at is None else at, customer_id, pending))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flush_loop, name="trace-flush", daemon=True)
+                self._thread.start()
+
+    def record_many(self, txns, hop, at=None, pending=()):
+        """record() for every traced transaction in txns."""
+        at = time.time() if at is None else at
+        for txn in txns:
+            trace_id = txn.get("trace_id")
+            if trace_id:
+                self.record(trace_id, hop, at, str(txn.get("customer_id", "")), pending)
+
+    def flush(self):
+        with self._lock:
+            buffer, self._buffer = self._buffer, []
+        if not buffer:
+            return 0
+        pipe = self.r.pipeline(transaction=False)
+        for trace_id, hop, at, customer_id, pending in buffer:
+            key = trace_key(trace_id)
+            mapping = {hop: f"{at:.6f}"}
+            if customer_id:
+                mapping["customer_id"] = customer_id
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, self.ttl)
+            if hop == "emit":
+                pipe.lpush(RING_KEY, trace_id)
+            for pending_hop in pending:
+                pipe.hset(PENDING_PREFIX + pending_hop, customer_id, trace_id)
+        if any(hop == "emit" for _t, hop, _a, _c, _p in buffer):
+            pipe.ltrim(RING_KEY, 0, self.ring_size - 1)
+        pipe.execute()
+        return len(buffer)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+                self._failing = False
+            except Exception as e:
+                if not self._failing:  # report once per outage
+                    print(f"  [Trace] Could not write traces: {e.__class__.__name__}: {e}")
+                self._failing = True
+
+    def collect(self, hop):
+        """Take every trace armed for `hop` ({customer_id: trace_id}).
+
+        Call at the start of a pass over all customers (risk scan, dashboard
+        refresh) and complete() the result when the pass has finished.
+        """
+        try:
+            pipe = self.r.pipeline(transaction=True)
+            pipe.hgetall(PENDING_PREFIX + hop)
+            pipe.delete(PENDING_PREFIX + hop)
+            armed, _deleted = pipe.execute()
+        except Exception as e:
+            if not self._failing:
+                print(f"  [Trace] Could not read pending {hop} traces: {e.__class__.__name__}: {e}")
+            self._failing = True
+            return {}
+        return armed
+
+    def complete(self, armed, hop, at=None):
+        """Record `hop` for traces taken with collect()."""
+        at = time.time() if at is None else at
+        for customer_id, trace_id in armed.items():
+            self.record(trace_id, hop, at, customer_id)
+
+
+# ═══════════════════════════════════════════════════════════════
+# READING
+# ═══════════════════════════════════════════════════════════════
+
+def load_traces(client=None, limit=None):
+    """Newest traces as dicts of hop -> epoch seconds (missing hops omitted)."""
+    if client is None:
+        from redis_client import get_redis
+        client = get_redis()
+    ids = client.lrange(RING_KEY, 0, (limit or 0) - 1)
+    pipe = client.pipeline(transaction=False)
+    for trace_id in ids:
+        pipe.hgetall(trace_key(trace_id))
+    traces = []
+    for trace_id, fields in zip(ids, pipe.execute() if ids else []):
+        if not fields:
+            continue  # expired
+        trace = {"trace_id": trace_id, "customer_id": fields.pop("customer_id", "")}
+        trace.update({hop: float(fields[hop]) for hop in HOPS if hop in fields})
+        traces.append(trace)
+    return traces
+
+
+def hop_latencies(traces):
+    """Seconds per step and since emit: ({"prev -> hop": [...]}, {hop: [...]}).
+
+    A missing hop is skipped, so the step spans from the last hop present.
+    """
+    steps, totals = {}, {}
+    for trace in traces:
+        previous = None
+        for hop in HOPS:
+            if hop not in trace:
+                continue
+            if previous is not None:
+                steps.setdefault(f"{previous} -> {hop}", []).append(trace[hop] - trace[previous])
+            if hop != "emit" and "emit" in trace:
+                totals.setdefault(hop, []).append(trace[hop] - trace["emit"])
+            previous = hop
+    return steps, totals
+
+
+# ── Process-wide tracer (created on first use) ──
+_tracer = None
+
+
+def get_tracer():
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def set_tracer(tracer):
+    global _tracer
+    _tracer = tracer
+    return tracer
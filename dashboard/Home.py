@@ -289,6 +289,26 @@ if _os.path.isfile(trend_path):
 else:
     st.info("Risk trend file not found. Trends will appear once the portfolio overview page has been visited.")
 
+# ── Pipeline Health (engine metrics, config/metrics.py) ──
+st.markdown('<div class="eq-section-divider"></div>', unsafe_allow_html=True)
+st.markdown("## Pipeline Health")
+
+from utils import fetch_pipeline_metrics
+stage_df, summaries = fetch_pipeline_metrics()
+if summaries:
+    cols = st.columns(len(summaries))
+    for col, (process, summary) in zip(cols, sorted(summaries.items())):
+        rates = summary.get("rates", {})
+        gauges = summary.get("gauges", {})
+        main_rate = rates.get("transactions", rates.get("messages", rates.get("customers_evaluated", 0)))
+        with col:
+            st.metric(process.replace("_", " ").title(), f"{main_rate:,.0f}/s",
+                      help=f"Backlog: {gauges['backlog']:,}" if gauges.get("backlog") is not None else None)
+    if not stage_df.empty:
+        st.dataframe(stage_df, use_container_width=True, hide_index=True)
+else:
+    st.info("No engine metrics published yet (start the feature engine or risk monitor).")
+
 # ── Navigation Cards ──
 st.markdown('<div class="eq-section-divider"></div>', unsafe_allow_html=True)
 st.markdown("## Operations Modules")
@@ -5,7 +5,7 @@ Writes feedback to Redis for the ML feedback loop.
 """
 import csv
 import os
-import redis
+import sys
 import pandas as pd
 from datetime import datetime
 
@@ -20,7 +20,8 @@ INTERVENTION_FIELDS = [
 AUDIT_LOG_PATH = INTERVENTION_LOG_PATH
 AUDIT_FIELDS = INTERVENTION_FIELDS
 
-r = redis.Redis(host="localhost", port=6379, decode_responses=True)
+sys.path.insert(0, os.path.join(BASE_DIR, "features"))
+from redis_store import get_store
 
 
 def _ensure_log_exists():
@@ -55,9 +56,8 @@ def log_audit_event(
         writer.writerow(row)
 
     # Write feedback to Redis (closes ML feedback loop)
-    key = f"customer:{customer_id}"
     try:
-        r.hset(key, mapping={
+        get_store().put(customer_id, {
             "last_intervention": action_type,
             "intervention_status": action_type,
             "intervention_timestamp": now,
@@ -0,0 +1,81 @@
+"""
+Equilibrate — Dashboard Customer Data
+Builds the portfolio DataFrame the dashboard pages share: every profile in
+the feature store, numeric columns converted, static attributes from
+customers.csv merged in.
+
+No Streamlit here: dashboard/utils.py wraps build_customer_frame() in
+st.cache_data for the pages, and benchmarks call it directly.
+"""
+import os
+import sys
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CUSTOMERS_CSV = os.path.join(BASE_DIR, "data", "customers.csv")
+
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+sys.path.insert(0, os.path.join(BASE_DIR, "features"))
+from redis_store import get_store
+from profile_codec import decode_profile
+
+NUMERIC_COLS = [
+    "txn_count", "total_spend", "essential_spend", "discretionary_spend",
+    "salary_count", "days_since_salary", "atm_withdrawals_7d",
+    "txn_frequency_7d", "spending_change_pct", "risk_score", "withdrawals",
+]
+
+
+def load_static_customers(path=CUSTOMERS_CSV):
+    """{customer_id: {city, employment_type, age, salary}} from customers.csv ({} if unreadable)."""
+    try:
+        df = pd.read_csv(path)
+        df["customer_id"] = df["customer_id"].astype(str)
+        return df.set_index("customer_id")[["city", "employment_type", "age", "salary"]].to_dict("index")
+    except Exception:
+        return {}
+
+
+def build_customer_frame(store=None, static=None):
+    """Fetch all customer profiles, merge static data, return a DataFrame (empty if none)."""
+    store = store or get_store()
+    ids = list(store.scan())
+    if not ids:
+        return pd.DataFrame()
+
+    rows = []
+    for cid, data in zip(ids, store.batch_get(ids)):
+        if data:
+            profile = {k: v for k, v in decode_profile(data).items() if not k.startswith("_")}
+            if "customer_id" not in profile:
+                profile["customer_id"] = cid
+            rows.append(profile)
+
+    if not rows:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(rows)
+
+    # Type conversions for numeric columns
+    for col in NUMERIC_COLS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+
+    # ── Merge static customer data (city, employment_type, age) ──
+    if static is None:
+        static = load_static_customers()
+    if static and "customer_id" in df.columns:
+        df["customer_id"] = df["customer_id"].astype(str)
+        df["city"] = df["customer_id"].map(lambda cid: static.get(cid, {}).get("city", "Unknown"))
+        df["employment_type"] = df["customer_id"].map(
+            lambda cid: static.get(cid, {}).get("employment_type", "Unknown")
+        )
+        df["age"] = df["customer_id"].map(
+            lambda cid: static.get(cid, {}).get("age", 0)
+        )
+        df["static_salary"] = df["customer_id"].map(
+            lambda cid: static.get(cid, {}).get("salary", 0)
+        )
+
+    return df
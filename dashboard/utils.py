@@ -4,31 +4,32 @@ Redis data access, static CSV merge, risk analysis, sidebar builder.
 Feedback loop writes intervention data back to Redis.
 Policy-based message generation.
 """
-import redis
 import pandas as pd
 import json
 import os
 import sys
 import streamlit as st
 from datetime import datetime
+from itertools import islice
 
 # Add ui module to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from ui.theme import apply_theme
+from customer_data import build_customer_frame, load_static_customers
 
-# ── Redis Connection ──
-_redis_client = None
-
-
-def get_redis():
-    global _redis_client
-    if _redis_client is None:
-        _redis_client = redis.Redis(host="localhost", port=6379, decode_responses=True)
-    return _redis_client
-
+# ── Feature store (Redis by default, see features/redis_store.py) ──
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+sys.path.insert(0, os.path.join(BASE_DIR, "storage"))
+sys.path.insert(0, os.path.join(BASE_DIR, "features"))
+from metrics import STAGES, read_summaries
+from redis_client import get_redis
+from redis_store import get_store
+from tracing import get_tracer
+from profile_codec import decode_profile
+from profile_tiering import rehydrate
 
 # ── Policy Templates ──
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 POLICY_PATH = os.path.join(BASE_DIR, "risk", "policy_templates.json")
 CUSTOMERS_CSV = os.path.join(BASE_DIR, "data", "customers.csv")
 _policy_cache = None
@@ -50,14 +51,7 @@ def _load_static_customers():
     """Load static customer data from customers.csv (city, employment_type, age, salary)."""
     global _static_cache
     if _static_cache is None:
-        try:
-            df = pd.read_csv(CUSTOMERS_CSV)
-            df["customer_id"] = df["customer_id"].astype(str)
-            _static_cache = df.set_index("customer_id")[
-                ["city", "employment_type", "age", "salary"]
-            ].to_dict("index")
-        except Exception:
-            _static_cache = {}
+        _static_cache = load_static_customers(CUSTOMERS_CSV)
     return _static_cache
 
 
@@ -71,77 +65,66 @@ REFRESH_INTERVAL_MS = 180_000
 
 @st.cache_data(ttl=10)
 def fetch_all_customers():
-    """Fetch all customer profiles from Redis, merge static CSV data, return DataFrame."""
-    r = get_redis()
-    keys = r.keys("customer:*")
-    if not keys:
-        return pd.DataFrame()
-
-    rows = []
-    for key in keys:
-        data = r.hgetall(key)
-        if data:
-            profile = {k: v for k, v in data.items() if not k.startswith("_")}
-            if "customer_id" not in profile:
-                profile["customer_id"] = key.split(":", 1)[1]
-            rows.append(profile)
-
-    if not rows:
-        return pd.DataFrame()
-
-    df = pd.DataFrame(rows)
-
-    # Type conversions for numeric columns
-    numeric_cols = [
-        "txn_count", "total_spend", "essential_spend", "discretionary_spend",
-        "salary_count", "days_since_salary", "atm_withdrawals_7d",
-        "txn_frequency_7d", "spending_change_pct", "risk_score", "withdrawals",
-    ]
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-
-    # ── Merge static customer data (city, employment_type, age) ──
-    static = _load_static_customers()
-    if static and "customer_id" in df.columns:
-        df["customer_id"] = df["customer_id"].astype(str)
-        df["city"] = df["customer_id"].map(lambda cid: static.get(cid, {}).get("city", "Unknown"))
-        df["employment_type"] = df["customer_id"].map(
-            lambda cid: static.get(cid, {}).get("employment_type", "Unknown")
-        )
-        df["age"] = df["customer_id"].map(
-            lambda cid: static.get(cid, {}).get("age", 0)
-        )
-        df["static_salary"] = df["customer_id"].map(
-            lambda cid: static.get(cid, {}).get("salary", 0)
-        )
+    """Fetch all customer profiles from Redis, merge static CSV data, return DataFrame.
 
+    The work is customer_data.build_customer_frame(); this wrapper caches it
+    for the pages. Each refresh (cache miss) completes the "dashboard" hop of
+    the traces armed before it started (config/tracing.py).
+    """
+    tracer = get_tracer()
+    armed = tracer.collect("dashboard")
+    df = build_customer_frame(get_store(), _load_static_customers())
+    tracer.complete(armed, "dashboard")
     return df
 
 
+@st.cache_data(ttl=5)
+def fetch_pipeline_metrics():
+    """Stage latency table from the summaries the engines publish (metrics:*).
+
+    Returns (DataFrame with one row per process and stage, {process: summary}).
+    """
+    try:
+        summaries = read_summaries()
+    except Exception:
+        return pd.DataFrame(), {}
+    rows = []
+    for process, summary in sorted(summaries.items()):
+        stages = summary.get("stages", {})
+        for stage in sorted(stages, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES)):
+            stats = stages[stage]
+            rows.append({
+                "Process": process,
+                "Stage": stage,
+                "Per sec": stats["rate"],
+                "Mean ms": stats["mean_ms"],
+                "p50 ms": stats["p50_ms"],
+                "p95 ms": stats["p95_ms"],
+                "p99 ms": stats["p99_ms"],
+                "Count": stats["count"],
+            })
+    return pd.DataFrame(rows), summaries
+
+
 def get_last_live_transaction_time():
     """Read the most recent 'last_updated' timestamp across all customers."""
-    r = get_redis()
-    keys = r.keys("customer:*")
-    if not keys:
-        return None
-    latest = None
-    for key in keys[:200]:
-        ts = r.hget(key, "last_updated")
-        if ts and (latest is None or ts > latest):
-            latest = ts
-    return latest
+    return _latest_field("last_updated")
 
 
 def get_last_risk_evaluation_time():
     """Read the most recent 'last_risk_eval' timestamp across all customers."""
-    r = get_redis()
-    keys = r.keys("customer:*")
-    if not keys:
+    return _latest_field("last_risk_eval")
+
+
+def _latest_field(field, sample=200):
+    """Latest value of a timestamp field over a sample of customers."""
+    store = get_store()
+    ids = list(islice(store.scan(sample), sample))
+    if not ids:
         return None
     latest = None
-    for key in keys[:200]:
-        ts = r.hget(key, "last_risk_eval")
+    for data in store.batch_get(ids):
+        ts = data.get(field)
         if ts and (latest is None or ts > latest):
             latest = ts
     return latest
@@ -149,12 +132,10 @@ def get_last_risk_evaluation_time():
 
 def get_customer_profile(customer_id):
     """Get a single customer's complete profile from Redis + static CSV."""
-    r = get_redis()
-    key = f"customer:{customer_id}"
-    data = r.hgetall(key)
+    data = rehydrate(customer_id)
     if not data:
         return None
-    profile = {k: v for k, v in data.items() if not k.startswith("_")}
+    profile = {k: v for k, v in decode_profile(data).items() if not k.startswith("_")}
     # Ensure customer_id exists
     if "customer_id" not in profile:
         profile["customer_id"] = str(customer_id)
@@ -199,10 +180,8 @@ def hardship_distribution(df):
 
 def write_intervention_feedback(customer_id, status, action_description):
     """Write intervention feedback back to Redis for the ML feedback loop."""
-    r = get_redis()
-    key = f"customer:{customer_id}"
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    r.hset(key, mapping={
+    get_store().put(customer_id, {
         "last_intervention": action_description,
         "intervention_status": status,
         "intervention_timestamp": now,
@@ -288,9 +267,8 @@ def render_sidebar():
 
         # System status
         try:
-            r = get_redis()
-            customer_count = len(r.keys("customer:*"))
-            r.ping()
+            customer_count = get_store().count()
+            get_redis().ping()
             redis_status = "Connected"
             redis_color = "#22C55E"
         except Exception:
@@ -0,0 +1,300 @@
+"""
+Equilibrate — Bulk Feature Backfill
+Rebuilds every customer profile from raw transactions in one pass, for use
+after a Redis loss or a rule change, instead of replaying transactions one
+by one through update_customer_features().
+
+  1. Read transactions_raw.csv (or archive files, .gz ok) in chunks
+  2. Per chunk: vectorized groupby aggregates + a bounded per-customer
+     tail (last 200 transactions, last 100 ATM withdrawals) for the
+     rolling windows
+  3. Derive the time features, score with the shared rules
+     (risk_rules.evaluate_arrays — the risk monitor's view, so hardship
+     is cleared for LOW)
+  4. Bulk-load the feature store with pipelined batch_update
+
+The result matches streaming the same transactions in timestamp order:
+"now" for each transaction is its own timestamp, so rolling windows and
+days_since_salary are computed in event time. Repeated transaction_ids
+(an at-least-once archive can hold redelivered rows) are counted once,
+and each profile's duplicate-detection ring is rebuilt from its last
+transactions. Only the fields owned by the feature update are written;
+intervention feedback is kept.
+
+Run:  python features/backfill_features.py [--input data/transactions_raw.csv ...]
+                                           [--chunksize 500000] [--dry-run]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from dateutil.tz import tzlocal
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "storage"))
+sys.path.insert(0, os.path.join(BASE_DIR, "risk"))
+sys.path.insert(0, os.path.join(BASE_DIR, "features"))
+
+from customer_features import (
+    DEDUP_WINDOW, ESSENTIAL_CATEGORIES, FEATURE_FIELDS, SEEN_FIELD, _new_profile, txn_fingerprint,
+)
+from profile_codec import encode_profile, get_encoding, stale_fields
+from profile_tiering import COLD_MARKER
+from redis_store import get_store
+from risk_rules import evaluate_arrays
+
+TXN_CSV = os.path.join(BASE_DIR, "data", "transactions_raw.csv")
+
+# transactions_raw.csv layout (older rows have no persona column)
+TXN_FIELDS = [
+    "transaction_id", "customer_id", "timestamp", "amount", "transaction_type",
+    "channel", "merchant_category", "is_salary", "persona",
+]
+
+# Rolling window limits (mirror customer_features._update_rolling_windows)
+WINDOW_SECONDS = 7 * 86400
+TXN_WINDOW_MAX = 200
+ATM_WINDOW_MAX = 100
+SPEND_HISTORY = 30
+
+SUM_COLS = ["txn_count", "total_spend", "essential_spend", "discretionary_spend",
+            "withdrawals", "salary_count"]
+TAIL_COLS = ["customer_id", "epoch", "amount", "transaction_id"]
+
+
+# ═══════════════════════════════════════════════════════════════
+# CHUNK PROCESSING
+# ═══════════════════════════════════════════════════════════════
+
+def read_chunks(paths, chunksize):
+    """Yield raw transaction chunks from every input file, in order."""
+    for path in paths:
+        yield from pd.read_csv(
+            path, names=TXN_FIELDS, header=None, skiprows=1, chunksize=chunksize,
+            dtype={"customer_id": str, "persona": str}, keep_default_na=False, na_values={"persona": [""]},
+        )
+
+
+def prepare_chunk(chunk):
+    """Typed columns + per-transaction flags, sorted by customer then time."""
+    c = pd.DataFrame({
+        "transaction_id": chunk["transaction_id"].astype(str),
+        "customer_id": chunk["customer_id"].astype(str),
+        "ts": pd.to_datetime(chunk["timestamp"], format="ISO8601"),
+        "amount": pd.to_numeric(chunk["amount"], errors="coerce").fillna(0.0),
+        "persona": chunk["persona"].where(~chunk["persona"].isin(["", "UNKNOWN"])),
+    })
+    debit = chunk["transaction_type"].str.upper().eq("DEBIT").to_numpy()
+    essential = chunk["merchant_category"].str.upper().isin(ESSENTIAL_CATEGORIES).to_numpy()
+    c["is_atm"] = chunk["channel"].str.upper().eq("ATM").to_numpy()
+    c["is_salary"] = pd.to_numeric(chunk["is_salary"], errors="coerce").fillna(0).to_numpy() != 0
+    c["debit_amount"] = np.where(debit, c["amount"], 0.0)
+    c["essential_amount"] = np.where(debit & essential, c["amount"], 0.0)
+    c["discretionary_amount"] = np.where(debit & ~essential, c["amount"], 0.0)
+    # datetime.timestamp() semantics: naive timestamps are local time
+    c["epoch"] = (
+        c["ts"].dt.tz_localize(tzlocal(), ambiguous="NaT", nonexistent="shift_forward")
+        - pd.Timestamp(0, tz="UTC")
+    ) / pd.Timedelta(seconds=1)
+    c["salary_ts"] = c["ts"].where(c["is_salary"])
+    return c.sort_values(["customer_id", "ts"], kind="stable")
+
+
+def drop_redelivered(c, tail):
+    """Drop rows whose transaction_id was already seen in this chunk or the carried tail."""
+    dup = c["transaction_id"].duplicated()
+    if tail is not None:
+        dup |= c["transaction_id"].isin(tail["transaction_id"])
+    return c[~dup.to_numpy()] if dup.any() else c
+
+
+def aggregate_chunk(c):
+    """Per-customer partial aggregates for one chunk."""
+    g = c.groupby("customer_id", sort=False)
+    return pd.DataFrame({
+        "txn_count": g.size(),
+        "total_spend": g["debit_amount"].sum(),
+        "essential_spend": g["essential_amount"].sum(),
+        "discretionary_spend": g["discretionary_amount"].sum(),
+        "withdrawals": g["is_atm"].sum(),
+        "salary_count": g["is_salary"].sum(),
+        "first_ts": g["ts"].min(),
+        "last_ts": g["ts"].max(),
+        "last_salary_ts": g["salary_ts"].max(),
+        "persona": g["persona"].first(),
+    })
+
+
+def combine_aggregates(parts):
+    """Merge partial aggregates (chunk order = time order)."""
+    merged = pd.concat(parts)
+    if not merged.index.has_duplicates:
+        return merged
+    g = merged.groupby(level=0, sort=False)
+    out = g[SUM_COLS].sum()
+    out["first_ts"] = g["first_ts"].min()
+    out["last_ts"] = g["last_ts"].max()
+    out["last_salary_ts"] = g["last_salary_ts"].max()
+    out["persona"] = g["persona"].first()
+    return out
+
+
+def extend_tail(tail, rows, keep):
+    """Append rows to a per-customer tail and keep the last `keep` per customer."""
+    tail = pd.concat([tail, rows[TAIL_COLS]], ignore_index=True) if tail is not None else rows[TAIL_COLS]
+    return tail.groupby("customer_id", sort=False).tail(keep)
+
+
+# ═══════════════════════════════════════════════════════════════
+# FINAL FEATURES
+# ═══════════════════════════════════════════════════════════════
+
+def _window(tail, keep):
+    """Epoch lists within 7 days of each customer's latest entry (last `keep`)."""
+    latest = tail.groupby("customer_id", sort=False)["epoch"].transform("max")
+    recent = tail[tail["epoch"] >= latest - WINDOW_SECONDS]
+    recent = recent.groupby("customer_id", sort=False).tail(keep)
+    return recent.groupby("customer_id", sort=False)["epoch"].agg(list)
+
+
+def _spending_change(tail):
+    """Recent 5 vs previous 5 spend amounts (0.0 with fewer than 10)."""
+    last10 = tail.groupby("customer_id", sort=False).tail(10).copy()
+    last10["pos"] = last10.groupby("customer_id", sort=False).cumcount()
+    g = last10.groupby("customer_id", sort=False)
+    n = g.size()
+    recent = last10["amount"].where(last10["pos"] >= 5, 0.0).groupby(last10["customer_id"], sort=False).sum()
+    previous = last10["amount"].where(last10["pos"] < 5, 0.0).groupby(last10["customer_id"], sort=False).sum()
+    ok = (n >= 10) & (previous > 0)
+    change = ((recent - previous) / previous.where(ok, 1.0) * 100).where(ok, 0.0)
+    return change.map(lambda v: round(v, 1))
+
+
+def build_profiles(agg, tail, atm_tail):
+    """Final typed profile columns for every customer."""
+    df = agg.copy()
+    df["txn_count"] = df["txn_count"].astype(np.int64)
+    df["withdrawals"] = df["withdrawals"].astype(np.int64)
+    df["salary_count"] = df["salary_count"].astype(np.int64)
+    df["persona"] = df["persona"].fillna("UNKNOWN")
+
+    # ── Rolling windows ──
+    df["_txn_timestamps"] = _window(tail, TXN_WINDOW_MAX)
+    df["txn_frequency_7d"] = df["_txn_timestamps"].str.len().fillna(0).astype(np.int64)
+    df["_atm_timestamps"] = _window(atm_tail, ATM_WINDOW_MAX) if len(atm_tail) else pd.Series(dtype=object)
+    df["atm_withdrawals_7d"] = df["_atm_timestamps"].str.len().fillna(0).astype(np.int64)
+    spend = tail.groupby("customer_id", sort=False).tail(SPEND_HISTORY)
+    df["_spend_history"] = spend.groupby("customer_id", sort=False)["amount"].agg(list)
+    for col in ("_txn_timestamps", "_atm_timestamps", "_spend_history"):
+        df[col] = df[col].map(lambda v: v if isinstance(v, list) else [])
+    recent_ids = tail.groupby("customer_id", sort=False).tail(DEDUP_WINDOW)
+    fingerprints = recent_ids["transaction_id"].map(txn_fingerprint)
+    df[SEEN_FIELD] = fingerprints.groupby(recent_ids["customer_id"], sort=False).agg("".join)
+    df[SEEN_FIELD] = df[SEEN_FIELD].fillna("")
+
+    # ── Time features (at each customer's last transaction) ──
+    df["spending_change_pct"] = _spending_change(tail).reindex(df.index).fillna(0.0)
+    salary_sec = df["last_salary_ts"].dt.floor("s")
+    df["days_since_salary"] = (df["last_ts"] - salary_sec).dt.days.fillna(-1).astype(np.int64)
+    df["last_salary_date"] = salary_sec.dt.strftime("%Y-%m-%d %H:%M:%S").fillna("")
+    df["first_seen"] = df["first_ts"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    df["last_updated"] = df["last_ts"].dt.strftime("%Y-%m-%d %H:%M:%S")
+
+    # ── Shared rules ──
+    for col, values in evaluate_arrays(df).items():
+        df[col] = values
+    return df
+
+
+# ═══════════════════════════════════════════════════════════════
+# LOAD
+# ═══════════════════════════════════════════════════════════════
+
+def load_profiles(store, df, batch_size, encoding):
+    """Encode and bulk-write profiles. Returns the number written."""
+    fields = list(FEATURE_FIELDS)
+    defaults = _new_profile("UNKNOWN", "")
+    cleanup = [COLD_MARKER] + stale_fields(encoding)
+    written = 0
+    records = df[[f for f in fields if f in df.columns]].to_dict("index")
+    updates = {}
+    for cid, row in records.items():
+        p = dict(defaults)
+        p.update(row)
+        updates[cid] = encode_profile(p, fields, encoding)
+        if len(updates) >= batch_size:
+            store.batch_update(updates)
+            store.remove_fields(list(updates), cleanup)
+            written += len(updates)
+            updates = {}
+            print(f"  [Backfill] {written:,}/{len(records):,} profiles written", end="\r")
+    if updates:
+        store.batch_update(updates)
+        store.remove_fields(list(updates), cleanup)
+        written += len(updates)
+    return written
+
+
+def compute_profiles(chunks, progress=False):
+    """Expected profiles for raw transaction chunks. Returns (DataFrame, n_txns)."""
+    parts, tail, atm_tail = [], None, None
+    n_txns = 0
+    for chunk in chunks:
+        c = drop_redelivered(prepare_chunk(chunk), tail)
+        n_txns += len(c)
+        parts.append(aggregate_chunk(c))
+        if len(parts) >= 16:
+            parts = [combine_aggregates(parts)]
+        tail = extend_tail(tail, c, TXN_WINDOW_MAX)
+        atm_tail = extend_tail(atm_tail, c[c["is_atm"]], ATM_WINDOW_MAX)
+        if progress:
+            print(f"  [Backfill] {n_txns:,} transactions read", end="\r")
+    if progress:
+        print()
+    if not parts:
+        return pd.DataFrame(), n_txns
+    return build_profiles(combine_aggregates(parts), tail, atm_tail), n_txns
+
+
+def backfill(paths, store=None, chunksize=500_000, batch_size=5000, dry_run=False):
+    """Rebuild profiles from raw transactions. Returns the profile DataFrame."""
+    df, n_txns = compute_profiles(read_chunks(paths, chunksize), progress=True)
+    if not len(df):
+        return df
+
+    print(f"  [Backfill] {n_txns:,} transactions -> {len(df):,} customer profiles")
+    if not dry_run:
+        store = store or get_store()
+        written = load_profiles(store, df, batch_size, get_encoding())
+        print(f"\n  [Backfill] {written:,} profiles written to {store.name} store")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild customer profiles from raw transactions")
+    parser.add_argument("--input", nargs="+", default=[TXN_CSV], help="transaction CSV files, oldest first")
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    parser.add_argument("--batch", type=int, default=5000, help="profiles per batch_update")
+    parser.add_argument("--dry-run", action="store_true", help="compute profiles, write nothing")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("   EQUILIBRATE — Feature Backfill")
+    print("=" * 60)
+
+    t0 = time.perf_counter()
+    df = backfill(args.input, chunksize=args.chunksize, batch_size=args.batch, dry_run=args.dry_run)
+    elapsed = time.perf_counter() - t0
+
+    if len(df):
+        levels = df["risk_level"].value_counts()
+        print(f"  [Backfill] HIGH: {levels.get('HIGH', 0):,} | MEDIUM: {levels.get('MEDIUM', 0):,} | "
+              f"LOW: {levels.get('LOW', 0):,}")
+    print(f"  [Backfill] Done in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
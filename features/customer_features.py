@@ -1,9 +1,10 @@
 """
 Customer Features v4.0 — Time-Aware Behavioural Feature Computation
 Processes transactions incrementally and computes time-based features.
-Hardship classification and risk scoring run inside this module (not dashboard).
+Hardship classification and risk scoring run inside this module (not dashboard),
+using the shared rules in risk/risk_rules.py.
 
-Redis key format: customer:{customer_id}
+Redis key format: customer:{customer_id}  (via the feature store, redis_store.py)
 
 Stored fields:
   txn_count, total_spend, essential_spend, discretionary_spend,
@@ -11,204 +12,433 @@ Stored fields:
   atm_withdrawals_7d, txn_frequency_7d, spending_change_pct,
   hardship_type, risk_score, risk_level, recommended_action,
   persona, last_updated
+
+Each transaction is one read + one compare-and-set write: the profile is
+read, all features are computed in memory, and the result is written back
+only if txn_count is still the value that was read (retrying otherwise).
+update_customer_features_batch() does the same for a micro-batch with one
+batch read and one batch compare-and-set (feature engine, stream processor).
+Profiles are decoded/encoded by profile_codec.py (hash or packed layout);
+a profile tiered out to cold storage is rehydrated on its next transaction.
+
+Metrics (config/metrics.py): store round-trips are timed as redis_update
+(one sample per update call), classification and scoring as classify and
+score, and transaction timestamp -> features written as end_to_end.
+Sampled transactions carrying a trace_id (config/tracing.py) record their
+score, features and snapshot hops.
+
+Idempotency: each profile keeps a ring of 48-bit fingerprints of its last
+DEDUP_WINDOW transaction_ids (_seen_txns). A redelivered transaction
+(consumer restart, rebalance, re-sent batch) is found in the ring and
+skipped. The check and the ring update ride on the same compare-and-set
+as the features, so a transaction is either applied and remembered or
+neither, and memory stays fixed per customer whatever the TPS. A global
+rotating Bloom filter would need its own write outside that CAS (a crash
+between the two re-applies or loses a transaction) and a shared copy for
+every consumer process. It would also drop real transactions at its
+false-positive rate. Re-running an entire log is not covered; rebuild
+with features/backfill_features.py instead.
+
+Importing this module has no side effects: the store and the policy
+templates are created on first use.
 """
-import redis
-import json
+import hashlib
 import os
 import sys
-import hashlib
+import time
 from datetime import datetime, timedelta
 
 # ── Paths ──
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
 sys.path.insert(0, os.path.join(BASE_DIR, "storage"))
+sys.path.insert(0, os.path.join(BASE_DIR, "risk"))
 
+from clock import get_clock
+from metrics import get_metrics
+from tracing import PENDING_HOPS, get_tracer
 from customer_snapshot_writer import write_customer_snapshot
+from policy_engine import get_recommended_action
+from risk_rules import classify_hardship, get_rules, risk_score, risk_level_for
+from redis_store import get_store
+from profile_codec import decode_profile, encode_profile
+from profile_tiering import is_stub, rehydrate
+
+# ── Essential spending categories ──
+ESSENTIAL_CATEGORIES = {"GROCERY", "UTILITY", "RENT", "MEDICAL", "INSURANCE", "EMI"}
+
+# ── Compare-and-set retries when another writer updates the same customer ──
+CAS_RETRIES = 5
+
+# ── Idempotency ring (see module docstring) ──
+SEEN_FIELD = "_seen_txns"
+DEDUP_WINDOW = 32
+FINGERPRINT_CHARS = 12  # hex chars = 48-bit fingerprint
+
+# ── Per-process counters (dedup_stats()) ──
+_dedup_stats = {"applied": 0, "duplicates": 0}
+
+
+def _new_profile(persona, now_str):
+    return {
+        "txn_count": 0,
+        "total_spend": 0.0,
+        "withdrawals": 0,
+        "salary_count": 0,
+        "last_salary_date": "",
+        "essential_spend": 0.0,
+        "discretionary_spend": 0.0,
+        "atm_withdrawals_7d": 0,
+        "txn_frequency_7d": 0,
+        "spending_change_pct": 0.0,
+        "days_since_salary": -1,
+        "hardship_type": "NONE",
+        "risk_score": 0,
+        "risk_level": "LOW",
+        "recommended_action": "Continue monitoring",
+        "persona": persona,
+        "last_updated": now_str,
+        "first_seen": now_str,
+        # Rolling window trackers (epoch seconds / amounts, see profile_codec)
+        "_txn_timestamps": [],
+        "_atm_timestamps": [],
+        "_spend_history": [],
+        # Fingerprints of the last DEDUP_WINDOW transaction_ids, oldest first
+        SEEN_FIELD: "",
+    }
+
+
+# Fields owned by the feature update (other fields, e.g. intervention
+# feedback, are never rewritten by it)
+FEATURE_FIELDS = tuple(_new_profile("", ""))
 
-# ── Policy templates ──
-POLICY_PATH = os.path.join(BASE_DIR, "risk", "policy_templates.json")
-_policy_cache = None
 
+# ═══════════════════════════════════════════════════════════════
+# IDEMPOTENCY
+# ═══════════════════════════════════════════════════════════════
+
+def txn_fingerprint(transaction_id):
+    """Fixed-width hex fingerprint of a transaction id ("" if there is none)."""
+    if not transaction_id:
+        return ""
+    return hashlib.blake2b(str(transaction_id).encode("utf-8"), digest_size=FINGERPRINT_CHARS // 2).hexdigest()
 
-def _load_policies():
-    global _policy_cache
-    if _policy_cache is None:
-        try:
-            with open(POLICY_PATH, "r", encoding="utf-8") as f:
-                _policy_cache = json.load(f)
-        except Exception:
-            _policy_cache = {}
-    return _policy_cache
 
+def seen_before(ring, fingerprint):
+    """True if fingerprint is one of the entries in a _seen_txns ring."""
+    i = ring.find(fingerprint) if fingerprint else -1
+    while i != -1:
+        if i % FINGERPRINT_CHARS == 0:
+            return True
+        i = ring.find(fingerprint, i + 1)
+    return False
 
-# ── Redis ──
-r = redis.Redis(host="localhost", port=6379, decode_responses=True)
+
+def remember(ring, fingerprint):
+    """Append a fingerprint to a ring, keeping the last DEDUP_WINDOW."""
+    return (ring + fingerprint)[-DEDUP_WINDOW * FINGERPRINT_CHARS:]
+
+
+def dedup_stats():
+    """Transactions applied / skipped as duplicates by this process."""
+    return dict(_dedup_stats)
 
 
 # ═══════════════════════════════════════════════════════════════
 # FEATURE UPDATE
 # ═══════════════════════════════════════════════════════════════
 
-def update_customer_features(txn):
-    """Process a single transaction and update customer profile in Redis."""
+def update_customer_features(txn, store=None, snapshot=True):
+    """Process a single transaction and update customer profile in the store.
+
+    Returns the updated profile, or None if the transaction was already
+    applied (duplicate delivery).
+    """
+    store = store or get_store()
+    metrics = get_metrics()
     cid = str(txn["customer_id"])
-    key = f"customer:{cid}"
+    fingerprint = txn_fingerprint(txn.get("transaction_id"))
+
+    io_time = 0.0
+    for _ in range(CAS_RETRIES):
+        t0 = time.perf_counter()
+        raw = store.get(cid)
+        io_time += time.perf_counter() - t0
+        if is_stub(raw):
+            raw = rehydrate(cid, store)
+        if seen_before(raw.get(SEEN_FIELD, ""), fingerprint):
+            _dedup_stats["duplicates"] += 1
+            metrics.inc("duplicates_skipped")
+            return None
+        expected = raw.get("txn_count")
+        profile = apply_transaction(raw, txn, get_clock().now())
+        scored_at = time.time()
+        mapping = encode_profile(profile, FEATURE_FIELDS)
+        t0 = time.perf_counter()
+        ok = store.compare_and_set(cid, "txn_count", expected, mapping)
+        io_time += time.perf_counter() - t0
+        if ok:
+            break
+    else:
+        print(f"  [Features] Warning: customer {cid} kept changing, writing last computed state")
+        store.put(cid, encode_profile(profile, FEATURE_FIELDS))
+    _dedup_stats["applied"] += 1
+    metrics.observe("redis_update", io_time)
+    metrics.inc("features_applied")
+    _observe_end_to_end((txn,))
+    traced = "trace_id" in txn
+    if traced:
+        _trace_update(((txn, scored_at),))
+
+    # ── Snapshot to CSV ──
+    if snapshot and write_customer_snapshot(cid, profile=profile) and traced:
+        get_tracer().record_many((txn,), "snapshot")
+    return profile
+
+
+def update_customer_features_batch(txns, store=None, snapshot=True, snapshot_filter=None, first=None):
+    """Process a micro-batch: one batch read and one batch compare-and-set.
+
+    Transactions are grouped per customer (arrival order kept within each
+    customer) and folded into that customer's profile in memory, exactly as
+    update_customer_features() would one at a time. A customer whose
+    compare-and-set loses to another writer is redone through
+    update_customer_features(); its dedup ring makes that safe.
+
+    snapshot_filter(cid, profile) -> bool limits which customers get a
+    snapshot row. first(cid, stored) -> bool, given the profile as stored
+    before this batch, picks customers that are written and snapshotted
+    ahead of the rest (one more compare-and-set round-trip). Returns
+    {customer_id: updated profile} for customers with at least one newly
+    applied transaction.
+    """
+    store = store or get_store()
+    by_customer = {}
+    for txn in txns:
+        by_customer.setdefault(str(txn["customer_id"]), []).append(txn)
+    ids = list(by_customer)
+
+    items, profiles, applied, duplicates, scored, urgent = [], {}, {}, {}, {}, set()
+    t0 = time.perf_counter()
+    stored = store.batch_get(ids)
+    io_time = time.perf_counter() - t0
+    for cid, raw in zip(ids, stored):
+        if is_stub(raw):
+            raw = rehydrate(cid, store)
+        if first is not None and first(cid, raw):
+            urgent.add(cid)
+        expected = raw.get("txn_count")
+        profile, n_applied, n_dup = None, 0, 0
+        for txn in by_customer[cid]:
+            if seen_before(raw.get(SEEN_FIELD, ""), txn_fingerprint(txn.get("transaction_id"))):
+                n_dup += 1
+                continue
+            profile = apply_transaction(raw, txn, get_clock().now())
+            if "trace_id" in txn:
+                scored.setdefault(cid, []).append((txn, time.time()))
+            raw = encode_profile(profile, FEATURE_FIELDS)  # next txn sees the stored form
+            n_applied += 1
+        duplicates[cid] = n_dup
+        if profile is not None:
+            items.append((cid, "txn_count", expected, raw))
+            profiles[cid] = profile
+            applied[cid] = n_applied
+
+    if not items:
+        get_metrics().observe("redis_update", io_time)
+    for group in ([item for item in items if item[0] in urgent], [item for item in items if item[0] not in urgent]):
+        if group:
+            _commit_batch(store, group, profiles, applied, duplicates, by_customer, scored, io_time,
+                          snapshot, snapshot_filter)
+            io_time = 0.0
+    _dedup_stats["duplicates"] += sum(duplicates.values())
+    get_metrics().inc("duplicates_skipped", sum(duplicates.values()))
+    return profiles
+
+
+def _commit_batch(store, items, profiles, applied, duplicates, by_customer, scored, io_time,
+                  snapshot, snapshot_filter):
+    """Compare-and-set one group of a micro-batch, then record and snapshot it."""
+    metrics = get_metrics()
+    t0 = time.perf_counter()
+    results = store.batch_compare_and_set(items)
+    metrics.observe("redis_update", io_time + time.perf_counter() - t0)
+    written = [cid for cid, _field, _expected, _mapping in items]
+    for (cid, _field, _expected, _mapping), ok in zip(items, results):
+        if ok:
+            continue
+        # Lost a race: replay this customer's transactions one CAS at a time
+        del profiles[cid], applied[cid]
+        duplicates[cid] = 0
+        written.remove(cid)
+        for txn in by_customer[cid]:
+            profile = update_customer_features(txn, store=store, snapshot=False)
+            if profile is not None:
+                profiles[cid] = profile
+        if cid in profiles:
+            written.append(cid)
+    n_applied = sum(applied.get(cid, 0) for cid in written)
+    _dedup_stats["applied"] += n_applied
+    metrics.inc("features_applied", n_applied)
+    _observe_end_to_end(txn for cid in written if cid in applied for txn in by_customer[cid])
+    if scored:
+        _trace_update([item for cid in written if cid in applied for item in scored.get(cid, ())])
+
+    # ── Snapshot to CSV ──
+    if snapshot:
+        for cid in written:
+            profile = profiles[cid]
+            if snapshot_filter is None or snapshot_filter(cid, profile):
+                if write_customer_snapshot(cid, profile=profile):
+                    get_tracer().record_many(by_customer[cid], "snapshot")
+
+
+def _trace_update(scored):
+    """Record score + features hops for traced (txn, scored_at) pairs just written."""
+    tracer = get_tracer()
+    written_at = time.time()
+    for txn, scored_at in scored:
+        tracer.record_many((txn,), "score", at=scored_at)
+        tracer.record_many((txn,), "features", at=written_at, pending=PENDING_HOPS)
+
+
+def _observe_end_to_end(txns):
+    """Record transaction timestamp -> now, in real seconds, for applied transactions."""
+    clock = get_clock()
+    if not clock.speed:  # step mode: clock time says nothing about latency
+        return
+    now = clock.now()
+    metrics = get_metrics()
+    for txn in txns:
+        try:
+            age = (now - datetime.fromisoformat(str(txn["timestamp"]))).total_seconds()
+        except (KeyError, ValueError):
+            continue
+        metrics.observe("end_to_end", max(0.0, age) / clock.speed)
+
 
+def apply_transaction(raw, txn, now):
+    """Apply one transaction to a stored profile and return the typed result.
+
+    Pure function: no I/O (only the classify/score timings are recorded),
+    so it is shared by the streaming path and tools that rebuild state
+    offline.
+    """
     amount = float(txn["amount"])
     category = txn["merchant_category"].upper()
     channel = txn.get("channel", "").upper()
     txn_type = txn["transaction_type"].upper()
     is_salary = int(txn.get("is_salary", 0))
     persona = txn.get("persona", "UNKNOWN")
-    ts = txn.get("timestamp", str(datetime.now()))
 
-    now = datetime.now()
     now_str = now.strftime("%Y-%m-%d %H:%M:%S")
 
-    # ── Initialize profile if new ──
-    if not r.exists(key):
-        r.hset(key, mapping={
-            "txn_count": 0,
-            "total_spend": 0.0,
-            "withdrawals": 0,
-            "salary_count": 0,
-            "last_salary_date": "",
-            "essential_spend": 0.0,
-            "discretionary_spend": 0.0,
-            "atm_withdrawals_7d": 0,
-            "txn_frequency_7d": 0,
-            "spending_change_pct": 0.0,
-            "days_since_salary": -1,
-            "hardship_type": "NONE",
-            "risk_score": 0,
-            "risk_level": "LOW",
-            "recommended_action": "Continue monitoring",
-            "persona": persona,
-            "last_updated": now_str,
-            "first_seen": now_str,
-            # Rolling window trackers (stored as JSON lists)
-            "_txn_timestamps": "[]",
-            "_atm_timestamps": "[]",
-            "_spend_history": "[]",
-        })
+    # ── Initialize profile if new (and fill fields missing from older profiles) ──
+    p = _new_profile(persona, now_str)
+    p.update(decode_profile(raw))
 
     # ── Transaction count ──
-    r.hincrby(key, "txn_count", 1)
+    p["txn_count"] += 1
 
     # ── Salary detection ──
     if is_salary:
-        r.hincrby(key, "salary_count", 1)
-        r.hset(key, "last_salary_date", now_str)
+        p["salary_count"] += 1
+        p["last_salary_date"] = now_str
 
     # ── Spending ──
     if txn_type == "DEBIT":
-        r.hincrbyfloat(key, "total_spend", amount)
-
-        essential_cats = {"GROCERY", "UTILITY", "RENT", "MEDICAL", "INSURANCE", "EMI"}
-        if category in essential_cats:
-            r.hincrbyfloat(key, "essential_spend", amount)
+        p["total_spend"] += amount
+        if category in ESSENTIAL_CATEGORIES:
+            p["essential_spend"] += amount
         else:
-            r.hincrbyfloat(key, "discretionary_spend", amount)
+            p["discretionary_spend"] += amount
 
     # ── ATM withdrawals ──
     if channel == "ATM":
-        r.hincrby(key, "withdrawals", 1)
+        p["withdrawals"] += 1
 
     # ── Update rolling window timestamps ──
-    _update_rolling_windows(key, channel, amount, now)
+    _update_rolling_windows(p, channel, amount, now)
 
     # ── Store persona (if not already set) ──
-    current_persona = r.hget(key, "persona")
+    current_persona = p.get("persona")
     if not current_persona or current_persona == "UNKNOWN":
-        r.hset(key, "persona", persona)
+        p["persona"] = persona
 
     # ── Compute time-based features ──
-    _compute_time_features(key, now)
-
-    # ── Classify hardship ──
-    _classify_hardship(key)
-
-    # ── Compute risk score ──
-    _compute_risk_score(key)
+    _compute_time_features(p, now)
+
+    # ── Classify hardship + risk score (shared rules, risk/risk_rules.py) ──
+    rules = get_rules()  # one rule version for the whole transaction, even across a reload
+    t0 = time.perf_counter()
+    p["hardship_type"] = classify_hardship(p, rules)
+    t1 = time.perf_counter()
+    p["risk_score"] = risk_score(p, rules)
+    p["risk_level"] = risk_level_for(p["risk_score"], rules)
+    metrics = get_metrics()
+    metrics.observe("classify", t1 - t0)
+    metrics.observe("score", time.perf_counter() - t1)
+    p["recommended_action"] = get_recommended_action(p["hardship_type"], p["risk_level"])
+
+    # ── Remember the transaction for duplicate detection ──
+    p[SEEN_FIELD] = remember(p.get(SEEN_FIELD) or "", txn_fingerprint(txn.get("transaction_id")))
 
     # ── Update timestamp ──
-    r.hset(key, "last_updated", now_str)
-
-    # ── Snapshot to CSV ──
-    write_customer_snapshot(cid)
+    p["last_updated"] = now_str
+    return p
 
 
 # ═══════════════════════════════════════════════════════════════
 # ROLLING WINDOW TRACKING
 # ═══════════════════════════════════════════════════════════════
 
-def _update_rolling_windows(key, channel, amount, now):
+def _update_rolling_windows(p, channel, amount, now):
     """Maintain rolling 7-day windows for txn frequency and ATM withdrawals."""
-    now_iso = now.isoformat()
-    cutoff = (now - timedelta(days=7)).isoformat()
+    now_ts = now.timestamp()
+    cutoff = (now - timedelta(days=7)).timestamp()
 
     # Transaction timestamps (7-day window)
-    try:
-        txn_ts_raw = r.hget(key, "_txn_timestamps") or "[]"
-        txn_ts = json.loads(txn_ts_raw)
-    except (json.JSONDecodeError, TypeError):
-        txn_ts = []
-    txn_ts.append(now_iso)
+    txn_ts = p.get("_txn_timestamps", [])
+    txn_ts.append(now_ts)
     txn_ts = [t for t in txn_ts if t >= cutoff]
     # Limit to prevent unbounded growth
     txn_ts = txn_ts[-200:]
-    r.hset(key, "_txn_timestamps", json.dumps(txn_ts))
-    r.hset(key, "txn_frequency_7d", len(txn_ts))
+    p["_txn_timestamps"] = txn_ts
+    p["txn_frequency_7d"] = len(txn_ts)
 
     # ATM timestamps (7-day window)
     if channel == "ATM":
-        try:
-            atm_ts_raw = r.hget(key, "_atm_timestamps") or "[]"
-            atm_ts = json.loads(atm_ts_raw)
-        except (json.JSONDecodeError, TypeError):
-            atm_ts = []
-        atm_ts.append(now_iso)
+        atm_ts = p.get("_atm_timestamps", [])
+        atm_ts.append(now_ts)
         atm_ts = [t for t in atm_ts if t >= cutoff]
         atm_ts = atm_ts[-100:]
-        r.hset(key, "_atm_timestamps", json.dumps(atm_ts))
-        r.hset(key, "atm_withdrawals_7d", len(atm_ts))
+        p["_atm_timestamps"] = atm_ts
+        p["atm_withdrawals_7d"] = len(atm_ts)
 
     # Spend history (track last 30 spend amounts for change detection)
-    try:
-        spend_raw = r.hget(key, "_spend_history") or "[]"
-        spend_hist = json.loads(spend_raw)
-    except (json.JSONDecodeError, TypeError):
-        spend_hist = []
+    spend_hist = p.get("_spend_history", [])
     spend_hist.append(float(amount))
-    spend_hist = spend_hist[-30:]
-    r.hset(key, "_spend_history", json.dumps(spend_hist))
+    p["_spend_history"] = spend_hist[-30:]
 
 
 # ═══════════════════════════════════════════════════════════════
 # TIME-BASED FEATURE COMPUTATION
 # ═══════════════════════════════════════════════════════════════
 
-def _compute_time_features(key, now):
+def _compute_time_features(p, now):
     """Compute days_since_salary and spending_change_pct."""
     # Days since salary
-    last_salary = r.hget(key, "last_salary_date") or ""
+    last_salary = p.get("last_salary_date") or ""
+    p["days_since_salary"] = -1
     if last_salary and last_salary.strip():
         try:
             salary_dt = datetime.strptime(last_salary.split(".")[0], "%Y-%m-%d %H:%M:%S")
-            days = (now - salary_dt).days
-            r.hset(key, "days_since_salary", days)
+            p["days_since_salary"] = (now - salary_dt).days
         except (ValueError, IndexError):
-            r.hset(key, "days_since_salary", -1)
-    else:
-        r.hset(key, "days_since_salary", -1)
+            pass
 
     # Spending change percentage (compare recent 5 vs previous 5 transactions)
-    try:
-        spend_raw = r.hget(key, "_spend_history") or "[]"
-        spend_hist = json.loads(spend_raw)
-    except (json.JSONDecodeError, TypeError):
-        spend_hist = []
-
+    spend_hist = p.get("_spend_history", [])
     if len(spend_hist) >= 10:
         recent = sum(spend_hist[-5:])
         previous = sum(spend_hist[-10:-5])
@@ -216,172 +446,5 @@ def _compute_time_features(key, now):
             change_pct = round(((recent - previous) / previous) * 100, 1)
         else:
             change_pct = 0.0
-        r.hset(key, "spending_change_pct", change_pct)
-
-
-# ═══════════════════════════════════════════════════════════════
-# HARDSHIP CLASSIFICATION (computed in feature engine, NOT dashboard)
-# ═══════════════════════════════════════════════════════════════
-
-def _classify_hardship(key):
-    """Deterministic hardship classification based on behavioral signals.
-
-    Rules (priority order):
-      1. INCOME_SHOCK  — no salary for extended period + withdrawal spikes
-      2. LIQUIDITY_STRESS — high ATM withdrawals + spending drops
-      3. EXPENSE_COMPRESSION — discretionary spending drops > 40%
-      4. OVERSPENDING — high discretionary relative to essential + credit usage
-    """
-    data = r.hgetall(key)
-
-    salary_count = int(data.get("salary_count", 0))
-    days_since_salary = int(data.get("days_since_salary", -1))
-    atm_7d = int(data.get("atm_withdrawals_7d", 0))
-    txn_count = int(data.get("txn_count", 0))
-    essential = float(data.get("essential_spend", 0))
-    discretionary = float(data.get("discretionary_spend", 0))
-    spending_change = float(data.get("spending_change_pct", 0))
-    persona = data.get("persona", "UNKNOWN")
-
-    hardship = "NONE"
-
-    # Need minimum transaction history to classify
-    if txn_count < 3:
-        r.hset(key, "hardship_type", hardship)
-        return
-
-    total_spend = float(data.get("total_spend", 0))
-
-    # ── Income Shock: no salary for extended period + withdrawal spikes ──
-    if salary_count == 0 and txn_count >= 5 and persona in ("INCOME_SHOCK", "SILENT_DRAIN"):
-        hardship = "INCOME_SHOCK"
-    elif days_since_salary > 30 and atm_7d >= 3:
-        hardship = "INCOME_SHOCK"
-
-    # ── Over-Leverage: high essential spend ratio (EMI/loans heavy) ──
-    elif essential > 0 and total_spend > 0 and (essential / total_spend) > 0.70 and txn_count >= 5:
-        hardship = "OVER_LEVERAGE"
+        p["spending_change_pct"] = change_pct
 
-    # ── Liquidity Stress: high ATM + spending drops ──
-    elif atm_7d >= 5 and spending_change < -20:
-        hardship = "LIQUIDITY_STRESS"
-    elif atm_7d >= 8:
-        hardship = "LIQUIDITY_STRESS"
-
-    # ── Expense Compression: discretionary drops sharply ──
-    elif essential > 0 and discretionary == 0 and txn_count > 5:
-        hardship = "EXPENSE_COMPRESSION"
-    elif spending_change < -40 and essential > discretionary * 3 and txn_count > 5:
-        hardship = "EXPENSE_COMPRESSION"
-
-    # ── Overspending: high discretionary relative to essential ──
-    elif discretionary > 0 and essential > 0 and discretionary > essential * 2.5 and discretionary > 3000:
-        hardship = "OVERSPENDING"
-    elif persona == "OVERSPENDER" and discretionary > essential * 2 and discretionary > 2000:
-        hardship = "OVERSPENDING"
-
-    r.hset(key, "hardship_type", hardship)
-
-
-# ═══════════════════════════════════════════════════════════════
-# RISK SCORING (weighted, behavior-driven)
-# Only ~1-2% should reach HIGH (7-10)
-# ═══════════════════════════════════════════════════════════════
-
-def _compute_risk_score(key):
-    """Weighted risk scoring: 0-10 scale.
-
-    Structure:
-      Salary gap      0-3 points  (weight: high)
-      Withdrawal spike 0-2 points  (weight: medium)
-      Spend drop      0-2 points  (weight: medium)
-      Inactivity      0-1 points  (weight: low)
-      Persona factor  0-1 points  (weight: supplemental, never standalone)
-
-    HIGH requires convergence of MULTIPLE signals.
-    A single signal alone should NOT push to HIGH.
-    """
-    data = r.hgetall(key)
-
-    salary_count = int(data.get("salary_count", 0))
-    days_since_salary = int(data.get("days_since_salary", -1))
-    atm_7d = int(data.get("atm_withdrawals_7d", 0))
-    txn_count = int(data.get("txn_count", 0))
-    total_spend = float(data.get("total_spend", 0))
-    essential = float(data.get("essential_spend", 0))
-    discretionary = float(data.get("discretionary_spend", 0))
-    spending_change = float(data.get("spending_change_pct", 0))
-    persona = data.get("persona", "UNKNOWN")
-    hardship = data.get("hardship_type", "NONE")
-    withdrawals = int(data.get("withdrawals", 0))
-
-    score = 0.0
-
-    # ── Need minimum history to score meaningfully ──
-    if txn_count < 3:
-        score = 0
-    else:
-        # ── Salary gap (0-3 points) ──
-        # Only penalize heavily if there is enough transaction history to judge
-        if salary_count == 0 and txn_count >= 15:
-            score += 3
-        elif salary_count == 0 and txn_count >= 8:
-            score += 2
-        elif salary_count == 0 and txn_count >= 4:
-            score += 1
-        elif days_since_salary > 45:
-            score += 2
-        elif days_since_salary > 30:
-            score += 1
-
-        # ── Withdrawal spike (0-2 points) ──
-        if atm_7d >= 12:
-            score += 2
-        elif atm_7d >= 6:
-            score += 1.5
-        elif atm_7d >= 4:
-            score += 1
-
-        # ── Spend drop (0-2 points) ──
-        if spending_change < -60:
-            score += 2
-        elif spending_change < -35:
-            score += 1
-
-        # ── Inactivity / survival mode (0-1 point) ──
-        if essential > 0 and discretionary == 0 and txn_count > 10:
-            score += 1
-        elif essential > 0 and discretionary > 0 and essential > discretionary * 4:
-            score += 0.5
-
-        # ── Persona factor (supplemental, never adds more than 1 point) ──
-        # Only adds if there are ALREADY other signals present
-        if score >= 2:
-            if persona == "INCOME_SHOCK" and salary_count == 0:
-                score += 1
-            elif persona == "SILENT_DRAIN" and txn_count < 10 and salary_count == 0:
-                score += 0.5
-
-    # Round and cap at 10
-    score = min(round(score), 10)
-
-    # ── Classification (calibrated for streaming demo) ──
-    if score >= 5:
-        risk_level = "HIGH"
-    elif score >= 3:
-        risk_level = "MEDIUM"
-    else:
-        risk_level = "LOW"
-
-    # ── Policy-bound recommendation (via policy_engine) ──
-    import sys as _sys
-    _sys.path.insert(0, os.path.join(BASE_DIR, "risk"))
-    from policy_engine import get_recommended_action
-    recommended_action = get_recommended_action(hardship, risk_level)
-
-    # ── Write to Redis ──
-    r.hset(key, mapping={
-        "risk_score": str(score),
-        "risk_level": risk_level,
-        "recommended_action": recommended_action,
-    })
@@ -1,66 +1,225 @@
 """
-Feature Engine v4.0 — Behaviour-Driven Feature Pipeline
-Consumes transactions from Kafka and computes time-aware customer features.
-Hardship classification and risk scoring run inline per transaction.
+Feature Engine v4.1 — Behaviour-Driven Feature Pipeline
+Consumes transactions from the configured transport (Kafka, Redis Streams
+or in-process; see kafka/transport.py) and computes time-aware customer
+features. Hardship classification and risk scoring run inline per
+transaction.
 
-Run:  python features/feature_engine.py
+Transactions are applied in micro-batches (one batch read and one batch
+compare-and-set, update_customer_features_batch()). The batch size follows
+consumer lag:
+
+  lag      messages waiting for this consumer (sub.backlog()); when the
+           transport cannot tell, the event-time delay of the newest polled
+           transaction (clock now - its timestamp), but only on the wall
+           clock and while that delay is under feature_engine.max_event_delay
+           (live traffic). Replayed or simulated timestamps say nothing about
+           lag, so otherwise a full poll (batch filled) counts as behind
+  behind   lag >= feature_engine.lag_threshold messages (or
+           feature_engine.lag_seconds of delay, or a full poll): the batch
+           doubles per poll up to feature_engine.max_batch
+  caught   the batch halves per poll back down to feature_engine.min_batch
+  up
+
+While behind, snapshot rows are only written for MEDIUM/HIGH customers
+(LOW customers get theirs on their next transaction once caught up), and
+with --prioritize customers stored at MEDIUM/HIGH (read from the store
+with the batch, so it holds across restarts), or with a risky persona,
+are written and snapshotted first. Each customer is written once per
+batch, so per-customer order is unchanged. Every lag episode
+is reported when it ends: "[Lag] Drained in Xs (peak N)".
+
+Stage latencies, counters and the current backlog/batch size are exported
+by config/metrics.py (Prometheus text on :9401 and Redis metrics:feature_engine).
+Profiles on demand (SIGUSR1/SIGUSR2, EQ_PROFILE_ON_START or the Redis key
+profile:feature_engine; see config/profiling.py).
+
+Run:  python features/feature_engine.py [--prioritize]
 """
-from kafka import KafkaConsumer
-import json
-import uuid
+import argparse
+import os
+import sys
+import time
 from datetime import datetime
-from customer_features import update_customer_features
-
-print("=" * 60)
-print("  EQUILIBRATE — Feature Engine v4.0 (Behaviour-Driven)")
-print("  Consumes from Kafka -> computes features -> writes Redis")
-print("=" * 60)
-print()
-
-# Unique consumer group per run ensures fresh consumption
-GROUP_ID = f"feature-engine-{uuid.uuid4().hex[:8]}"
-
-consumer = KafkaConsumer(
-    "transactions",
-    bootstrap_servers="127.0.0.1:9092",
-    value_deserializer=lambda v: json.loads(v.decode("utf-8")),
-    auto_offset_reset="latest",
-    enable_auto_commit=True,
-    group_id=GROUP_ID,
-    consumer_timeout_ms=5000,
-)
-
-print(f"  Consumer group:  {GROUP_ID}")
-print(f"  Topic:           transactions")
-print(f"  Offset:          latest")
-print("-" * 60)
-
-processed = 0
-
-while True:
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+sys.path.insert(0, os.path.join(BASE_DIR, "kafka"))
+
+from clock import get_clock
+from customer_features import dedup_stats, update_customer_features_batch
+from metrics import get_metrics, start_metrics
+from profiling import start_profiling
+from settings import get_setting
+from transport import get_transport, describe_transport
+
+URGENT_LEVELS = {"MEDIUM", "HIGH"}
+RISKY_PERSONAS = {"INCOME_SHOCK", "SILENT_DRAIN"}
+STATUS_EVERY = 25  # transactions between progress lines
+
+
+# ═══════════════════════════════════════════════════════════════
+# LAG CONTROL
+# ═══════════════════════════════════════════════════════════════
+
+def event_delay(txns, clock, max_delay):
+    """Seconds between now and the newest transaction timestamp.
+
+    None when the delay does not measure lag: a simulated clock, or a
+    delay over max_delay (replayed / historical timestamps).
+    """
+    if clock.mode != "wall":
+        return None
+    # str(datetime) timestamps sort as text, so only the newest is parsed
+    stamps = [str(txn["timestamp"]) for txn in txns if "timestamp" in txn]
     try:
-        records = consumer.poll(timeout_ms=2000)
-        if not records:
+        newest = datetime.fromisoformat(max(stamps)) if stamps else None
+    except ValueError:
+        return 0.0
+    delay = max(0.0, (clock.now() - newest).total_seconds()) if newest else 0.0
+    return delay if delay <= max_delay else None
+
+
+class LagController:
+    """Sizes micro-batches from consumer lag and times each lag episode."""
+
+    def __init__(self, min_batch=None, max_batch=None, lag_threshold=None, lag_seconds=None, max_event_delay=None):
+        self.min_batch = min_batch or get_setting("feature_engine", "min_batch", 50)
+        self.max_batch = max(self.min_batch, max_batch or get_setting("feature_engine", "max_batch", 2000))
+        self.lag_threshold = lag_threshold or get_setting("feature_engine", "lag_threshold", 1000)
+        self.lag_seconds = lag_seconds or get_setting("feature_engine", "lag_seconds", 30.0)
+        self.max_event_delay = max_event_delay or get_setting("feature_engine", "max_event_delay", 3600.0)
+        self.batch_size = self.min_batch
+        self.behind_since = None
+        self.peak = (-1, "")  # (lag value, formatted) during the current episode
+        self.drain_times = []
+
+    def observe(self, backlog, delay, polled=0):
+        """Record one lag sample; returns True while the consumer is behind.
+
+        backlog (messages) wins over delay (seconds); with neither, a poll
+        that filled the batch counts as behind.
+        """
+        if backlog is not None:
+            behind, lag, key = backlog >= self.lag_threshold, f"{backlog:,} msgs", backlog
+        elif delay is not None:
+            behind, lag, key = delay >= self.lag_seconds, f"{delay:,.0f}s", delay
+        else:
+            behind, lag, key = polled >= self.batch_size, f"a full {polled:,}-msg poll", polled
+
+        if behind:
+            if self.behind_since is None:
+                self.behind_since = time.monotonic()
+                self.peak = (-1, "")
+                print(f"  [Lag] Behind by {lag}, growing batches")
+            if key > self.peak[0]:
+                self.peak = (key, lag)
+            self.batch_size = min(self.max_batch, self.batch_size * 2)
+        else:
+            if self.behind_since is not None:
+                drained = time.monotonic() - self.behind_since
+                self.drain_times.append(drained)
+                get_metrics().observe("lag_drain", drained)
+                print(f"  [Lag] Drained in {drained:.1f}s (peak {self.peak[1]})")
+                self.behind_since = None
+            self.batch_size = max(self.min_batch, self.batch_size // 2)
+        return behind
+
+    def summary(self):
+        if not self.drain_times:
+            return "no lag episodes"
+        return (f"{len(self.drain_times)} lag episode(s), drain max {max(self.drain_times):.1f}s / "
+                f"total {sum(self.drain_times):.1f}s")
+
+
+# ═══════════════════════════════════════════════════════════════
+# PRIORITY
+# ═══════════════════════════════════════════════════════════════
+
+def urgent_first(txns):
+    """first(cid, stored) for update_customer_features_batch: stored MEDIUM/HIGH or a risky persona."""
+    risky = {str(txn["customer_id"]) for txn in txns if txn.get("persona") in RISKY_PERSONAS}
+    return lambda cid, stored: stored.get("risk_level") in URGENT_LEVELS or cid in risky
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consume transactions and update customer features")
+    parser.add_argument("--prioritize", action="store_true",
+                        help="under lag, write MEDIUM/HIGH and risky-persona customers first")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  EQUILIBRATE — Feature Engine v4.1 (Behaviour-Driven)")
+    print("  Consumes transactions -> computes features -> writes Redis")
+    print("=" * 60)
+    print()
+
+    # Unique consumer group per run ensures fresh consumption (Kafka)
+    consumer = get_transport().subscribe("transactions", group="feature-engine")
+    lag = LagController()
+    metrics = start_metrics("feature_engine")
+    profiler = start_profiling("feature_engine")
+
+    print(f"  Transport:       {describe_transport()}")
+    print(f"  Topic:           transactions")
+    print(f"  Offset:          latest")
+    print(f"  Batch:           {lag.min_batch}-{lag.max_batch} "
+          f"(behind at {lag.lag_threshold:,} msgs / {lag.lag_seconds:,.0f}s)")
+    print(f"  Prioritize:      {'MEDIUM/HIGH + risky personas' if args.prioritize else 'off'}")
+    print("-" * 60)
+
+    processed = 0
+    shed = 0
+
+    while True:
+        try:
+            txns = consumer.poll(timeout_ms=2000, max_records=lag.batch_size)
+            profiler.tick(len(txns))
+            try:
+                backlog = consumer.backlog()
+            except Exception:
+                backlog = None
+            behind = lag.observe(backlog, event_delay(txns, get_clock(), lag.max_event_delay), len(txns))
+            metrics.set("backlog", backlog)
+            metrics.set("batch_size", lag.batch_size)
+            metrics.set("behind", int(behind))
+            if not txns:
+                continue
+            metrics.inc("transactions", len(txns))
+            metrics.inc("batches")
+
+            first = urgent_first(txns) if behind and args.prioritize else None
+            # Load shedding: while behind, only MEDIUM/HIGH customers get snapshot rows
+            keep = (lambda _cid, p: p["risk_level"] in URGENT_LEVELS) if behind else None
+            profiles = update_customer_features_batch(txns, snapshot_filter=keep, first=first)
+            if keep:
+                n_shed = sum(1 for cid, profile in profiles.items() if not keep(cid, profile))
+                shed += n_shed
+                metrics.inc("snapshots_shed", n_shed)
+
+            before, processed = processed, processed + len(txns)
+            if processed // STATUS_EVERY != before // STATUS_EVERY:
+                txn = txns[-1]
+                cid = txn.get("customer_id", "?")
+                persona = txn.get("persona", "?")
+                ts = datetime.now().strftime("%H:%M:%S")
+                print(f"  [{ts}] Processed {processed} transactions | "
+                      f"Last: Customer {cid} (Persona: {persona}) | "
+                      f"Duplicates skipped: {dedup_stats()['duplicates']} | "
+                      f"Batch: {lag.batch_size}" + (f" | Snapshots shed: {shed}" if shed else ""))
+
+        except KeyboardInterrupt:
+            print(f"\n  Feature Engine stopped. Total processed: {processed} "
+                  f"({dedup_stats()['duplicates']} duplicates skipped, {shed} snapshots shed; "
+                  f"{lag.summary()})")
+            break
+        except Exception as e:
+            print(f"  [ERROR] {e}")
             continue
 
-        for tp, messages in records.items():
-            for msg in messages:
-                txn = msg.value
-                update_customer_features(txn)
-                processed += 1
-
-                if processed % 25 == 0:
-                    cid = txn.get("customer_id", "?")
-                    persona = txn.get("persona", "?")
-                    ts = datetime.now().strftime("%H:%M:%S")
-                    print(f"  [{ts}] Processed {processed} transactions | "
-                          f"Last: Customer {cid} (Persona: {persona})")
-
-    except KeyboardInterrupt:
-        print(f"\n  Feature Engine stopped. Total processed: {processed}")
-        break
-    except Exception as e:
-        print(f"  [ERROR] {e}")
-        continue
-
-consumer.close()
+    profiler.stop()
+    consumer.close()
+
+
+if __name__ == "__main__":
+    main()
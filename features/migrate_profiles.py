@@ -0,0 +1,89 @@
+"""
+Equilibrate — Customer Profile Migration
+Rewrites every customer:{id} profile into the target encoding
+(see profile_codec.py) and removes the fields the old layout left behind.
+
+  hash   -> packed   numeric features + rolling windows move into "_p"
+  packed -> hash     "_p" is expanded back into one field per feature
+
+Profiles already in the target encoding are skipped, so the tool can be
+re-run after an interruption. Stop the feature writers first and restart
+them with EQ_STORE_PROFILE_ENCODING set to the target once it finishes.
+
+Run:  python features/migrate_profiles.py --to packed [--batch 1000] [--dry-run]
+"""
+import argparse
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "features"))
+
+from redis_store import get_store, BATCH_SIZE
+from profile_codec import decode_profile, encode_profile, stale_fields, PACKED_FIELD, PACKED_FIELDS
+
+
+def _needs_migration(raw, target):
+    if target == "packed":
+        return PACKED_FIELD not in raw or any(f in raw for f in PACKED_FIELDS)
+    return PACKED_FIELD in raw
+
+
+def migrate_batch(store, customer_ids, target, dry_run=False):
+    """Re-encode one batch of customers. Returns the number rewritten."""
+    updates = {}
+    for cid, raw in zip(customer_ids, store.batch_get(customer_ids)):
+        if not raw or not _needs_migration(raw, target):
+            continue
+        profile = decode_profile(raw)
+        fields = [f for f in PACKED_FIELDS if f in profile]
+        updates[cid] = encode_profile(profile, fields, encoding=target)
+
+    if updates and not dry_run:
+        store.batch_update(updates)
+        store.remove_fields(list(updates), stale_fields(target))
+    return len(updates)
+
+
+def migrate(store, target, batch_size=BATCH_SIZE, dry_run=False):
+    """Migrate every profile in the store. Returns (scanned, rewritten)."""
+    scanned = rewritten = 0
+    batch = []
+    for cid in store.scan(batch_size):
+        batch.append(cid)
+        if len(batch) >= batch_size:
+            rewritten += migrate_batch(store, batch, target, dry_run)
+            scanned += len(batch)
+            batch = []
+            print(f"  [Migrate] {scanned:,} scanned | {rewritten:,} rewritten", end="\r")
+    if batch:
+        rewritten += migrate_batch(store, batch, target, dry_run)
+        scanned += len(batch)
+    return scanned, rewritten
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-encode customer profiles")
+    parser.add_argument("--to", dest="target", choices=("hash", "packed"), required=True)
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="count profiles to rewrite, write nothing")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"   EQUILIBRATE — Profile Migration (-> {args.target})")
+    print("=" * 60)
+
+    t0 = time.perf_counter()
+    scanned, rewritten = migrate(get_store(), args.target, args.batch, args.dry_run)
+    elapsed = time.perf_counter() - t0
+
+    verb = "would rewrite" if args.dry_run else "rewrote"
+    print(f"\n  [Migrate] Done: {scanned:,} profiles scanned, {verb} {rewritten:,} "
+          f"in {elapsed:.1f}s")
+    if not args.dry_run:
+        print(f"  [Migrate] Restart writers with EQ_STORE_PROFILE_ENCODING={args.target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Equilibrate — Customer Profile Codec
+Shared encoder/decoder for customer:{id} profiles. Every reader goes
+through decode_profile(), so numeric parsing happens in one place and the
+storage layout can change without touching callers.
+
+Encodings (store.profile_encoding):
+
+  hash    one hash field per feature, values as strings, rolling windows
+          as JSON lists (the original layout; default)
+
+  packed  numeric features + rolling windows in a single binary field
+          "_p"; txn_count (the compare-and-set token) and the fields other
+          processes write (risk_*, hardship_type, persona, timestamps,
+          intervention feedback) stay plain hash fields
+
+Packed layout v1 (little-endian):
+  header   B version, B n_txn, B n_atm, B n_spend
+  numeric  d total_spend, d essential_spend, d discretionary_spend,
+           f spending_change_pct, i days_since_salary,
+           I withdrawals, I salary_count, H atm_withdrawals_7d,
+           H txn_frequency_7d
+  windows  I[n_txn] txn epoch seconds, I[n_atm] ATM epoch seconds,
+           f[n_spend] spend amounts
+
+Rolling-window timestamps are epoch seconds in the typed profile. Older
+hash profiles that still hold ISO strings are converted on read.
+
+A "_p" field wins over plain numeric fields, so switching packed -> hash
+needs the migration tool (features/migrate_profiles.py --to hash) to run
+before the writers restart.
+"""
+import json
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+
+from settings import get_setting
+
+PACKED_FIELD = "_p"
+PACKED_VERSION = 1
+
+INT_FIELDS = (
+    "txn_count", "withdrawals", "salary_count", "atm_withdrawals_7d",
+    "txn_frequency_7d", "days_since_salary", "risk_score",
+)
+FLOAT_FIELDS = ("total_spend", "essential_spend", "discretionary_spend", "spending_change_pct")
+LIST_FIELDS = ("_txn_timestamps", "_atm_timestamps", "_spend_history")
+
+# Fields carried inside the packed blob (everything else stays a hash field)
+PACKED_FIELDS = (
+    "total_spend", "essential_spend", "discretionary_spend", "spending_change_pct",
+    "days_since_salary", "withdrawals", "salary_count", "atm_withdrawals_7d",
+    "txn_frequency_7d",
+) + LIST_FIELDS
+
+_HEADER = struct.Struct("<BBBB")
+_NUMERIC = struct.Struct("<dddfiIIHH")
+_SWAP = sys.byteorder != "little"
+
+
+def get_encoding():
+    """Configured profile encoding: "hash" (default) or "packed"."""
+    return get_setting("store", "profile_encoding", "hash")
+
+
+# ═══════════════════════════════════════════════════════════════
+# DECODE
+# ═══════════════════════════════════════════════════════════════
+
+def _to_epoch(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return 0.0
+    return float(value)
+
+
+def _load_list(value):
+    if isinstance(value, list):
+        return value
+    try:
+        return json.loads(value or "[]")
+    except (json.JSONDecodeError, TypeError):
+        return []
+
+
+def decode_profile(raw):
+    """Decode a stored profile (either encoding) into typed values.
+
+    Returns a new dict; unknown fields are passed through unchanged.
+    """
+    p = dict(raw)
+    blob = p.pop(PACKED_FIELD, None)
+    if isinstance(blob, str):
+        blob = blob.encode("utf-8")
+    if blob:
+        p.update(unpack_features(blob))
+    else:
+        for f in LIST_FIELDS:
+            if f in p:
+                p[f] = _load_list(p[f])
+        for f in ("_txn_timestamps", "_atm_timestamps"):
+            if p.get(f) and isinstance(p[f][0], str):
+                p[f] = [_to_epoch(t) for t in p[f]]
+    for f in INT_FIELDS:
+        v = p.get(f)
+        if v is not None and not isinstance(v, int):
+            p[f] = int(float(v or 0))
+    for f in FLOAT_FIELDS:
+        v = p.get(f)
+        if v is not None and not isinstance(v, float):
+            p[f] = float(v or 0)
+    return p
+
+
+def unpack_features(blob):
+    """Decode a packed blob into its typed feature fields."""
+    version, n_txn, n_atm, n_spend = _HEADER.unpack_from(blob, 0)
+    if version != PACKED_VERSION:
+        raise ValueError(f"Unsupported packed profile version {version}")
+    (total, essential, discretionary, change, days,
+     withdrawals, salary_count, atm_7d, freq_7d) = _NUMERIC.unpack_from(blob, _HEADER.size)
+
+    offset = _HEADER.size + _NUMERIC.size
+    txn_ts = array("I")
+    txn_ts.frombytes(blob[offset:offset + 4 * n_txn])
+    offset += 4 * n_txn
+    atm_ts = array("I")
+    atm_ts.frombytes(blob[offset:offset + 4 * n_atm])
+    offset += 4 * n_atm
+    spend = array("f")
+    spend.frombytes(blob[offset:offset + 4 * n_spend])
+    if _SWAP:
+        txn_ts.byteswap()
+        atm_ts.byteswap()
+        spend.byteswap()
+
+    return {
+        "total_spend": total,
+        "essential_spend": essential,
+        "discretionary_spend": discretionary,
+        "spending_change_pct": round(change, 1),
+        "days_since_salary": days,
+        "withdrawals": withdrawals,
+        "salary_count": salary_count,
+        "atm_withdrawals_7d": atm_7d,
+        "txn_frequency_7d": freq_7d,
+        "_txn_timestamps": [float(t) for t in txn_ts],
+        "_atm_timestamps": [float(t) for t in atm_ts],
+        "_spend_history": spend.tolist(),
+    }
+
+
+# ═══════════════════════════════════════════════════════════════
+# ENCODE
+# ═══════════════════════════════════════════════════════════════
+
+def pack_features(p):
+    """Encode the packed feature fields of a typed profile into bytes."""
+    txn_ts = array("I", (int(t) for t in p.get("_txn_timestamps", [])[-255:]))
+    atm_ts = array("I", (int(t) for t in p.get("_atm_timestamps", [])[-255:]))
+    spend = array("f", p.get("_spend_history", [])[-255:])
+    if _SWAP:
+        txn_ts.byteswap()
+        atm_ts.byteswap()
+        spend.byteswap()
+    return b"".join((
+        _HEADER.pack(PACKED_VERSION, len(txn_ts), len(atm_ts), len(spend)),
+        _NUMERIC.pack(
+            float(p.get("total_spend", 0.0)),
+            float(p.get("essential_spend", 0.0)),
+            float(p.get("discretionary_spend", 0.0)),
+            float(p.get("spending_change_pct", 0.0)),
+            int(p.get("days_since_salary", -1)),
+            int(p.get("withdrawals", 0)),
+            int(p.get("salary_count", 0)),
+            min(int(p.get("atm_withdrawals_7d", 0)), 0xFFFF),
+            min(int(p.get("txn_frequency_7d", 0)), 0xFFFF),
+        ),
+        txn_ts.tobytes(),
+        atm_ts.tobytes(),
+        spend.tobytes(),
+    ))
+
+
+def encode_profile(p, fields, encoding=None):
+    """Encode the given fields of a typed profile for the feature store.
+
+    Returns a field -> value mapping (str values, plus one bytes value in
+    packed mode).
+    """
+    encoding = encoding or get_encoding()
+    out = {}
+    if encoding == "packed":
+        out[PACKED_FIELD] = pack_features(p)
+        fields = [f for f in fields if f not in PACKED_FIELDS]
+    for k in fields:
+        v = p[k]
+        if k in LIST_FIELDS:
+            out[k] = json.dumps([round(x, 3) for x in v])
+        else:
+            out[k] = str(v)
+    return out
+
+
+def stale_fields(encoding=None):
+    """Hash fields made redundant by the given encoding (removed on migration)."""
+    encoding = encoding or get_encoding()
+    if encoding == "packed":
+        return list(PACKED_FIELDS)
+    return [PACKED_FIELD]
@@ -0,0 +1,176 @@
+"""
+Equilibrate — Inactive-Profile Tiering
+Moves profiles of customers who have not transacted for tiering.idle_days
+out of the hot feature store into a cold SQLite file, leaving a small stub
+behind so that hot-store memory scales with active customers.
+
+Stub (hot store, customer:{id}):
+  _cold = "1" plus txn_count, risk_level, risk_score, hardship_type,
+  persona, last_updated — enough for portfolio counts and alert scans.
+
+Rehydration is transparent: update_customer_features(), evaluate_customer()
+and the dashboard profile view call rehydrate(), which swaps the full
+profile back in (compare-and-set on the _cold marker) and drops the cold
+copy. Fields written to the stub while it was cold (e.g. intervention
+feedback) win over the cold copy.
+
+Tier-out is a compare-and-set on txn_count, so a customer who transacts
+while being tiered simply stays hot.
+
+Configuration:
+  EQ_TIERING_IDLE_DAYS   (default 90)
+  EQ_TIERING_COLD_PATH   (default data/cold_profiles.db)
+  EQ_TIERING_INTERVAL    seconds between passes with --loop (default 3600)
+
+Run:  python features/profile_tiering.py [--idle-days 90] [--loop] [--dry-run]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+sys.path.insert(0, os.path.join(BASE_DIR, "features"))
+
+from settings import get_setting
+from clock import get_clock
+from redis_store import get_store, SQLiteFeatureStore, BATCH_SIZE
+
+COLD_MARKER = "_cold"
+STUB_FIELDS = ("txn_count", "risk_level", "risk_score", "hardship_type", "persona", "last_updated")
+REHYDRATE_RETRIES = 3
+
+# ── Cold store (opened on first use) ──
+_cold_store = None
+
+
+def get_cold_store():
+    """Return the process-wide cold store (tiering.cold_path)."""
+    global _cold_store
+    if _cold_store is None:
+        _cold_store = SQLiteFeatureStore(get_setting(
+            "tiering", "cold_path", os.path.join(BASE_DIR, "data", "cold_profiles.db")
+        ))
+    return _cold_store
+
+
+def set_cold_store(store):
+    """Install a specific cold store instance (benchmarks, tests, local runs)."""
+    global _cold_store
+    _cold_store = store
+    return store
+
+
+def is_stub(raw):
+    """True if a stored profile is a tiered-out stub."""
+    return bool(raw) and raw.get(COLD_MARKER) == "1"
+
+
+# ═══════════════════════════════════════════════════════════════
+# REHYDRATE
+# ═══════════════════════════════════════════════════════════════
+
+def rehydrate(customer_id, store=None, cold=None):
+    """Return the full stored profile, moving it back to the hot store if cold."""
+    store = store or get_store()
+    cold = cold or get_cold_store()
+    cid = str(customer_id)
+
+    for _ in range(REHYDRATE_RETRIES):
+        hot = store.get(cid)
+        if not is_stub(hot):
+            return hot
+        profile = cold.get(cid)
+        if not profile:
+            print(f"  [Tiering] Warning: no cold copy for customer {cid}, keeping stub fields")
+        profile.update((k, v) for k, v in hot.items() if k != COLD_MARKER)
+        if store.compare_and_set(cid, COLD_MARKER, "1", profile, replace=True):
+            cold.delete([cid])
+            return profile
+    return store.get(cid)
+
+
+# ═══════════════════════════════════════════════════════════════
+# TIER OUT
+# ═══════════════════════════════════════════════════════════════
+
+def tier_out_batch(store, cold, customer_ids, cutoff, dry_run=False):
+    """Move idle profiles in one batch to the cold store. Returns the number moved."""
+    idle = {}
+    for cid, raw in zip(customer_ids, store.batch_get(customer_ids)):
+        if not raw or is_stub(raw):
+            continue
+        last = raw.get("last_updated", "")
+        if last and last < cutoff:
+            idle[cid] = raw
+    if not idle or dry_run:
+        return len(idle)
+
+    # Cold copy first: a crash after this leaves the profile hot and intact
+    cold.delete(list(idle))
+    cold.batch_update(idle)
+
+    moved, still_active = 0, []
+    for cid, raw in idle.items():
+        stub = {f: raw[f] for f in STUB_FIELDS if f in raw}
+        stub[COLD_MARKER] = "1"
+        if store.compare_and_set(cid, "txn_count", raw.get("txn_count"), stub, replace=True):
+            moved += 1
+        else:
+            still_active.append(cid)
+    if still_active:
+        cold.delete(still_active)
+    return moved
+
+
+def tier_out(store=None, cold=None, idle_days=None, batch_size=BATCH_SIZE, dry_run=False):
+    """One tiering pass over the hot store. Returns (scanned, moved)."""
+    store = store or get_store()
+    cold = cold or get_cold_store()
+    if idle_days is None:
+        idle_days = get_setting("tiering", "idle_days", 90)
+    cutoff = (get_clock().now() - timedelta(days=idle_days)).strftime("%Y-%m-%d %H:%M:%S")
+
+    scanned = moved = 0
+    batch = []
+    for cid in store.scan(batch_size):
+        batch.append(cid)
+        if len(batch) >= batch_size:
+            moved += tier_out_batch(store, cold, batch, cutoff, dry_run)
+            scanned += len(batch)
+            batch = []
+    if batch:
+        moved += tier_out_batch(store, cold, batch, cutoff, dry_run)
+        scanned += len(batch)
+    return scanned, moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move idle customer profiles to cold storage")
+    parser.add_argument("--idle-days", type=int, default=get_setting("tiering", "idle_days", 90))
+    parser.add_argument("--loop", action="store_true", help="repeat every tiering.interval seconds")
+    parser.add_argument("--dry-run", action="store_true", help="count idle profiles, move nothing")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("   EQUILIBRATE — Profile Tiering")
+    print(f"   Idle threshold: {args.idle_days} days")
+    print("=" * 60)
+
+    interval = get_setting("tiering", "interval", 3600)
+    while True:
+        t0 = time.perf_counter()
+        scanned, moved = tier_out(idle_days=args.idle_days, dry_run=args.dry_run)
+        now = get_clock().now().strftime("%H:%M:%S")
+        verb = "idle" if args.dry_run else "moved to cold"
+        print(f"  [{now}] [Tiering] {scanned:,} scanned | {moved:,} {verb} | "
+              f"cold total {get_cold_store().count():,} | {time.perf_counter() - t0:.1f}s")
+        if not args.loop:
+            break
+        get_clock().sleep(interval)
+
+
+if __name__ == "__main__":
+    main()
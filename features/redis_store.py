@@ -0,0 +1,489 @@
+"""
+Equilibrate — Feature Store
+One interface for reading and writing customer profiles, so the pipeline
+does not depend on raw Redis hash commands or key formats.
+
+A profile is a flat dict of field -> str, exactly what HGETALL on
+customer:{customer_id} returns (plus the binary "_p" field when profiles
+use the packed encoding, see profile_codec.py). Every backend stores and
+returns the same shape, so callers can switch backends without code
+changes. Readers turn it into typed values with decode_profile().
+
+Operations:
+  get(cid)                         -> profile dict ({} if missing)
+  put(cid, mapping)                   merge fields into a profile
+  batch_get(cids)                  -> list of profile dicts, same order
+  batch_update({cid: mapping})        merge many profiles in one round-trip
+  scan(batch_size)                 -> iterator over customer ids
+  compare_and_set(cid, field, expected, mapping, replace=False)
+                                   -> True if field == expected (None =
+                                      field absent) and mapping was applied
+                                      (replace=True swaps the whole profile)
+  batch_compare_and_set([(cid, field, expected, mapping), ...])
+                                   -> list of bools, one compare_and_set per
+                                      item in one round-trip (each item is
+                                      atomic on its own, not the batch)
+  remove_fields(cids, fields)         drop fields from many profiles
+  delete(cids), count()
+
+Backends (store.backend = redis | memory | sqlite):
+  RedisFeatureStore   customer:{id} hashes, pipelined batches, Lua CAS
+  MemoryFeatureStore  in-process dicts — tests/benchmarks at memory speed
+  SQLiteFeatureStore  single-file store (store.sqlite_path)
+
+Usage:
+    from redis_store import get_store
+    store = get_store()
+"""
+import base64
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+sys.path.insert(0, os.path.join(BASE_DIR, "storage"))
+
+from settings import get_setting
+
+KEY_PREFIX = "customer:"
+
+# Pipeline / transaction chunk size for batch operations
+BATCH_SIZE = 1000
+
+
+def customer_key(customer_id):
+    """Redis key for a customer profile."""
+    return f"{KEY_PREFIX}{customer_id}"
+
+
+def _as_str_mapping(mapping):
+    return {k: v if isinstance(v, bytes) else str(v) for k, v in mapping.items()}
+
+
+# Binary hash fields (see profile_codec.PACKED_FIELD), returned as bytes
+BINARY_FIELDS = {"_p"}
+
+
+def _decode_hash(raw):
+    """bytes -> str for every field except the binary ones."""
+    out = {}
+    for k, v in raw.items():
+        k = k.decode("utf-8")
+        out[k] = v if k in BINARY_FIELDS else v.decode("utf-8")
+    return out
+
+
+# ═══════════════════════════════════════════════════════════════
+# INTERFACE
+# ═══════════════════════════════════════════════════════════════
+
+class FeatureStore:
+    """Base class — backends override the primitive operations."""
+
+    name = "base"
+
+    def get(self, customer_id):
+        raise NotImplementedError
+
+    def put(self, customer_id, mapping):
+        raise NotImplementedError
+
+    def batch_get(self, customer_ids):
+        return [self.get(cid) for cid in customer_ids]
+
+    def batch_update(self, updates):
+        for cid, mapping in updates.items():
+            self.put(cid, mapping)
+
+    def scan(self, batch_size=BATCH_SIZE):
+        raise NotImplementedError
+
+    def compare_and_set(self, customer_id, field, expected, mapping, replace=False):
+        raise NotImplementedError
+
+    def batch_compare_and_set(self, items):
+        return [self.compare_and_set(cid, field, expected, mapping) for cid, field, expected, mapping in items]
+
+    def remove_fields(self, customer_ids, fields):
+        raise NotImplementedError
+
+    def delete(self, customer_ids):
+        raise NotImplementedError
+
+    def count(self):
+        return sum(1 for _ in self.scan())
+
+    def close(self):
+        pass
+
+
+# ═══════════════════════════════════════════════════════════════
+# REDIS BACKEND
+# ═══════════════════════════════════════════════════════════════
+
+# KEYS[1] = profile key
+# ARGV[1] = field, ARGV[2] = "1" if the field must be absent, ARGV[3] = expected,
+# ARGV[4] = "1" to replace the whole hash, ARGV[5..] = field/value pairs to write
+_CAS_SCRIPT = """
+local cur = redis.call('HGET', KEYS[1], ARGV[1])
+if ARGV[2] == '1' then
+  if cur then return 0 end
+elseif cur ~= ARGV[3] then
+  return 0
+end
+if ARGV[4] == '1' then
+  redis.call('DEL', KEYS[1])
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 5))
+return 1
+"""
+
+
+class RedisFeatureStore(FeatureStore):
+    """customer:{id} hashes on the shared connection pool.
+
+    Uses the bytes client so packed profiles survive the round-trip; text
+    fields are decoded here.
+    """
+
+    name = "redis"
+
+    def __init__(self, client=None):
+        if client is None:
+            from redis_client import get_redis
+            client = get_redis(decode_responses=False)
+        self.r = client
+        self._cas = self.r.register_script(_CAS_SCRIPT)
+
+    def get(self, customer_id):
+        return _decode_hash(self.r.hgetall(customer_key(customer_id)))
+
+    def put(self, customer_id, mapping):
+        if mapping:
+            self.r.hset(customer_key(customer_id), mapping=mapping)
+
+    def batch_get(self, customer_ids):
+        customer_ids = list(customer_ids)
+        results = []
+        for i in range(0, len(customer_ids), BATCH_SIZE):
+            pipe = self.r.pipeline(transaction=False)
+            for cid in customer_ids[i:i + BATCH_SIZE]:
+                pipe.hgetall(customer_key(cid))
+            results.extend(_decode_hash(raw) for raw in pipe.execute())
+        return results
+
+    def batch_update(self, updates):
+        items = [(cid, m) for cid, m in updates.items() if m]
+        for i in range(0, len(items), BATCH_SIZE):
+            pipe = self.r.pipeline(transaction=False)
+            for cid, mapping in items[i:i + BATCH_SIZE]:
+                pipe.hset(customer_key(cid), mapping=mapping)
+            pipe.execute()
+
+    def scan(self, batch_size=BATCH_SIZE):
+        prefix_len = len(KEY_PREFIX)
+        for key in self.r.scan_iter(match=f"{KEY_PREFIX}*", count=batch_size):
+            if isinstance(key, bytes):
+                key = key.decode("utf-8")
+            yield key[prefix_len:]
+
+    @staticmethod
+    def _cas_args(field, expected, mapping, replace):
+        args = [field, "1" if expected is None else "0", "" if expected is None else str(expected),
+                "1" if replace else "0"]
+        for k, v in mapping.items():
+            args.extend((k, v))
+        return args
+
+    def compare_and_set(self, customer_id, field, expected, mapping, replace=False):
+        args = self._cas_args(field, expected, mapping, replace)
+        return bool(self._cas(keys=[customer_key(customer_id)], args=args))
+
+    def batch_compare_and_set(self, items):
+        results = []
+        for i in range(0, len(items), BATCH_SIZE):
+            pipe = self.r.pipeline(transaction=False)
+            for cid, field, expected, mapping in items[i:i + BATCH_SIZE]:
+                self._cas(keys=[customer_key(cid)], args=self._cas_args(field, expected, mapping, False),
+                          client=pipe)
+            results.extend(bool(r) for r in pipe.execute())
+        return results
+
+    def remove_fields(self, customer_ids, fields):
+        customer_ids = list(customer_ids)
+        for i in range(0, len(customer_ids), BATCH_SIZE):
+            pipe = self.r.pipeline(transaction=False)
+            for cid in customer_ids[i:i + BATCH_SIZE]:
+                pipe.hdel(customer_key(cid), *fields)
+            pipe.execute()
+
+    def delete(self, customer_ids):
+        keys = [customer_key(cid) for cid in customer_ids]
+        for i in range(0, len(keys), BATCH_SIZE):
+            self.r.delete(*keys[i:i + BATCH_SIZE])
+
+
+# ═══════════════════════════════════════════════════════════════
+# IN-PROCESS BACKEND
+# ═══════════════════════════════════════════════════════════════
+
+class MemoryFeatureStore(FeatureStore):
+    """Plain dicts guarded by a lock. Nothing survives the process."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, customer_id):
+        return dict(self._data.get(str(customer_id), {}))
+
+    def put(self, customer_id, mapping):
+        with self._lock:
+            self._data.setdefault(str(customer_id), {}).update(_as_str_mapping(mapping))
+
+    def batch_update(self, updates):
+        with self._lock:
+            for cid, mapping in updates.items():
+                self._data.setdefault(str(cid), {}).update(_as_str_mapping(mapping))
+
+    def scan(self, batch_size=BATCH_SIZE):
+        return iter(list(self._data))
+
+    def compare_and_set(self, customer_id, field, expected, mapping, replace=False):
+        cid = str(customer_id)
+        with self._lock:
+            current = self._data.get(cid, {}).get(field)
+            if current != (None if expected is None else str(expected)):
+                return False
+            if replace:
+                self._data[cid] = {}
+            self._data.setdefault(cid, {}).update(_as_str_mapping(mapping))
+            return True
+
+    def remove_fields(self, customer_ids, fields):
+        with self._lock:
+            for cid in customer_ids:
+                profile = self._data.get(str(cid))
+                for f in fields if profile is not None else ():
+                    profile.pop(f, None)
+
+    def delete(self, customer_ids):
+        with self._lock:
+            for cid in customer_ids:
+                self._data.pop(str(cid), None)
+
+    def count(self):
+        return len(self._data)
+
+
+# ═══════════════════════════════════════════════════════════════
+# SQLITE BACKEND
+# ═══════════════════════════════════════════════════════════════
+
+class SQLiteFeatureStore(FeatureStore):
+    """One row per customer, profile stored as a JSON object.
+
+    Binary values (packed profiles) are stored as {"$b": base64}.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path=None):
+        self.path = path or get_setting(
+            "store", "sqlite_path", os.path.join(BASE_DIR, "data", "feature_store.db")
+        )
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS profiles (customer_id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _dumps(profile):
+        return json.dumps({
+            k: {"$b": base64.b64encode(v).decode("ascii")} if isinstance(v, bytes) else v
+            for k, v in profile.items()
+        })
+
+    @staticmethod
+    def _loads(data):
+        profile = json.loads(data)
+        for k, v in profile.items():
+            if isinstance(v, dict):
+                profile[k] = base64.b64decode(v["$b"])
+        return profile
+
+    def _read(self, cid):
+        row = self._conn.execute(
+            "SELECT data FROM profiles WHERE customer_id = ?", (cid,)
+        ).fetchone()
+        return self._loads(row[0]) if row else {}
+
+    def _write(self, cid, profile):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO profiles (customer_id, data) VALUES (?, ?)",
+            (cid, self._dumps(profile)),
+        )
+
+    def get(self, customer_id):
+        return self._read(str(customer_id))
+
+    def put(self, customer_id, mapping):
+        self.batch_update({customer_id: mapping})
+
+    def batch_get(self, customer_ids):
+        customer_ids = [str(c) for c in customer_ids]
+        found = {}
+        for i in range(0, len(customer_ids), 500):
+            chunk = customer_ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for cid, data in self._conn.execute(
+                f"SELECT customer_id, data FROM profiles WHERE customer_id IN ({marks})", chunk
+            ):
+                found[cid] = self._loads(data)
+        return [found.get(cid, {}) for cid in customer_ids]
+
+    def batch_update(self, updates):
+        items = [(str(cid), m) for cid, m in updates.items()]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                current = dict(zip((cid for cid, _ in items), self.batch_get(cid for cid, _ in items)))
+                rows = []
+                for cid, mapping in items:
+                    profile = current[cid]
+                    profile.update(_as_str_mapping(mapping))
+                    rows.append((cid, self._dumps(profile)))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO profiles (customer_id, data) VALUES (?, ?)", rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def scan(self, batch_size=BATCH_SIZE):
+        last = ""
+        while True:
+            rows = self._conn.execute(
+                "SELECT customer_id FROM profiles WHERE customer_id > ? ORDER BY customer_id LIMIT ?",
+                (last, batch_size),
+            ).fetchall()
+            if not rows:
+                return
+            for (cid,) in rows:
+                yield cid
+            last = rows[-1][0]
+
+    def compare_and_set(self, customer_id, field, expected, mapping, replace=False):
+        cid = str(customer_id)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                profile = self._read(cid)
+                if profile.get(field) != (None if expected is None else str(expected)):
+                    self._conn.execute("ROLLBACK")
+                    return False
+                if replace:
+                    profile = {}
+                profile.update(_as_str_mapping(mapping))
+                self._write(cid, profile)
+                self._conn.execute("COMMIT")
+                return True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def batch_compare_and_set(self, items):
+        items = [(str(cid), field, expected, mapping) for cid, field, expected, mapping in items]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                current = dict(zip((item[0] for item in items), self.batch_get(item[0] for item in items)))
+                results, rows = [], []
+                for cid, field, expected, mapping in items:
+                    profile = current[cid]
+                    ok = profile.get(field) == (None if expected is None else str(expected))
+                    if ok:
+                        profile.update(_as_str_mapping(mapping))
+                        rows.append((cid, self._dumps(profile)))
+                    results.append(ok)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO profiles (customer_id, data) VALUES (?, ?)", rows
+                )
+                self._conn.execute("COMMIT")
+                return results
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def remove_fields(self, customer_ids, fields):
+        customer_ids = [str(c) for c in customer_ids]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = []
+                for cid, profile in zip(customer_ids, self.batch_get(customer_ids)):
+                    if profile:
+                        for f in fields:
+                            profile.pop(f, None)
+                        rows.append((cid, self._dumps(profile)))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO profiles (customer_id, data) VALUES (?, ?)", rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, customer_ids):
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM profiles WHERE customer_id = ?", [(str(c),) for c in customer_ids]
+            )
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+# ═══════════════════════════════════════════════════════════════
+# FACTORY
+# ═══════════════════════════════════════════════════════════════
+
+BACKENDS = {
+    "redis": RedisFeatureStore,
+    "memory": MemoryFeatureStore,
+    "sqlite": SQLiteFeatureStore,
+}
+
+_store = None
+
+
+def get_store():
+    """Return the process-wide feature store (store.backend, default redis)."""
+    global _store
+    if _store is None:
+        backend = get_setting("store", "backend", "redis")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown store backend '{backend}' (expected one of {sorted(BACKENDS)})")
+        _store = BACKENDS[backend]()
+    return _store
+
+
+def set_store(store):
+    """Install a specific store instance (benchmarks, tests, local runs)."""
+    global _store
+    _store = store
+    return store
@@ -0,0 +1,316 @@
+"""
+Equilibrate — Synthetic Portfolio Seeder
+Writes N fully-formed customer:{id} profiles straight into the feature
+store, for dashboard and query benchmarks at 100k-1M+ customers without
+running the transaction pipeline for days.
+
+Profiles are drawn per persona (the producer's assign_persona(), so a
+seeded customer keeps its persona when real traffic arrives) from the same
+behaviour the producer simulates:
+
+  STABLE        salary ~10% of transactions, balanced spending, no ATM
+  OVERSPENDER   salary ~8%, 80% discretionary at high amounts
+  INCOME_SHOCK  no salary, ~40% ATM withdrawals, essential spending
+  SILENT_DRAIN  no salary, low activity, ~25% ATM withdrawals
+
+Counts, spend totals, rolling windows (7-day transaction / ATM timestamps,
+the last 30 amounts), salary dates and the duplicate-detection ring are all
+filled in. risk_score, risk_level, hardship_type and recommended_action come
+from the shared rules (risk_rules.evaluate_arrays, the risk monitor's view),
+so the level and hardship mix follows from the features rather than being
+drawn separately. Profiles are encoded with the configured
+store.profile_encoding.
+
+The dashboard and risk monitor find customers by scanning customer:*, so
+there are no index or counter keys to maintain. Static attributes (city,
+age, ...) come from customers.csv; generate a matching book with
+python generate_customers.py --customers N.
+
+Each --chunk of customers has its own random stream from --seed, so the
+same --seed, --as-of and --chunk give the same portfolio with any number
+of --workers.
+
+Run:  python features/seed_portfolio.py --customers 1000000 [--workers 4] [--replace]
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+sys.path.insert(0, os.path.join(BASE_DIR, "storage"))
+sys.path.insert(0, os.path.join(BASE_DIR, "risk"))
+sys.path.insert(0, os.path.join(BASE_DIR, "features"))
+
+from clock import get_clock
+from customer_features import DEDUP_WINDOW, FEATURE_FIELDS, FINGERPRINT_CHARS, SEEN_FIELD
+from profile_codec import LIST_FIELDS, encode_profile, get_encoding
+from redis_store import get_store
+from risk_rules import evaluate_arrays
+
+PERSONAS = ("STABLE", "OVERSPENDER", "INCOME_SHOCK", "SILENT_DRAIN")
+
+# persona: share of transactions that are salary credits / ATM withdrawals,
+# share of other debits that are essential, amount ranges, transactions per
+# week and median lifetime transactions (kafka/transaction_producer.py)
+PERSONA_BEHAVIOUR = {
+    "STABLE":       {"salary": 0.10, "atm": 0.00, "essential": 0.60, "ess_amount": (100, 2500),
+                     "disc_amount": (200, 3000), "atm_amount": (0, 0), "per_week": 5, "median_txns": 40},
+    "OVERSPENDER":  {"salary": 0.08, "atm": 0.00, "essential": 0.20, "ess_amount": (100, 1500),
+                     "disc_amount": (800, 12000), "atm_amount": (0, 0), "per_week": 9, "median_txns": 70},
+    "INCOME_SHOCK": {"salary": 0.00, "atm": 0.40, "essential": 0.90, "ess_amount": (50, 1200),
+                     "disc_amount": (50, 400), "atm_amount": (1000, 8000), "per_week": 12, "median_txns": 90},
+    "SILENT_DRAIN": {"salary": 0.00, "atm": 0.25, "essential": 1.00, "ess_amount": (50, 600),
+                     "disc_amount": (50, 600), "atm_amount": (200, 3000), "per_week": 2, "median_txns": 15},
+}
+SALARY_MEDIAN = 50000
+MISSED_SALARY_SHARE = 0.05   # salaried customers whose last salary is 1-2 months old
+SPEND_HISTORY = 30
+WEEK = 7 * 86400
+
+# ── Kinds of transaction in the spend history ──
+SALARY, ATM, ESSENTIAL, DISCRETIONARY = range(4)
+
+
+def persona_for(customer_id):
+    """transaction_producer.assign_persona() without importing the producer."""
+    h = int(hashlib.md5(str(customer_id).encode()).hexdigest(), 16) % 100
+    return "STABLE" if h < 70 else "OVERSPENDER" if h < 85 else "INCOME_SHOCK" if h < 95 else "SILENT_DRAIN"
+
+
+# ═══════════════════════════════════════════════════════════════
+# GENERATION
+# ═══════════════════════════════════════════════════════════════
+
+def draw_features(start_id, n, seed, chunk, as_of):
+    """DataFrame of typed profile columns for customers start_id .. start_id + n - 1."""
+    rng = np.random.default_rng([seed, chunk])
+    ids = np.arange(start_id, start_id + n)
+    index = {p: i for i, p in enumerate(PERSONAS)}
+    persona = np.fromiter((index[persona_for(cid)] for cid in ids), dtype=np.int64, count=n)
+
+    def per(key):
+        """Per-customer values of one PERSONA_BEHAVIOUR entry ((n, 2) for amount ranges)."""
+        return np.array([PERSONA_BEHAVIOUR[p][key] for p in PERSONAS], dtype=float)[persona]
+
+    # ── Lifetime counts ──
+    txn_count = np.maximum(1, rng.lognormal(np.log(per("median_txns")), 0.8)).astype(np.int64)
+    salary_count = rng.binomial(txn_count, per("salary"))
+    withdrawals = rng.binomial(txn_count - salary_count, per("atm"))
+    debits = txn_count - salary_count - withdrawals
+    n_essential = rng.binomial(debits, per("essential"))
+    n_discretionary = debits - n_essential
+
+    def spend(count, key):
+        """Sum of count uniform amounts (normal approximation)."""
+        bounds = per(key)
+        low, high = bounds[:, 0], bounds[:, 1]
+        mean, sd = (low + high) / 2, (high - low) / np.sqrt(12)
+        return np.maximum(0.0, count * mean + np.sqrt(count) * sd * rng.standard_normal(n)).round()
+
+    atm_spend = spend(withdrawals, "atm_amount")
+    essential_spend = spend(n_essential, "ess_amount")
+    discretionary_spend = spend(n_discretionary, "disc_amount") + atm_spend
+
+    # ── Event times (epoch seconds) ──
+    now = as_of.timestamp()
+    per_week = per("per_week")
+    last_ts = now - np.minimum(rng.exponential(WEEK / per_week), 30 * 86400)
+    lifetime = np.maximum(txn_count / per_week * WEEK, 86400.0)
+    first_ts = last_ts - lifetime * rng.uniform(0.8, 1.2, n)
+
+    days_since = np.where(rng.random(n) < MISSED_SALARY_SHARE,
+                          rng.integers(31, 62, n), rng.integers(0, 31, n))
+    has_salary = salary_count > 0
+    salary_ts = last_ts - days_since * 86400 - rng.integers(0, 86400, n)
+    days_since_salary = np.where(has_salary, days_since, -1)
+
+    # ── Rolling windows ──
+    freq_7d = np.minimum(txn_count, 1 + rng.poisson(np.maximum(per_week - 1, 0)))
+    atm_7d = rng.binomial(freq_7d, per("atm"))
+    txn_windows = _windows(rng, last_ts, freq_7d, include_last=True)
+    atm_windows = _windows(rng, last_ts, atm_7d, include_last=False)
+
+    # Last SPEND_HISTORY amounts, oldest first (salary credits included, as
+    # in customer_features._update_rolling_windows)
+    depth = np.minimum(txn_count, SPEND_HISTORY)
+    draw = rng.random((n, SPEND_HISTORY))
+    salary_p, atm_p = per("salary")[:, None], per("atm")[:, None]
+    ess_p = per("essential")[:, None]
+    kind = np.select(
+        [draw < salary_p, draw < salary_p + atm_p, draw < salary_p + atm_p + (1 - salary_p - atm_p) * ess_p],
+        [SALARY, ATM, ESSENTIAL], default=DISCRETIONARY,
+    )
+    salary = np.clip(rng.lognormal(np.log(SALARY_MEDIAN), 0.4, n), 2000, 150000).round()
+    amounts = np.zeros((n, SPEND_HISTORY))
+    for code, key in ((ATM, "atm_amount"), (ESSENTIAL, "ess_amount"), (DISCRETIONARY, "disc_amount")):
+        bounds = per(key)
+        sampled = rng.integers(bounds[:, 0, None], bounds[:, 1, None] + 1, (n, SPEND_HISTORY))
+        amounts = np.where(kind == code, sampled, amounts)
+    amounts = np.where(kind == SALARY, salary[:, None], amounts)
+    recent, previous = amounts[:, -5:].sum(axis=1), amounts[:, -10:-5].sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(previous > 0, ((recent - previous) / np.where(previous > 0, previous, 1) * 100), 0.0)
+    spending_change = np.where(depth >= 10, change.round(1), 0.0)
+
+    df = pd.DataFrame({
+        "txn_count": txn_count,
+        "total_spend": essential_spend + discretionary_spend,
+        "withdrawals": withdrawals,
+        "salary_count": salary_count,
+        "last_salary_date": np.where(has_salary, _format_times(salary_ts, as_of), ""),
+        "essential_spend": essential_spend,
+        "discretionary_spend": discretionary_spend,
+        "atm_withdrawals_7d": atm_7d,
+        "txn_frequency_7d": freq_7d,
+        "spending_change_pct": spending_change,
+        "days_since_salary": days_since_salary,
+        "persona": np.array(PERSONAS, dtype=object)[persona],
+        "last_updated": _format_times(last_ts, as_of),
+        "first_seen": _format_times(first_ts, as_of),
+    }, index=ids.astype(str))
+    df["_txn_timestamps"] = txn_windows
+    df["_atm_timestamps"] = atm_windows
+    recent_slots = np.arange(SPEND_HISTORY) >= SPEND_HISTORY - depth[:, None]
+    df["_spend_history"] = _split(amounts[recent_slots].astype(np.int64), depth)
+    ring = np.minimum(txn_count, DEDUP_WINDOW) * FINGERPRINT_CHARS
+    fingerprints = rng.bytes(int(ring.sum()) // 2).hex()
+    df[SEEN_FIELD] = [fingerprints[end - k:end] for end, k in zip(np.cumsum(ring).tolist(), ring.tolist())]
+
+    for col, values in evaluate_arrays(df).items():
+        df[col] = values
+    return df
+
+
+def _windows(rng, last_ts, counts, include_last):
+    """Per-customer sorted lists of counts epoch seconds in the week up to last_ts."""
+    offsets = rng.uniform(0, WEEK, int(counts.sum()))
+    ends = np.cumsum(counts)
+    if include_last:  # the customer's last transaction is in its own window
+        offsets[(ends - counts)[counts > 0]] = 0.0
+    owner = np.repeat(np.arange(len(counts)), counts)
+    times = np.floor(np.repeat(last_ts, counts) - offsets).astype(np.int64)
+    return _split(times[np.lexsort((times, owner))], counts)
+
+
+def _split(values, counts):
+    """Consecutive runs of counts values, as lists of Python ints."""
+    flat = values.tolist()
+    ends = np.cumsum(counts).tolist()
+    return [flat[end - count:end] for end, count in zip(ends, counts.tolist())]
+
+
+def _format_times(ts, as_of):
+    """Epoch seconds -> "YYYY-mm-dd HH:MM:SS" in as_of's (local, naive) time."""
+    local = np.datetime64(as_of, "s") + np.round(ts - as_of.timestamp()).astype("timedelta64[s]")
+    return np.char.replace(np.datetime_as_string(local, unit="s"), "T", " ").astype(object)
+
+
+# ═══════════════════════════════════════════════════════════════
+# WRITE
+# ═══════════════════════════════════════════════════════════════
+
+def encode_chunk(df, encoding):
+    """{customer_id: stored mapping}, as encode_profile() would write each row."""
+    fields = list(FEATURE_FIELDS)
+    columns = [df[f].tolist() for f in fields]
+    if encoding == "hash":
+        # Column-wise. Window values are whole seconds / amounts (ints here),
+        # written as the floats encode_profile would write ("[1.0, 2.0]")
+        encoded = [[_whole_list(v) for v in col] if f in LIST_FIELDS else [str(v) for v in col]
+                   for f, col in zip(fields, columns)]
+        return {cid: dict(zip(fields, values)) for cid, values in zip(df.index, zip(*encoded))}
+    return {cid: encode_profile(dict(zip(fields, values)), fields, encoding)
+            for cid, values in zip(df.index, zip(*columns))}
+
+
+def _whole_list(values):
+    return "[" + ".0, ".join(map(str, values)) + ".0]" if values else "[]"
+
+
+def seed_chunk(task):
+    """Draw, encode and write one chunk. Returns the number of profiles written."""
+    start_id, n, seed, chunk, as_of, batch_size, encoding = task
+    store = get_store()
+    updates = encode_chunk(draw_features(start_id, n, seed, chunk, as_of), encoding)
+    ids = list(updates)
+    for i in range(0, len(ids), batch_size):
+        store.batch_update({cid: updates[cid] for cid in ids[i:i + batch_size]})
+    return n
+
+
+def clear_store(store):
+    """Delete every customer profile. Returns the number deleted."""
+    ids = list(store.scan())
+    for i in range(0, len(ids), 10_000):
+        store.delete(ids[i:i + 10_000])
+    return len(ids)
+
+
+def seed(customers, seed=42, start_id=1, chunk=100_000, workers=1, batch_size=10_000, as_of=None, store=None):
+    """Write customers synthetic profiles to the feature store. Returns the number written."""
+    store = store or get_store()
+    as_of = as_of or get_clock().now()
+    encoding = get_encoding()
+    tasks = [(start_id + offset, min(chunk, customers - offset), seed, i, as_of, batch_size, encoding)
+             for i, offset in enumerate(range(0, customers, chunk))]
+    written = 0
+    if workers <= 1 or store.name == "memory":
+        # An in-process store is not visible from worker processes
+        results = map(seed_chunk, tasks)
+    else:
+        pool = multiprocessing.get_context("spawn").Pool(workers)
+        results = pool.imap_unordered(seed_chunk, tasks)
+    try:
+        for n in results:
+            written += n
+            print(f"  [Seed] {written:,}/{customers:,} profiles written", end="\r")
+    finally:
+        if workers > 1 and store.name != "memory":
+            pool.close()
+            pool.join()
+    print()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic customer profiles straight to the feature store")
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start-id", type=int, default=1)
+    parser.add_argument("--chunk", type=int, default=100_000, help="customers per random stream / task")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch", type=int, default=10_000, help="profiles per batch_update")
+    parser.add_argument("--as-of", default=None, help="YYYY-mm-dd[ HH:MM:SS] the profiles are current at "
+                                                      "(default: the configured clock's now)")
+    parser.add_argument("--replace", action="store_true", help="delete existing profiles first")
+    parser.add_argument("--append", action="store_true", help="add to existing profiles")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("   EQUILIBRATE — Portfolio Seeder")
+    print("=" * 60)
+    store = get_store()
+    existing = next(iter(store.scan()), None) is not None
+    if existing and args.replace:
+        print(f"  [Seed] Deleted {clear_store(store):,} existing profiles")
+    elif existing and not args.append:
+        sys.exit(f"[Seed] The {store.name} store already holds profiles; pass --replace or --append.")
+
+    as_of = datetime.fromisoformat(args.as_of) if args.as_of else None
+    t0 = time.perf_counter()
+    written = seed(args.customers, args.seed, args.start_id, args.chunk, args.workers, args.batch, as_of, store)
+    elapsed = time.perf_counter() - t0
+    print(f"  [Seed] {written:,} {get_encoding()} profiles in {store.name} store in {elapsed:.1f}s "
+          f"({written / max(elapsed, 1e-9):,.0f}/s)")
+
+
+if __name__ == "__main__":
+    main()
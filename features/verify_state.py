@@ -0,0 +1,264 @@
+"""
+Equilibrate — State Consistency Verifier
+Recomputes the expected profile of every customer from the raw transaction
+log and compares it with the live feature store, so drift between the
+streaming update, the risk monitor and the raw history shows up as a
+per-field report instead of a hunch.
+
+  1. Scan the store's customer ids and cut them into equal-size id ranges
+     (one shard per worker)
+  2. Read the log once, split each chunk by id range into per-shard
+     spill files
+  3. A process pool recomputes each shard with the backfill pipeline
+     (backfill_features.compute_profiles, shared risk rules) and compares
+     it against pipelined store reads
+  4. Report mismatches by field with sample customer ids; exit code 1 if
+     anything differs
+
+Expected values are computed in event time (each transaction at its own
+timestamp), the risk fields as the risk monitor stores them. Tiered-out
+customers are checked against their cold copy. Processing-time fields
+(last_updated, first_seen, last_salary_date) and the raw rolling-window
+lists are not compared; the counts derived from them are.
+
+Run:  python features/verify_state.py [--input data/transactions_raw.csv ...]
+                                      [--workers N] [--samples 5] [--tolerance 0.01]
+"""
+import argparse
+import multiprocessing
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "features"))
+
+from backfill_features import TXN_CSV, compute_profiles, read_chunks
+from profile_codec import decode_profile
+from profile_tiering import COLD_MARKER, get_cold_store, is_stub
+from redis_store import get_store
+
+READ_BATCH = 5000
+
+EXACT_FIELDS = (
+    "txn_count", "withdrawals", "salary_count", "atm_withdrawals_7d", "txn_frequency_7d",
+    "days_since_salary", "persona", "risk_score", "risk_level", "hardship_type",
+    "recommended_action",
+)
+FLOAT_FIELDS = ("total_spend", "essential_spend", "discretionary_spend", "spending_change_pct")
+VERIFY_FIELDS = EXACT_FIELDS + FLOAT_FIELDS
+
+
+# ═══════════════════════════════════════════════════════════════
+# SHARDING
+# ═══════════════════════════════════════════════════════════════
+
+def _sort_key(ids):
+    """Numeric ordering when every id is numeric, string ordering otherwise."""
+    if all(cid.isdigit() for cid in ids):
+        return np.array([int(cid) for cid in ids], dtype=np.int64)
+    return np.array(ids, dtype=object)
+
+
+def shard_boundaries(store_ids, n_shards):
+    """Cut points splitting the store's ids into n_shards equal-count ranges."""
+    if not store_ids or n_shards <= 1:
+        return np.array([], dtype=np.int64)
+    keys = np.sort(_sort_key(store_ids))
+    cuts = [keys[len(keys) * i // n_shards] for i in range(1, n_shards)]
+    return np.unique(np.array(cuts, dtype=keys.dtype))
+
+
+def shard_of(ids, boundaries):
+    """Shard index for each customer id (array-like of str)."""
+    if not len(boundaries):
+        return np.zeros(len(ids), dtype=np.int64)
+    if boundaries.dtype == object:
+        keys = np.asarray(ids, dtype=object)
+    else:
+        keys = np.array([int(c) if c.isdigit() else -1 for c in ids], dtype=np.int64)
+    return np.searchsorted(boundaries, keys, side="right")
+
+
+def spill_shards(paths, chunksize, boundaries, spill_dir):
+    """Split the log into per-shard pickle spill files. Returns the txn count."""
+    n_shards = len(boundaries) + 1
+    files = [open(os.path.join(spill_dir, f"shard-{i}.pkl"), "wb") for i in range(n_shards)]
+    n_txns = 0
+    try:
+        for chunk in read_chunks(paths, chunksize):
+            shard = shard_of(chunk["customer_id"].astype(str).to_numpy(), boundaries)
+            for i, part in chunk.groupby(shard, sort=False):
+                pickle.dump(part, files[i], protocol=pickle.HIGHEST_PROTOCOL)
+            n_txns += len(chunk)
+            print(f"  [Verify] {n_txns:,} transactions split", end="\r")
+    finally:
+        for f in files:
+            f.close()
+    print()
+    return n_txns
+
+
+def _load_spill(path):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+# ═══════════════════════════════════════════════════════════════
+# COMPARISON (runs in the worker processes)
+# ═══════════════════════════════════════════════════════════════
+
+def _differs(field, expected, actual, tolerance):
+    if actual is None:
+        return True
+    if field in FLOAT_FIELDS:
+        return abs(float(expected) - float(actual)) > tolerance
+    if isinstance(expected, (int, np.integer)):
+        return int(expected) != int(actual)
+    return str(expected) != str(actual)
+
+
+def _read_actual(store, ids):
+    """Stored profiles for ids (cold copies for tiered-out customers)."""
+    actual = {}
+    for i in range(0, len(ids), READ_BATCH):
+        batch = ids[i:i + READ_BATCH]
+        actual.update(zip(batch, store.batch_get(batch)))
+    stubs = [cid for cid, raw in actual.items() if is_stub(raw)]
+    if stubs:
+        for cid, cold in zip(stubs, get_cold_store().batch_get(stubs)):
+            merged = dict(cold)
+            merged.update((k, v) for k, v in actual[cid].items() if k != COLD_MARKER)
+            actual[cid] = merged
+    return actual
+
+
+def verify_shard(task):
+    """Recompute one shard and compare it with the store. Returns a result dict."""
+    shard, spill_path, store_ids, tolerance, samples = task
+    t0 = time.perf_counter()
+    expected, n_txns = compute_profiles(_load_spill(spill_path))
+    expected_rows = expected.to_dict("index") if len(expected) else {}
+
+    store = get_store()
+    ids = sorted(set(expected_rows) | set(store_ids))
+    actual = _read_actual(store, ids)
+
+    result = {
+        "shard": shard, "txns": n_txns, "customers": len(ids), "missing": [], "unexpected": [],
+        "mismatches": {f: [0, []] for f in VERIFY_FIELDS}, "clean": 0,
+    }
+    for cid in ids:
+        exp, raw = expected_rows.get(cid), actual.get(cid)
+        if exp is None:
+            result["unexpected"].append(cid)
+            continue
+        if not raw:
+            result["missing"].append(cid)
+            continue
+        act = decode_profile(raw)
+        clean = True
+        for field in VERIFY_FIELDS:
+            if _differs(field, exp[field], act.get(field), tolerance):
+                entry = result["mismatches"][field]
+                entry[0] += 1
+                if len(entry[1]) < samples:
+                    entry[1].append((cid, exp[field], act.get(field)))
+                clean = False
+        result["clean"] += clean
+    result["seconds"] = time.perf_counter() - t0
+    return result
+
+
+# ═══════════════════════════════════════════════════════════════
+# DRIVER
+# ═══════════════════════════════════════════════════════════════
+
+def verify(paths, workers=None, chunksize=500_000, tolerance=0.01, samples=5):
+    """Run the verifier. Returns the list of per-shard results."""
+    workers = workers or os.cpu_count() or 1
+    store = get_store()
+    store_ids = list(store.scan())
+    print(f"  [Verify] {len(store_ids):,} customers in {store.name} store, {workers} worker(s)")
+
+    boundaries = shard_boundaries(store_ids, workers)
+    shard_ids = [[] for _ in range(len(boundaries) + 1)]
+    for cid, shard in zip(store_ids, shard_of(store_ids, boundaries)):
+        shard_ids[shard].append(cid)
+
+    spill_dir = tempfile.mkdtemp(prefix="eq-verify-")
+    try:
+        spill_shards(paths, chunksize, boundaries, spill_dir)
+        tasks = [
+            (i, os.path.join(spill_dir, f"shard-{i}.pkl"), ids, tolerance, samples)
+            for i, ids in enumerate(shard_ids)
+        ]
+        if workers == 1 or store.name == "memory":
+            # An in-process store is not visible from worker processes
+            return [verify_shard(t) for t in tasks]
+        with multiprocessing.get_context("spawn").Pool(workers) as pool:
+            return pool.map(verify_shard, tasks)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+def print_report(results, samples):
+    total = sum(r["customers"] for r in results)
+    clean = sum(r["clean"] for r in results)
+    missing = [cid for r in results for cid in r["missing"]]
+    unexpected = [cid for r in results for cid in r["unexpected"]]
+
+    print(f"\n  {'shard':>5}{'txns':>12}{'customers':>11}{'seconds':>9}")
+    for r in results:
+        print(f"  {r['shard']:>5}{r['txns']:>12,}{r['customers']:>11,}{r['seconds']:>9.1f}")
+
+    print(f"\n  [Verify] {clean:,}/{total:,} customers match")
+    if missing:
+        print(f"  [Verify] {len(missing):,} in the log but missing from the store, e.g. {missing[:samples]}")
+    if unexpected:
+        print(f"  [Verify] {len(unexpected):,} in the store but not in the log, e.g. {unexpected[:samples]}")
+
+    failures = 0
+    for field in VERIFY_FIELDS:
+        count = sum(r["mismatches"][field][0] for r in results)
+        if not count:
+            continue
+        failures += count
+        print(f"\n  [MISMATCH] {field}: {count:,} customers")
+        sample = [s for r in results for s in r["mismatches"][field][1]][:samples]
+        for cid, exp, act in sample:
+            print(f"    customer {cid}: expected {exp!r}, stored {act!r}")
+    return failures + len(missing) + len(unexpected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify feature store state against the raw log")
+    parser.add_argument("--input", nargs="+", default=[TXN_CSV], help="transaction CSV files, oldest first")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    parser.add_argument("--tolerance", type=float, default=0.01, help="absolute tolerance for amounts")
+    parser.add_argument("--samples", type=int, default=5, help="customer ids shown per mismatching field")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("   EQUILIBRATE — State Consistency Verifier")
+    print("=" * 60)
+
+    t0 = time.perf_counter()
+    results = verify(args.input, args.workers, args.chunksize, args.tolerance, args.samples)
+    problems = print_report(results, args.samples)
+    print(f"\n  [Verify] Done in {time.perf_counter() - t0:.1f}s")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
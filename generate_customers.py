@@ -0,0 +1,188 @@
+"""
+Equilibrate — Synthetic Customer Generator
+Builds the static customer master (data/customers.csv) at any size: the
+5,000-customer demo book or multi-million-customer test books.
+
+Columns are drawn with NumPy, a chunk of --chunk-size customers at a time,
+so memory stays flat however large the book is. Each chunk has its own
+random stream derived from --seed and the chunk number: the same --seed,
+--as-of and --chunk-size always give the same book.
+
+Per employment type:
+
+  SALARIED       salary 25k-120k (log-normal), paid on day 1-7
+  SELF_EMPLOYED  salary 20k-100k (log-normal), paid on day 5-20
+  GIG_WORKER     income 15k-60k (log-normal), paid on day 10-28
+  UNEMPLOYED     irregular income 2k-15k (benefits, odd jobs),
+                 expected_salary_day 0 = no fixed pay day
+
+Loans are 50k-500k over 12/24/36/48 months (EMI = principal / tenure x 1.08),
+started 30-365 days before --as-of. City names come from a pool of
+--cities names built once from name parts, with Zipf-like city sizes.
+
+Output (--format, comma-separated):
+  csv       one CSV (--out), written chunk by chunk
+  parquet   <out stem>.parquet/part-00000.parquet, ... (needs pyarrow)
+
+Run:  python generate_customers.py [--customers 5000] [--seed 42] [--out data/customers.csv]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CUSTOMERS_CSV = os.path.join(BASE_DIR, "data", "customers.csv")
+
+FORMATS = ("csv", "parquet")
+COLUMNS = [
+    "customer_id", "age", "city", "employment_type", "salary", "expected_salary_day",
+    "loan_amount", "loan_tenure_months", "emi_amount", "loan_start_date", "initial_balance",
+]
+
+# employment type: (share, median salary, salary low, salary high, pay day low, pay day high)
+EMPLOYMENT = {
+    "SALARIED":      (0.25, 60000, 25000, 120000, 1, 7),
+    "SELF_EMPLOYED": (0.25, 50000, 20000, 100000, 5, 20),
+    "GIG_WORKER":    (0.25, 33000, 15000, 60000, 10, 28),
+    "UNEMPLOYED":    (0.25, 6000, 2000, 15000, 0, 0),
+}
+SALARY_SIGMA = 0.4
+LOAN_TENURES = np.array([12, 24, 36, 48])
+EMI_FACTOR = 1.08   # simple interest approximation
+
+# ── City name parts (the same shapes as Faker's en_US city names) ──
+CITY_PREFIXES = ["North", "East", "West", "South", "New", "Lake", "Port", "Fort", "Mount", "Glen"]
+CITY_NAMES = [
+    "Aaron", "Adam", "Alan", "Amber", "Andrew", "Angela", "Anthony", "Ashley", "Barbara", "Brian",
+    "Carl", "Carol", "Charles", "Christopher", "Daniel", "David", "Deborah", "Donna", "Edward", "Emily",
+    "Eric", "Frank", "Gary", "George", "Gregory", "Helen", "Jacob", "James", "Jason", "Jeffrey",
+    "Jennifer", "Jessica", "John", "Joseph", "Joshua", "Karen", "Kelly", "Kenneth", "Kevin", "Kimberly",
+    "Laura", "Linda", "Lisa", "Margaret", "Mark", "Mary", "Matthew", "Megan", "Melissa", "Michael",
+    "Michelle", "Nancy", "Nicole", "Patrick", "Paul", "Rachel", "Richard", "Robert", "Ronald", "Ryan",
+    "Sandra", "Sarah", "Scott", "Sharon", "Stephanie", "Steven", "Susan", "Thomas", "Timothy", "William",
+    "Allen", "Baker", "Bell", "Brooks", "Campbell", "Carter", "Clark", "Collins", "Cook", "Evans",
+    "Fisher", "Foster", "Gomez", "Gray", "Green", "Hall", "Harris", "Hill", "Hughes", "Jackson",
+    "Kelly", "King", "Lewis", "Long", "Martin", "Miller", "Mitchell", "Moore", "Morgan", "Morris",
+    "Murphy", "Nelson", "Parker", "Perry", "Peterson", "Phillips", "Powell", "Price", "Reed", "Rogers",
+    "Ross", "Russell", "Sanders", "Stewart", "Sullivan", "Taylor", "Turner", "Walker", "Ward", "Watson",
+    "White", "Wood", "Wright", "Young",
+]
+CITY_SUFFIXES = ["town", "ton", "land", "ville", "berg", "burgh", "borough", "bury", "view", "port",
+                 "mouth", "stad", "furt", "chester", "fort", "haven", "side", "shire"]
+
+
+def city_pool(size, seed):
+    """size distinct city names built from the name parts (deterministic for a seed)."""
+    rng = np.random.default_rng([seed, 0xC17])
+    names = set()
+    while len(names) < size:
+        n = size - len(names)
+        shape = rng.integers(0, 4, n)
+        prefix = np.array(CITY_PREFIXES)[rng.integers(0, len(CITY_PREFIXES), n)]
+        name = np.array(CITY_NAMES)[rng.integers(0, len(CITY_NAMES), n)]
+        suffix = np.array(CITY_SUFFIXES)[rng.integers(0, len(CITY_SUFFIXES), n)]
+        for s, p, m, x in zip(shape, prefix, name, suffix):
+            names.add((f"{p} {m}{x}", f"{p} {m}", f"{m}{x}", f"{m} {x.capitalize()}")[s])
+        if n == size - len(names):  # name parts exhausted
+            break
+    pool = np.array(sorted(names), dtype=object)
+    rng.shuffle(pool)
+    weights = 1.0 / np.arange(1, len(pool) + 1) ** 1.07   # a few big cities, a long tail
+    return pool, weights / weights.sum()
+
+
+def generate_chunk(start_id, n, seed, chunk, as_of, cities, city_weights):
+    """DataFrame of n customers with ids from start_id."""
+    rng = np.random.default_rng([seed, chunk])
+    kinds = list(EMPLOYMENT)
+    shares = np.array([EMPLOYMENT[k][0] for k in kinds])
+    kind = rng.choice(len(kinds), n, p=shares / shares.sum())
+
+    salary = np.empty(n, dtype=np.int64)
+    pay_day = np.zeros(n, dtype=np.int64)
+    for i, name in enumerate(kinds):
+        _share, median, low, high, day_low, day_high = EMPLOYMENT[name]
+        mask = kind == i
+        count = int(mask.sum())
+        salary[mask] = np.clip(rng.lognormal(np.log(median), SALARY_SIGMA, count), low, high).astype(np.int64)
+        if day_high:
+            pay_day[mask] = rng.integers(day_low, day_high + 1, count)
+
+    loan_amount = rng.integers(50000, 500001, n)
+    tenure = LOAN_TENURES[rng.integers(0, len(LOAN_TENURES), n)]
+    loan_start = np.datetime64(as_of, "D") - rng.integers(30, 366, n).astype("timedelta64[D]")
+
+    return pd.DataFrame({
+        "customer_id": np.arange(start_id, start_id + n),
+        "age": rng.integers(21, 61, n),
+        "city": cities[rng.choice(len(cities), n, p=city_weights)],
+        "employment_type": np.array(kinds, dtype=object)[kind],
+        "salary": salary,
+        "expected_salary_day": pay_day,
+        "loan_amount": loan_amount,
+        "loan_tenure_months": tenure,
+        "emi_amount": (loan_amount / tenure * EMI_FACTOR).astype(np.int64),
+        "loan_start_date": np.datetime_as_string(loan_start, unit="D"),
+        "initial_balance": rng.integers(5000, 90001, n),
+    }, columns=COLUMNS)
+
+
+def generate(customers, seed=42, chunk_size=1_000_000, as_of=None, start_id=1, cities=5000):
+    """Yield the book as DataFrames of up to chunk_size customers."""
+    as_of = as_of or date.today().isoformat()
+    pool, weights = city_pool(cities, seed)
+    for chunk, offset in enumerate(range(0, customers, chunk_size)):
+        yield generate_chunk(start_id + offset, min(chunk_size, customers - offset),
+                             seed, chunk, as_of, pool, weights)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic customer master")
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=CUSTOMERS_CSV, help="CSV path (parquet parts go next to it)")
+    parser.add_argument("--format", default="csv", help=f"comma-separated: {', '.join(FORMATS)}")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--as-of", default=None, help="YYYY-MM-DD loans are dated back from (default today)")
+    parser.add_argument("--start-id", type=int, default=1)
+    parser.add_argument("--cities", type=int, default=5000, help="size of the city name pool")
+    args = parser.parse_args()
+
+    formats = [f.strip() for f in args.format.split(",") if f.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        sys.exit(f"[Generator] Unknown format(s) {sorted(unknown)} (expected {', '.join(FORMATS)})")
+    if "parquet" in formats:
+        try:
+            import pyarrow  # noqa: F401 — optional, only for columnar output
+        except ImportError:
+            sys.exit("[Generator] parquet output needs pyarrow (pip install pyarrow)")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    parts_dir = os.path.splitext(args.out)[0] + ".parquet"
+    if "parquet" in formats:
+        os.makedirs(parts_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    written = 0
+    for chunk, df in enumerate(generate(args.customers, args.seed, args.chunk_size,
+                                        args.as_of, args.start_id, args.cities)):
+        if "csv" in formats:
+            df.to_csv(args.out, mode="w" if chunk == 0 else "a", header=chunk == 0, index=False)
+        if "parquet" in formats:
+            df.to_parquet(os.path.join(parts_dir, f"part-{chunk:05d}.parquet"), index=False)
+        written += len(df)
+        print(f"  [Generator] {written:,} / {args.customers:,} customers "
+              f"({written / (time.perf_counter() - start):,.0f}/s)")
+
+    outputs = ([args.out] if "csv" in formats else []) + ([parts_dir + "/"] if "parquet" in formats else [])
+    print(f"[Generator] {written:,} customers -> {', '.join(outputs)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Transaction Replay v1.0 — Deterministic Replay of Recorded Traffic
+Streams recorded transactions (transactions_raw.csv or archive partitions,
+.gz ok) back through the system, for reproducing incidents and for
+benchmarking with real traffic instead of the random producer.
+
+Sinks:
+  transport publish to the transactions topic on the configured transport
+            (kafka/transport.py: Kafka, Redis Streams or in-process; broker
+            and wire format from config/settings.py), keyed by customer_id
+            so every customer's transactions land on one Kafka partition in
+            order (--partitions N pins partition = crc32(customer_id) % N).
+            "kafka" is accepted as an alias
+  pipeline  call update_customer_features() directly, fanned out over
+            --workers processes by crc32(customer_id) % workers (more than
+            one worker needs a shared store: redis or sqlite, not memory)
+
+Pacing: --speed 0 replays as fast as possible; --speed N keeps the
+recorded inter-arrival gaps divided by N (1 = real time).
+
+The pipeline sink is deterministic: each worker runs on a simulated clock
+that follows the recorded timestamps, so the resulting state does not
+depend on replay speed or worker count (and matches
+features/backfill_features.py for the same input).
+
+Reported: achieved TPS and end-to-end lag percentiles over a bounded
+sample of LAG_SAMPLE values per sink or worker (max and count are exact),
+from a transaction's scheduled send time to it being applied by the
+pipeline, or handed to the transport.
+
+Run:  python kafka/replay_transactions.py --sink pipeline [--workers 4] [--speed 0]
+      python kafka/replay_transactions.py --sink transport [--speed 10] [--partitions 8]
+"""
+import argparse
+import csv
+import gzip
+import multiprocessing
+import os
+import random
+import sys
+import time
+import zlib
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TXN_CSV = os.path.join(BASE_DIR, "data", "transactions_raw.csv")
+
+# transactions_raw.csv layout (older rows have no persona column)
+TXN_FIELDS = [
+    "transaction_id", "customer_id", "timestamp", "amount", "transaction_type",
+    "channel", "merchant_category", "is_salary", "persona",
+]
+
+DISPATCH_BATCH = 500
+LAG_SAMPLE = 100_000  # lag values kept per sink / worker for the percentiles
+
+
+# ──────────────────────────────────────────────
+# INPUT
+# ──────────────────────────────────────────────
+def read_transactions(paths, limit=0):
+    """Yield recorded transactions as dicts, in file order."""
+    n = 0
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader, None)  # header
+            for row in reader:
+                if not row:
+                    continue
+                txn = dict(zip(TXN_FIELDS, row))
+                if not txn.get("persona"):
+                    txn["persona"] = "UNKNOWN"
+                yield txn
+                n += 1
+                if limit and n >= limit:
+                    return
+
+
+def to_message(txn):
+    """Recorded CSV row -> the producer's JSON message shape."""
+    amount = float(txn["amount"])
+    cid = txn["customer_id"]
+    return dict(
+        txn,
+        customer_id=int(cid) if cid.isdigit() else cid,
+        amount=int(amount) if amount.is_integer() else amount,
+        is_salary=int(txn["is_salary"] or 0),
+    )
+
+
+def route(customer_id, n):
+    """Stable fan-out slot for a customer (keeps per-customer order)."""
+    return zlib.crc32(str(customer_id).encode("utf-8")) % n
+
+
+class Pacer:
+    """Maps recorded timestamps to real send times at a given speed-up."""
+
+    def __init__(self, speed):
+        self.speed = speed
+        self.first_ts = None
+        self.start = time.time()
+
+    def schedule(self, txn):
+        """Real time this transaction is due; sleeps until then when paced."""
+        if self.speed <= 0:
+            return time.time()
+        ts = datetime.fromisoformat(txn["timestamp"]).timestamp()
+        if self.first_ts is None:
+            self.first_ts = ts
+        due = self.start + (ts - self.first_ts) / self.speed
+        wait = due - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        return due
+
+
+class LagSample:
+    """Bounded uniform sample of lag seconds (reservoir), with the exact count and max."""
+
+    def __init__(self, size=LAG_SAMPLE, seed=0):
+        self.size = size
+        self.values = []
+        self.count = 0
+        self.max = 0.0
+        self._rng = random.Random(seed)
+
+    def __len__(self):
+        return self.count
+
+    def append(self, lag):
+        self.count += 1
+        self.max = max(self.max, lag)
+        if len(self.values) < self.size:
+            self.values.append(lag)
+        else:
+            i = self._rng.randrange(self.count)
+            if i < self.size:
+                self.values[i] = lag
+
+    def merge(self, other):
+        """Fold in another sample (e.g. a worker's), keeping each side's weight."""
+        if not other.count:
+            return
+        total = self.count + other.count
+        keep = round(self.size * self.count / total)
+        mine = self._rng.sample(self.values, min(keep, len(self.values)))
+        theirs = self._rng.sample(other.values, min(self.size - len(mine), len(other.values)))
+        self.values = mine + theirs
+        self.count, self.max = total, max(self.max, other.max)
+
+
+def lag_summary(lags):
+    """p50 / p99 / max in milliseconds from a LagSample."""
+    if not lags.count:
+        return "n/a"
+    values = sorted(lags.values)
+    pct = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000
+    return f"p50 {pct(0.50):.1f} ms | p99 {pct(0.99):.1f} ms | max {lags.max * 1000:.1f} ms"
+
+
+# ──────────────────────────────────────────────
+# PIPELINE SINK
+# ──────────────────────────────────────────────
+def _pipeline_setup():
+    for d in ("config", "storage", "risk", "features"):
+        sys.path.insert(0, os.path.join(BASE_DIR, d))
+    from clock import SimulatedClock, set_clock
+    from customer_features import update_customer_features
+    return SimulatedClock, set_clock, update_customer_features
+
+
+class PipelineApplier:
+    """Applies transactions in one process on a clock that follows them."""
+
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+        SimulatedClock, set_clock, self.update = _pipeline_setup()
+        self.duplicates = 0
+        self._new_clock = lambda start: set_clock(SimulatedClock(start=start, speed=0))
+        self.clock = None
+        self.lags = LagSample()
+        self.count = 0
+
+    def apply(self, txn, scheduled):
+        ts = datetime.fromisoformat(txn["timestamp"])
+        if self.clock is None:
+            self.clock = self._new_clock(ts)
+        self.clock.advance_to(ts)
+        if self.update(txn, snapshot=self.snapshots) is None:
+            self.duplicates += 1
+        self.lags.append(time.time() - scheduled)
+        self.count += 1
+
+
+def _pipeline_worker(queue, results, snapshots):
+    applier = PipelineApplier(snapshots)
+    while True:
+        batch = queue.get()
+        if batch is None:
+            break
+        for txn, scheduled in batch:
+            applier.apply(txn, scheduled)
+    results.put((applier.count, applier.duplicates, applier.lags))
+
+
+def replay_pipeline(txns, pacer, workers, snapshots):
+    """Replay straight into the feature pipeline. Returns (count, duplicates, lags)."""
+    if workers <= 1:
+        applier = PipelineApplier(snapshots)
+        for txn in txns:
+            applier.apply(txn, pacer.schedule(txn))
+        return applier.count, applier.duplicates, applier.lags
+
+    sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+    from settings import get_setting
+    if get_setting("store", "backend", "redis") == "memory":
+        # Each spawned worker would build its own in-process store and lose it on exit
+        raise ValueError("--workers > 1 needs a shared feature store (redis or sqlite), not the memory backend")
+
+    ctx = multiprocessing.get_context("spawn")
+    queues = [ctx.Queue(maxsize=64) for _ in range(workers)]
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_pipeline_worker, args=(q, results, snapshots)) for q in queues]
+    for p in procs:
+        p.start()
+
+    buffers = [[] for _ in range(workers)]
+    for txn in txns:
+        scheduled = pacer.schedule(txn)
+        slot = route(txn["customer_id"], workers)
+        buffers[slot].append((txn, scheduled))
+        # Paced replay flushes every transaction so lag reflects the pipeline, not batching
+        if pacer.speed > 0 or len(buffers[slot]) >= DISPATCH_BATCH:
+            queues[slot].put(buffers[slot])
+            buffers[slot] = []
+    for q, buf in zip(queues, buffers):
+        if buf:
+            q.put(buf)
+        q.put(None)
+
+    count, duplicates, lags = 0, 0, LagSample()
+    for _ in procs:
+        n, dups, sample = results.get()
+        count += n
+        duplicates += dups
+        lags.merge(sample)
+    for p in procs:
+        p.join()
+    return count, duplicates, lags
+
+
+# ──────────────────────────────────────────────
+# TRANSPORT SINK
+# ──────────────────────────────────────────────
+def replay_transport(txns, pacer, topic, partitions):
+    """Publish on the configured transport keyed by customer. Returns (count, send lags)."""
+    from transport import describe_transport, get_transport
+
+    transport = get_transport()
+    print(f"  [Replay] Publishing to {topic} on {describe_transport(transport)}")
+    lags = LagSample()
+    count = 0
+    try:
+        for txn in txns:
+            scheduled = pacer.schedule(txn)
+            msg = to_message(txn)
+            partition = route(msg["customer_id"], partitions) if partitions else None
+            transport.send(topic, msg, key=msg["customer_id"], partition=partition)
+            lags.append(time.time() - scheduled)
+            count += 1
+    finally:
+        transport.flush()
+        transport.close()
+    return count, lags
+
+
+# ──────────────────────────────────────────────
+# MAIN
+# ──────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded transactions")
+    parser.add_argument("--input", nargs="+", default=[TXN_CSV], help="CSV files (.gz ok), oldest first")
+    parser.add_argument("--sink", choices=("transport", "kafka", "pipeline"), default="pipeline")
+    parser.add_argument("--speed", type=float, default=0.0, help="0 = as fast as possible, N = N x recorded pace")
+    parser.add_argument("--limit", type=int, default=0, help="stop after N transactions")
+    parser.add_argument("--workers", type=int, default=1, help="pipeline sink: worker processes")
+    parser.add_argument("--snapshots", action="store_true", help="pipeline sink: also write history snapshots")
+    parser.add_argument("--topic", default="transactions")
+    parser.add_argument("--partitions", type=int, default=0, help="transport sink: pin Kafka partition crc32(customer) %% N")
+    args = parser.parse_args()
+
+    pace = "max speed" if args.speed <= 0 else f"{args.speed:g}x recorded pace"
+    print("=" * 60)
+    print("  EQUILIBRATE — Transaction Replay v1.0")
+    print(f"  Sink: {args.sink} | Pace: {pace}")
+    print("=" * 60)
+
+    txns = read_transactions(args.input, args.limit)
+    pacer = Pacer(args.speed)
+    t0 = time.perf_counter()
+    duplicates = None
+    if args.sink in ("transport", "kafka"):
+        count, lags = replay_transport(txns, pacer, args.topic, args.partitions)
+    else:
+        try:
+            count, duplicates, lags = replay_pipeline(txns, pacer, args.workers, args.snapshots)
+        except ValueError as e:
+            sys.exit(f"[ERROR] {e}")
+    elapsed = time.perf_counter() - t0
+
+    tps = count / elapsed if elapsed > 0 else 0.0
+    print(f"[DONE] Replayed {count:,} transactions in {elapsed:.1f}s | {tps:,.0f} TPS")
+    if duplicates is not None:
+        print(f"[DEDUP] {duplicates:,} already-applied transactions skipped")
+    print(f"[LAG]  {lag_summary(lags)}")
+
+
+if __name__ == "__main__":
+    main()
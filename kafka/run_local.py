@@ -0,0 +1,77 @@
+"""
+Equilibrate — Local Pipeline Runner
+Runs the transaction producer and the stream processor (archive, feature
+and snapshot sinks) as threads of one process on the in-process
+transport, so the whole streaming path works on a laptop without a Kafka
+broker.
+
+  --store memory   also keep profiles in process (no Redis either)
+  --no-csv         skip the archive sink (no data/transactions_raw.csv writes)
+
+The producer's pace follows the configured clock (EQ_CLOCK_MODE /
+EQ_CLOCK_SPEED), e.g. EQ_CLOCK_MODE=simulated EQ_CLOCK_SPEED=0 runs the
+stream as fast as the feature engine keeps up.
+
+Run:  python kafka/run_local.py [--store memory] [--no-csv] [--duration 60]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for d in ("config", "storage", "risk", "features", "kafka"):
+    sys.path.insert(0, os.path.join(BASE_DIR, d))
+
+from transport import MemoryTransport, set_transport
+from stream_processor import StreamProcessor, build_sinks, TOPIC
+
+
+def _start(name, target):
+    thread = threading.Thread(target=target, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the producer and stream processor in one process")
+    parser.add_argument("--store", choices=("configured", "memory"), default="configured",
+                        help="feature store: store.backend setting, or in-process")
+    parser.add_argument("--no-csv", action="store_true", help="do not archive to the raw CSV")
+    parser.add_argument("--duration", type=float, default=0, help="stop after N seconds (0 = until Ctrl+C)")
+    args = parser.parse_args()
+
+    transport = set_transport(MemoryTransport())
+    if args.store == "memory":
+        from redis_store import MemoryFeatureStore, set_store
+        set_store(MemoryFeatureStore())
+
+    import transaction_producer
+
+    # Subscribe first: the in-process transport only delivers to live subscriptions
+    sinks = build_sinks(["features", "snapshots"] + ([] if args.no_csv else ["archive"]))
+    processor = StreamProcessor(transport.subscribe(TOPIC, group="stream-processor"), sinks)
+    stop = threading.Event()
+
+    def run_processor():
+        while not stop.is_set():
+            processor.step(timeout_ms=200)
+        processor.close()
+
+    processor_thread = _start("stream-processor", run_processor)
+    _start("producer", transaction_producer.main)
+
+    deadline = time.time() + args.duration if args.duration else None
+    try:
+        while deadline is None or time.time() < deadline:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+    processor_thread.join(timeout=10)
+    print(f"\n  [Local] Stopped. {processor.status()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+Stream Processor v1.0 — One Consumer, Many Sinks
+Reads the transactions topic once and fans each decoded batch out to
+pluggable sinks, replacing the separate raw consumer and feature engine
+(which each read and decoded the whole topic).
+
+Sinks:
+  archive    append to data/transactions_raw.csv (one write + fsync per batch)
+  features   update_customer_features_batch() per batch (no inline snapshot)
+  snapshots  behavioural snapshot rows for the customers in the batch; only
+             flushes once the features sink has applied everything before it
+
+Each sink batches on its own (batch size / max delay) and fails on its own:
+an error leaves that sink's pending messages in place and retries it with
+backoff while the other sinks keep going. A message that keeps failing in
+one sink (MAX_ATTEMPTS) is written to data/dead_letters.jsonl and skipped.
+
+Offsets: the processor joins a durable consumer group and commits only at
+checkpoints (processor.commit_interval), after every sink has flushed all
+polled messages. A crash between checkpoints redelivers the uncommitted
+tail (at-least-once). Polling pauses while any sink has more than
+processor.max_pending messages waiting.
+
+Per-sink message counts (sink_<name>_written) and the feature/snapshot
+stage latencies are exported by config/metrics.py (Prometheus text on
+:9402, Redis metrics:stream_processor). Profiles on demand
+(config/profiling.py).
+
+Run:  python kafka/stream_processor.py [--sinks archive,features,snapshots]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for d in ("config", "storage", "risk", "features", "kafka"):
+    sys.path.insert(0, os.path.join(BASE_DIR, d))
+
+from metrics import get_metrics, start_metrics
+from profiling import start_profiling
+from settings import get_setting
+from transport import TransportError, get_transport, describe_transport
+from transactions_consumer import CSV_FIELDS, CSV_PATH, TOPIC
+
+DEAD_LETTER_PATH = os.path.join(BASE_DIR, "data", "dead_letters.jsonl")
+MAX_ATTEMPTS = 5
+MAX_BACKOFF = 30.0
+STATUS_INTERVAL = 10.0
+
+
+# ═══════════════════════════════════════════════════════════════
+# SINKS
+# ═══════════════════════════════════════════════════════════════
+
+class Sink:
+    """Buffers messages and writes them in batches.
+
+    Subclasses implement write(batch) -> number of leading messages handled.
+    Returning fewer than len(batch) records partial progress; raising means
+    nothing from the batch was handled.
+    """
+
+    name = "sink"
+    batch_size = 500
+    max_delay = 1.0
+    after = ()  # sinks that must be fully flushed before this one flushes
+
+    def __init__(self, batch_size=None, max_delay=None):
+        if batch_size is not None:
+            self.batch_size = batch_size
+        if max_delay is not None:
+            self.max_delay = max_delay
+        self.pending = []
+        self.oldest = None
+        self.written = 0
+        self.errors = 0
+        self.dead_letters = 0
+        self.attempts = 0
+        self.retry_at = 0.0
+        self.last_error = ""
+
+    def add(self, messages):
+        if messages and not self.pending:
+            self.oldest = time.monotonic()
+        self.pending.extend(messages)
+
+    def due(self, now):
+        if not self.pending or now < self.retry_at:
+            return False
+        return len(self.pending) >= self.batch_size or now - self.oldest >= self.max_delay
+
+    def flush(self):
+        """Write all pending messages. Raises on the first failing batch."""
+        while self.pending:
+            batch = self.pending[:self.batch_size]
+            done = self.write(batch)
+            del self.pending[:done]
+            self.written += done
+            get_metrics().inc(f"sink_{self.name}_written", done)  # messages; rows are counted by the writers
+            self.attempts = 0
+        self.oldest = None
+
+    def write(self, batch):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ArchiveSink(Sink):
+    """Raw transaction log (same file and columns as transactions_consumer.py)."""
+
+    name = "archive"
+    batch_size = 500
+    max_delay = 1.0
+
+    def __init__(self, path=CSV_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not (os.path.isfile(path) and os.path.getsize(path) > 0):
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                csv.DictWriter(f, fieldnames=CSV_FIELDS).writeheader()
+
+    def write(self, batch):
+        buf = io.StringIO(newline="")
+        # extrasaction: trace fields on sampled messages are not archived
+        csv.DictWriter(buf, fieldnames=CSV_FIELDS, extrasaction="ignore").writerows(batch)
+        data = buf.getvalue().encode("utf-8")
+        with open(self.path, "ab", buffering=0) as f:
+            start = f.seek(0, os.SEEK_END)
+            try:
+                view = memoryview(data)
+                while view:  # raw writes may be partial
+                    view = view[f.write(view):]
+                os.fsync(f.fileno())
+            except Exception:
+                # The batch is retried whole: drop any part of it that reached the file
+                os.ftruncate(f.fileno(), start)
+                raise
+        return len(batch)
+
+
+class FeatureSink(Sink):
+    """Feature store update, one batch compare-and-set per batch.
+
+    If the batch call fails, the batch is redone one transaction at a time
+    so that partial progress is kept (already-applied ones are skipped as
+    duplicates).
+    """
+
+    name = "features"
+    batch_size = 100
+    max_delay = 0.0
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        from customer_features import dedup_stats, update_customer_features, update_customer_features_batch
+        self.update = update_customer_features
+        self.update_batch = update_customer_features_batch
+        self.dedup_stats = dedup_stats
+        self.duplicates = 0
+
+    def write(self, batch):
+        before = self.dedup_stats()["duplicates"]
+        try:
+            self.update_batch(batch, snapshot=False)
+            self.duplicates += self.dedup_stats()["duplicates"] - before
+            return len(batch)
+        except Exception:
+            pass
+        for i, txn in enumerate(batch):
+            try:
+                if self.update(txn, snapshot=False) is None:
+                    self.duplicates += 1  # already applied (redelivery)
+            except Exception:
+                if i:
+                    return i  # keep what was applied; the failing txn is retried alone
+                raise
+        return len(batch)
+
+
+class SnapshotSink(Sink):
+    """Behavioural snapshots from the freshly updated profiles."""
+
+    name = "snapshots"
+    batch_size = 500
+    max_delay = 2.0
+    after = ("features",)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        from customer_snapshot_writer import write_customer_snapshot
+        from profile_codec import decode_profile
+        from redis_store import get_store
+        from tracing import get_tracer
+        self.write_snapshot = write_customer_snapshot
+        self.decode = decode_profile
+        self.get_store = get_store
+        self.tracer = get_tracer()
+
+    def write(self, batch):
+        ids = list(dict.fromkeys(str(txn["customer_id"]) for txn in batch))
+        written = set()
+        for cid, raw in zip(ids, self.get_store().batch_get(ids)):
+            if raw and self.write_snapshot(cid, profile=self.decode(raw)):
+                written.add(cid)
+        self.tracer.record_many((t for t in batch if str(t["customer_id"]) in written), "snapshot")
+        return len(batch)
+
+
+SINKS = {
+    "archive": ArchiveSink,
+    "features": FeatureSink,
+    "snapshots": SnapshotSink,
+}
+
+
+# ═══════════════════════════════════════════════════════════════
+# PROCESSOR
+# ═══════════════════════════════════════════════════════════════
+
+def _dead_letter(sink, message, error):
+    record = {"sink": sink.name, "error": error, "at": datetime.now().isoformat(), "message": message}
+    with open(DEAD_LETTER_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+    sink.dead_letters += 1
+    print(f"  [Processor] {sink.name}: dead-lettered a message after {MAX_ATTEMPTS} attempts ({error})")
+
+
+class StreamProcessor:
+    """Polls one subscription and drives a list of sinks."""
+
+    def __init__(self, subscription, sinks, commit_interval=None, max_pending=None):
+        self.sub = subscription
+        self.sinks = sinks
+        self.by_name = {s.name: s for s in sinks}
+        self.commit_interval = commit_interval or get_setting("processor", "commit_interval", 5.0)
+        self.max_pending = max_pending or get_setting("processor", "max_pending", 50_000)
+        self.received = 0
+        self.uncommitted = 0
+        self.commits = 0
+        self._next_checkpoint = time.monotonic() + self.commit_interval
+
+    def _blocked(self, sink):
+        return any(self.by_name[name].pending for name in sink.after if name in self.by_name)
+
+    def _flush(self, sink, now):
+        """Flush one sink, isolating its failures. Returns True if it is empty."""
+        if not sink.pending:
+            return True
+        if now < sink.retry_at or self._blocked(sink):
+            return False
+        try:
+            sink.flush()
+            return True
+        except Exception as e:
+            sink.errors += 1
+            sink.attempts += 1
+            sink.last_error = f"{e.__class__.__name__}: {e}"
+            if sink.attempts >= MAX_ATTEMPTS:
+                _dead_letter(sink, sink.pending.pop(0), sink.last_error)
+                sink.attempts = 0
+                sink.retry_at = 0.0
+            else:
+                sink.retry_at = now + min(MAX_BACKOFF, 0.5 * 2 ** sink.attempts)
+                print(f"  [Processor] {sink.name}: {sink.last_error} (retry in {sink.retry_at - now:.1f}s)")
+            return False
+
+    def checkpoint(self):
+        """Flush every sink; commit offsets only if all of them are empty."""
+        now = time.monotonic()
+        clean = True
+        for sink in self.sinks:  # declared order, so "after" dependencies flush first
+            clean = self._flush(sink, now) and clean
+        if clean and self.uncommitted:
+            self.sub.commit()
+            self.commits += 1
+            self.uncommitted = 0
+        return clean
+
+    def step(self, timeout_ms=1000):
+        """One poll + flush round. Returns the number of messages received."""
+        messages = []
+        if max((len(s.pending) for s in self.sinks), default=0) < self.max_pending:
+            messages = self.sub.poll(timeout_ms=timeout_ms, max_records=500)
+        else:
+            time.sleep(timeout_ms / 1000)  # backpressure: let the slow sink catch up
+        if messages:
+            self.received += len(messages)
+            self.uncommitted += len(messages)
+            for sink in self.sinks:
+                sink.add(messages)
+
+        now = time.monotonic()
+        for sink in self.sinks:
+            if sink.due(now):
+                self._flush(sink, now)
+        if now >= self._next_checkpoint:
+            self.checkpoint()
+            self._next_checkpoint = now + self.commit_interval
+        return len(messages)
+
+    def status(self):
+        parts = [f"{s.name} {s.written:,} ok/{len(s.pending):,} pending"
+                 + (f"/{s.duplicates:,} dup" if getattr(s, "duplicates", 0) else "")
+                 + (f"/{s.errors} err" if s.errors else "")
+                 + (f"/{s.dead_letters} dead" if s.dead_letters else "")
+                 for s in self.sinks]
+        return f"received {self.received:,} | " + " | ".join(parts) + f" | commits {self.commits}"
+
+    def close(self):
+        self.checkpoint()
+        for sink in self.sinks:
+            sink.close()
+        self.sub.close()
+
+
+def build_sinks(names):
+    unknown = [n for n in names if n not in SINKS]
+    if unknown:
+        raise ValueError(f"Unknown sink(s) {unknown} (expected {sorted(SINKS)})")
+    if not names:
+        raise ValueError(f"No sinks selected (expected some of {sorted(SINKS)})")
+    # Keep the canonical order so dependencies flush before their dependants
+    return [SINKS[n]() for n in SINKS if n in names]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consume transactions once and fan out to sinks")
+    parser.add_argument("--sinks", default="archive,features,snapshots",
+                        help=f"comma-separated subset of {','.join(SINKS)}")
+    parser.add_argument("--group", default="stream-processor", help="durable consumer group")
+    args = parser.parse_args()
+
+    sinks = build_sinks([n.strip() for n in args.sinks.split(",") if n.strip()])
+
+    print("=" * 60)
+    print("  EQUILIBRATE — Stream Processor v1.0")
+    print(f"  Transport: {describe_transport()} | Topic: {TOPIC} | Group: {args.group}")
+    print(f"  Sinks:     {', '.join(s.name for s in sinks)}")
+    print("=" * 60)
+
+    try:
+        sub = get_transport().subscribe(TOPIC, group=args.group, durable=True)
+    except TransportError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    sub.wait_ready(30)
+
+    processor = StreamProcessor(sub, sinks)
+    start_metrics("stream_processor")
+    profiler = start_profiling("stream_processor")
+    next_status = time.monotonic() + STATUS_INTERVAL
+    try:
+        while True:
+            profiler.tick(processor.step())
+            if time.monotonic() >= next_status:
+                print(f"  [{datetime.now().strftime('%H:%M:%S')}] [Processor] {processor.status()}")
+                next_status = time.monotonic() + STATUS_INTERVAL
+    except KeyboardInterrupt:
+        print("\n  [Processor] Stopping, flushing sinks...")
+    finally:
+        profiler.stop()
+        processor.close()
+        print(f"  [Processor] {processor.status()}")
+
+
+if __name__ == "__main__":
+    main()
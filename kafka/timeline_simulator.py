@@ -0,0 +1,345 @@
+"""
+Equilibrate — Customer Timeline Simulator
+Generates every customer's transactions day by day on a simulated calendar
+and emits them in event-time order, instead of the producer's independent
+random draws. Time-based signals (days since salary, 7-day ATM windows,
+spend drops) then behave as they would on a real book.
+
+Per customer (data/customers.csv, see generate_customers.py):
+
+  salary      a CREDIT on expected_salary_day each month (the last day of
+              short months), 06:00-10:00; UNEMPLOYED customers
+              (expected_salary_day 0) get irregular small credits instead
+  EMI         an AUTODEBIT of emi_amount on the loan_start_date day of each
+              month for loan_tenure_months, from the month after the start
+  spending    Poisson(--daily-txns x persona weight) debits a day,
+              07:00-23:00, with the producer's per-persona category, channel
+              and amount mix (ATM-heavy for INCOME_SHOCK / SILENT_DRAIN)
+  persona     starts as the producer's assign_persona() and moves on the
+              1st of each month along PERSONA_TRANSITIONS (job loss,
+              recovery, drift); INCOME_SHOCK and SILENT_DRAIN customers
+              get no income while in that state
+
+Each day is drawn for all customers at once with NumPy and sorted by time.
+The same --seed, --start and customer book always give the same stream,
+transaction ids included.
+
+Sinks:
+  transport  send to the transactions topic (transport.backend), like the producer
+  pipeline   apply in-process with update_customer_features() on a clock that
+             follows the event times (deterministic)
+  csv        write transactions_raw.csv rows to --out (replay / backfill input)
+
+Pacing: --speed 0 emits as fast as possible; --speed N runs N simulated
+seconds per real second (86400 = a day per second). With the transport
+sink, run the engines on a simulated clock with the same start and speed
+(EQ_CLOCK_MODE=simulated, EQ_CLOCK_START, EQ_CLOCK_SPEED, a shared
+EQ_CLOCK_ANCHOR) so their "now" follows the simulated calendar.
+
+Run:  python kafka/timeline_simulator.py --days 90 [--sink pipeline] [--speed 0] [--seed 42]
+"""
+import argparse
+import calendar
+import csv
+import os
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+sys.path.insert(0, os.path.join(BASE_DIR, "kafka"))
+
+from replay_transactions import LagSample, Pacer, PipelineApplier, TXN_CSV, lag_summary
+from transaction_producer import (
+    DISCRETIONARY_CATEGORIES, ESSENTIAL_CATEGORIES, assign_persona, customer_path, persona_tx_weight,
+)
+from transactions_consumer import CSV_FIELDS
+
+PERSONAS = ("STABLE", "OVERSPENDER", "INCOME_SHOCK", "SILENT_DRAIN")
+EARNING = np.array([True, True, False, False])   # personas that still receive income
+
+# Monthly persona transition probabilities (rows: from, columns: to, PERSONAS order)
+PERSONA_TRANSITIONS = np.array([
+    # STABLE OVERSPENDER INCOME_SHOCK SILENT_DRAIN
+    [0.955, 0.025, 0.015, 0.005],   # STABLE: drift into overspending, job loss
+    [0.100, 0.870, 0.020, 0.010],   # OVERSPENDER: back to normal, job loss
+    [0.150, 0.000, 0.750, 0.100],   # INCOME_SHOCK: re-employed, or income dries up for good
+    [0.050, 0.000, 0.050, 0.900],   # SILENT_DRAIN: slow recovery
+])
+
+# Per persona: share of spending events that are ATM withdrawals, share of the
+# rest that is essential, amount ranges and debit channels (transaction_producer.py)
+ATM_SHARE = np.array([0.00, 0.00, 0.40, 0.25])
+ESSENTIAL_SHARE = np.array([0.60, 0.20, 0.90, 1.00])
+ESSENTIAL_AMOUNT = np.array([[100, 2500], [100, 1500], [50, 1200], [50, 600]])
+DISCRETIONARY_AMOUNT = np.array([[200, 3000], [800, 12000], [50, 400], [50, 600]])
+ATM_AMOUNT = np.array([[0, 0], [0, 0], [1000, 8000], [200, 3000]])
+CARD_CHANNELS = (["UPI", "POS", "NETBANKING"], ["UPI", "POS", "NETBANKING"], ["UPI", "POS"], ["UPI", "POS"])
+
+IRREGULAR_INCOME_RATE = 2 / 30   # credits a day for customers without a pay day
+
+
+# ═══════════════════════════════════════════════════════════════
+# CUSTOMER STATE
+# ═══════════════════════════════════════════════════════════════
+
+def _month_index(d):
+    return d.year * 12 + d.month - 1
+
+
+class Book:
+    """Customer attributes and current personas as arrays."""
+
+    def __init__(self, customers):
+        self.ids = customers["customer_id"].astype(np.int64).to_numpy()
+        self.salary = customers["salary"].astype(float).to_numpy()
+        self.pay_day = customers["expected_salary_day"].fillna(0).astype(np.int64).to_numpy()
+        self.emi = customers["emi_amount"].astype(float).to_numpy()
+        loan_start = pd.to_datetime(customers["loan_start_date"])
+        self.emi_day = loan_start.dt.day.to_numpy()
+        first = (loan_start.dt.year * 12 + loan_start.dt.month - 1).to_numpy()
+        self.emi_months = (first + 1, first + customers["loan_tenure_months"].astype(np.int64).to_numpy())
+        index = {p: i for i, p in enumerate(PERSONAS)}
+        self.persona = np.fromiter((index[assign_persona(cid)] for cid in self.ids), np.int64, len(self.ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def load_book(path, limit=0):
+    customers = pd.read_csv(path, nrows=limit or None)
+    return Book(customers)
+
+
+# ═══════════════════════════════════════════════════════════════
+# ONE DAY
+# ═══════════════════════════════════════════════════════════════
+
+def transition_personas(book, rng):
+    """Move every customer one step along PERSONA_TRANSITIONS. Returns customers moved."""
+    cumulative = PERSONA_TRANSITIONS.cumsum(axis=1)[book.persona]
+    new = (rng.random(len(book))[:, None] > cumulative).sum(axis=1)
+    new = np.minimum(new, len(PERSONAS) - 1)
+    moved = int((new != book.persona).sum())
+    book.persona = new
+    return moved
+
+
+def simulate_day(book, day, rng, daily_txns):
+    """All of one day's events as column arrays, sorted by time."""
+    month_days = calendar.monthrange(day.year, day.month)[1]
+    month = _month_index(day)
+    earning = EARNING[book.persona]
+    n = len(book)
+
+    # ── Scheduled: salary, irregular income, EMI ──
+    paid = earning & (book.pay_day > 0) & (np.minimum(book.pay_day, month_days) == day.day)
+    irregular = earning & (book.pay_day == 0) & (rng.random(n) < IRREGULAR_INCOME_RATE)
+    emi = ((book.emi > 0) & (book.emi_months[0] <= month) & (month <= book.emi_months[1])
+           & (np.minimum(book.emi_day, month_days) == day.day))
+
+    salary_idx, income_idx, emi_idx = np.flatnonzero(paid), np.flatnonzero(irregular), np.flatnonzero(emi)
+
+    # ── Spending ──
+    weights = np.array([persona_tx_weight[p] for p in PERSONAS])[book.persona]
+    spend_idx = np.repeat(np.arange(n), rng.poisson(daily_txns * weights))
+    persona = book.persona[spend_idx]
+    m = len(spend_idx)
+    draw = rng.random(m)
+    atm = draw < ATM_SHARE[persona]
+    essential = ~atm & (rng.random(m) < ESSENTIAL_SHARE[persona])
+    bounds = np.where(atm[:, None], ATM_AMOUNT[persona],
+                      np.where(essential[:, None], ESSENTIAL_AMOUNT[persona], DISCRETIONARY_AMOUNT[persona]))
+    amount = rng.integers(bounds[:, 0], bounds[:, 1] + 1)
+    essential_pick = np.array(ESSENTIAL_CATEGORIES, dtype=object)[rng.integers(0, len(ESSENTIAL_CATEGORIES), m)]
+    discretionary_pick = np.array(DISCRETIONARY_CATEGORIES, dtype=object)[
+        rng.integers(0, len(DISCRETIONARY_CATEGORIES), m)]
+    category = np.where(atm, "ATM_WITHDRAWAL", np.where(essential, essential_pick, discretionary_pick))
+    channel = np.empty(m, dtype=object)
+    pick = rng.random(m)
+    for p, options in enumerate(CARD_CHANNELS):
+        mask = persona == p
+        channel[mask] = np.array(options, dtype=object)[(pick[mask] * len(options)).astype(np.int64)]
+    channel[(persona == PERSONAS.index("INCOME_SHOCK")) & ~atm & ~essential] = "UPI"
+    channel[atm] = "ATM"
+
+    # ── All events, in time order ──
+    k_salary, k_income, k_emi = len(salary_idx), len(income_idx), len(emi_idx)
+    seconds = np.concatenate([
+        rng.uniform(6 * 3600, 10 * 3600, k_salary),
+        rng.uniform(8 * 3600, 20 * 3600, k_income),
+        rng.uniform(2 * 3600, 6 * 3600, k_emi),
+        rng.uniform(7 * 3600, 23 * 3600, m),
+    ])
+    who = np.concatenate([salary_idx, income_idx, emi_idx, spend_idx])
+    columns = {
+        "customer": who,
+        "seconds": seconds,
+        "amount": np.concatenate([
+            book.salary[salary_idx].astype(np.int64),
+            (book.salary[income_idx] * rng.uniform(0.2, 0.6, k_income)).astype(np.int64),
+            book.emi[emi_idx].astype(np.int64),
+            amount,
+        ]),
+        "transaction_type": np.array(["CREDIT"] * (k_salary + k_income) + ["DEBIT"] * (k_emi + m), dtype=object),
+        "channel": np.concatenate([np.full(k_salary + k_income, "BANK_TRANSFER", dtype=object),
+                                   np.full(k_emi, "AUTODEBIT", dtype=object), channel]),
+        "merchant_category": np.concatenate([np.full(k_salary, "SALARY", dtype=object),
+                                             np.full(k_income, "TRANSFER", dtype=object),
+                                             np.full(k_emi, "EMI", dtype=object), category]),
+        "is_salary": np.concatenate([np.ones(k_salary, np.int64), np.zeros(k_income + k_emi + m, np.int64)]),
+    }
+    order = np.argsort(seconds, kind="stable")
+    return {k: v[order] for k, v in columns.items()}
+
+
+def day_transactions(book, day, events, rng):
+    """Transaction dicts (the producer's message shape) for one simulated day."""
+    start = np.datetime64(datetime.combine(day, datetime.min.time()), "us")
+    stamps = np.datetime_as_string(start + (events["seconds"] * 1e6).astype("timedelta64[us]"), unit="us")
+    n = len(stamps)
+    raw_ids = rng.bytes(16 * n)
+    ids = book.ids[events["customer"]].tolist()
+    personas = np.array(PERSONAS, dtype=object)[book.persona[events["customer"]]].tolist()
+    for i, (cid, ts, amount, txn_type, channel, category, is_salary, persona) in enumerate(zip(
+            ids, stamps.tolist(), events["amount"].tolist(), events["transaction_type"].tolist(),
+            events["channel"].tolist(), events["merchant_category"].tolist(),
+            events["is_salary"].tolist(), personas)):
+        yield {
+            "transaction_id": str(uuid.UUID(bytes=raw_ids[16 * i:16 * i + 16], version=4)),
+            "customer_id": cid,
+            "timestamp": ts.replace("T", " "),
+            "amount": amount,
+            "transaction_type": txn_type,
+            "channel": channel,
+            "merchant_category": category,
+            "is_salary": is_salary,
+            "persona": persona,
+        }
+
+
+def simulate(book, start, days, seed=42, daily_txns=1.0, transitions=True):
+    """Yield (day, persona changes, event columns, transaction iterator) per simulated day.
+
+    Consume each day's transactions before asking for the next day: they
+    read the personas as of their own day.
+    """
+    rng = np.random.default_rng(seed)
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        moved = transition_personas(book, rng) if transitions and day.day == 1 and offset else 0
+        events = simulate_day(book, day, rng, daily_txns)
+        yield day, moved, events, day_transactions(book, day, events, rng)
+
+
+# ═══════════════════════════════════════════════════════════════
+# SINKS
+# ═══════════════════════════════════════════════════════════════
+
+class TransportSink:
+    def __init__(self):
+        from tracing import get_tracer, stamp
+        from transport import get_transport
+        self.transport = get_transport()
+        self.tracer, self.stamp = get_tracer(), stamp
+        self.lags = LagSample()
+
+    def emit(self, txn, scheduled):
+        txn = self.stamp(txn)
+        self.transport.send("transactions", txn, key=txn["customer_id"])
+        if "trace_id" in txn:
+            self.tracer.record(txn["trace_id"], "emit", at=txn["emitted_at"], customer_id=str(txn["customer_id"]))
+        self.lags.append(time.time() - scheduled)
+
+    def close(self):
+        self.transport.flush()
+
+
+class PipelineSink:
+    def __init__(self, snapshots=False):
+        self.applier = PipelineApplier(snapshots)
+        self.lags = self.applier.lags
+
+    def emit(self, txn, scheduled):
+        self.applier.apply(txn, scheduled)
+
+    def close(self):
+        pass
+
+
+class CsvSink:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.f = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        self.writer.writeheader()
+        self.lags = LagSample()
+
+    def emit(self, txn, scheduled):
+        self.writer.writerow(txn)
+
+    def close(self):
+        self.f.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-customer timeline transaction simulator")
+    parser.add_argument("--customers", default=customer_path, help="customer master CSV")
+    parser.add_argument("--limit", type=int, default=0, help="first N customers only")
+    parser.add_argument("--start", default=None, help="first simulated day, YYYY-MM-DD (default today)")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--daily-txns", type=float, default=1.0, help="spending debits per STABLE customer per day")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-transitions", action="store_true", help="keep every customer's starting persona")
+    parser.add_argument("--sink", choices=("transport", "pipeline", "csv"), default="transport")
+    parser.add_argument("--out", default=TXN_CSV, help="csv sink: output path")
+    parser.add_argument("--snapshots", action="store_true", help="pipeline sink: also write history snapshots")
+    parser.add_argument("--speed", type=float, default=0.0, help="simulated seconds per real second (0 = max)")
+    args = parser.parse_args()
+
+    book = load_book(args.customers, args.limit)
+    start = date.fromisoformat(args.start) if args.start else date.today()
+    pace = "max speed" if args.speed <= 0 else f"{args.speed:g} simulated s per second"
+    print("=" * 60)
+    print("  EQUILIBRATE — Timeline Simulator")
+    print(f"  {len(book):,} customers | {args.days} days from {start} | Sink: {args.sink} | Pace: {pace}")
+    print("=" * 60)
+
+    if args.sink == "transport":
+        from transport import describe_transport
+        print(f"  Transport: {describe_transport()}")
+        sink = TransportSink()
+    elif args.sink == "pipeline":
+        sink = PipelineSink(args.snapshots)
+    else:
+        sink = CsvSink(args.out)
+
+    pacer = Pacer(args.speed)
+    count = 0
+    t0 = time.perf_counter()
+    try:
+        for day, moved, events, txns in simulate(book, start, args.days, args.seed, args.daily_txns,
+                                                 not args.no_transitions):
+            for txn in txns:
+                sink.emit(txn, pacer.schedule(txn))
+            count += len(events["customer"])
+            salaries = int(events["is_salary"].sum())
+            emis = int((events["merchant_category"] == "EMI").sum())
+            mix = " | ".join(f"{p} {int((book.persona == i).sum()):,}" for i, p in enumerate(PERSONAS))
+            print(f"  [Simulator] {day}: {len(events['customer']):,} txns (salary {salaries:,}, EMI {emis:,})"
+                  + (f", {moved:,} persona changes" if moved else "") + f" | {mix}")
+    finally:
+        sink.close()
+    elapsed = time.perf_counter() - t0
+    print(f"[DONE] {count:,} transactions in {elapsed:.1f}s | {count / max(elapsed, 1e-9):,.0f} TPS")
+    if sink.lags:
+        print(f"[LAG]  {lag_summary(sink.lags)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,30 +8,31 @@ Personas:
   OVERSPENDER   (~15%)  High discretionary, credit usage
   INCOME_SHOCK  (~10%)  Salary suddenly stops, ATM spikes, spending drops
   SILENT_DRAIN  (~5%)   No salary, low activity, slow drain
+
+A sample of transactions (trace.sample_rate) carries trace_id/emitted_at
+for end-to-end latency tracing (config/tracing.py).
+
+Run:  python kafka/transaction_producer.py
+Importing this module only defines the generators; the customer book is
+loaded and the transport (kafka/transport.py, transport.backend) opened
+from main().
 """
-from kafka import KafkaProducer
 import pandas as pd
-import json
 import random
-import time
 import hashlib
 import os
-from datetime import datetime
-from faker import Faker
-
-fake = Faker()
+import sys
+import uuid
 
-# ── Kafka ──
-producer = KafkaProducer(
-    bootstrap_servers="127.0.0.1:9092",
-    value_serializer=lambda v: json.dumps(v).encode("utf-8"),
-    acks="all",
-)
-
-# ── Load customers ──
+# ── Customers ──
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+sys.path.insert(0, os.path.join(BASE_DIR, "kafka"))
+from clock import get_clock
+from tracing import get_tracer, stamp
+from transport import get_transport, describe_transport
+
 customer_path = os.path.join(BASE_DIR, "data", "customers.csv")
-customers = pd.read_csv(customer_path)
 
 # ── Persona Assignment (deterministic per customer_id) ──
 PERSONA_WEIGHTS = {
@@ -55,24 +56,16 @@ def assign_persona(customer_id):
         return "SILENT_DRAIN"
 
 
-# Build persona map once at startup
+# Persona map, filled by load_customers()
 persona_map = {}
-persona_counts = {"STABLE": 0, "OVERSPENDER": 0, "INCOME_SHOCK": 0, "SILENT_DRAIN": 0}
-for _, row in customers.iterrows():
-    cid = int(row["customer_id"])
-    p = assign_persona(cid)
-    persona_map[cid] = p
-    persona_counts[p] += 1
-
-print("=" * 60)
-print("  EQUILIBRATE — Transaction Producer v4.0 (Persona-Driven)")
-print("=" * 60)
-print(f"  Customers loaded: {len(customers)}")
-for p, c in persona_counts.items():
-    pct = 100 * c / len(customers)
-    print(f"    {p:>15}: {c:>5} ({pct:.1f}%)")
-print("=" * 60)
-print()
+
+
+def load_customers(path=customer_path):
+    """Load the customer book and assign each customer its persona."""
+    customers = pd.read_csv(path)
+    for cid in customers["customer_id"].astype(int):
+        persona_map[cid] = assign_persona(cid)
+    return customers
 
 
 # ── Transaction Categories ──
@@ -85,7 +78,7 @@ CHANNELS = ["UPI", "POS", "ATM", "AUTODEBIT", "NETBANKING"]
 def generate_transaction(customer):
     """Generate a persona-driven transaction."""
     cid = int(customer["customer_id"])
-    persona = persona_map.get(cid, "STABLE")
+    persona = persona_map.get(cid) or assign_persona(cid)
     salary = float(customer["salary"])
     emi = float(customer["emi_amount"])
 
@@ -174,9 +167,9 @@ def generate_transaction(customer):
             channel = random.choice(["UPI", "POS"])
 
     transaction = {
-        "transaction_id": fake.uuid4(),
+        "transaction_id": str(uuid.uuid4()),
         "customer_id": cid,
-        "timestamp": str(datetime.now()),
+        "timestamp": str(get_clock().now()),
         "amount": int(amount),
         "transaction_type": txn_type,
         "channel": channel,
@@ -188,7 +181,7 @@ def generate_transaction(customer):
     return transaction
 
 
-# ── Weighted customer selection: risky personas produce more transactions ──
+# ── Per-persona transaction rate weights ──
 persona_tx_weight = {
     "STABLE": 1.0,
     "OVERSPENDER": 1.8,
@@ -196,27 +189,54 @@ persona_tx_weight = {
     "SILENT_DRAIN": 0.4,
 }
 
-weights = [persona_tx_weight.get(persona_map.get(int(row["customer_id"]), "STABLE"), 1.0)
-           for _, row in customers.iterrows()]
-total_weight = sum(weights)
-normalized_weights = [w / total_weight for w in weights]
-
-
-# ── Infinite stream ──
-txn_num = 0
-while True:
-    # Weighted random customer selection
-    idx = random.choices(range(len(customers)), weights=normalized_weights, k=1)[0]
-    customer = customers.iloc[idx]
-    txn = generate_transaction(customer)
-
-    producer.send("transactions", txn)
-    txn_num += 1
-
-    if txn_num % 50 == 0:
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Sent {txn_num} transactions | "
-              f"Last: customer={txn['customer_id']} persona={txn['persona']} "
-              f"type={txn['transaction_type']} amount={txn['amount']} "
-              f"category={txn['merchant_category']}")
-
-    time.sleep(random.uniform(0.3, 1.5))
+def main():
+    customers = load_customers()
+
+    persona_counts = {"STABLE": 0, "OVERSPENDER": 0, "INCOME_SHOCK": 0, "SILENT_DRAIN": 0}
+    for p in persona_map.values():
+        persona_counts[p] += 1
+
+    print("=" * 60)
+    print("  EQUILIBRATE — Transaction Producer v4.0 (Persona-Driven)")
+    print("=" * 60)
+    print(f"  Customers loaded: {len(customers)}")
+    for p, c in persona_counts.items():
+        pct = 100 * c / len(customers)
+        print(f"    {p:>15}: {c:>5} ({pct:.1f}%)")
+    print(f"  Transport: {describe_transport()}")
+    print("=" * 60)
+    print()
+
+    # ── Transport ──
+    producer = get_transport()
+
+    # ── Weighted customer selection: risky personas produce more transactions ──
+    weights = [persona_tx_weight.get(persona_map[cid], 1.0)
+               for cid in customers["customer_id"].astype(int)]
+    total_weight = sum(weights)
+    normalized_weights = [w / total_weight for w in weights]
+
+    # ── Infinite stream ──
+    txn_num = 0
+    while True:
+        # Weighted random customer selection
+        idx = random.choices(range(len(customers)), weights=normalized_weights, k=1)[0]
+        customer = customers.iloc[idx]
+        txn = stamp(generate_transaction(customer))  # trace.sample_rate of them get a trace_id
+
+        producer.send("transactions", txn, key=txn["customer_id"])
+        if "trace_id" in txn:
+            get_tracer().record(txn["trace_id"], "emit", at=txn["emitted_at"], customer_id=str(txn["customer_id"]))
+        txn_num += 1
+
+        if txn_num % 50 == 0:
+            print(f"[{get_clock().now().strftime('%H:%M:%S')}] Sent {txn_num} transactions | "
+                  f"Last: customer={txn['customer_id']} persona={txn['persona']} "
+                  f"type={txn['transaction_type']} amount={txn['amount']} "
+                  f"category={txn['merchant_category']}")
+
+        get_clock().sleep(random.uniform(0.3, 1.5))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,22 @@
 # transactions_consumer.py
-# Kafka Consumer — reliably receives JSON transactions and writes to CSV in real time.
-# Generates a unique consumer group on every run to avoid stale offset issues.
+# Raw Consumer — reliably receives JSON transactions and writes to CSV in real time.
+# Reads from the configured transport (kafka/transport.py: Kafka, Redis Streams or
+# in-process); on Kafka a unique consumer group is generated on every run to avoid
+# stale offset issues.
+#
+# Decode and CSV append latency are exported by config/metrics.py.
+#
+# Run:  python kafka/transactions_consumer.py   (importing this module has no side effects)
 
-from kafka import KafkaConsumer
-from kafka.errors import NoBrokersAvailable, KafkaError
-import json
 import csv
 import os
-import uuid
 import time
 import sys
 
 # ──────────────────────────────────────────────
 # CONFIG
 # ──────────────────────────────────────────────
-KAFKA_BROKER = "127.0.0.1:9092"
 TOPIC = "transactions"
-GROUP_ID = f"txn-consumer-{uuid.uuid4()}"  # unique group every run
 
 CSV_FIELDS = [
     "transaction_id",
@@ -35,100 +35,80 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 CSV_PATH = os.path.join(DATA_DIR, "transactions_raw.csv")
 
-# ──────────────────────────────────────────────
-# KAFKA CONSUMER SETUP
-# ──────────────────────────────────────────────
-print(f"[INIT] Consumer Group ID : {GROUP_ID}")
-print(f"[INIT] Broker            : {KAFKA_BROKER}")
-print(f"[INIT] Topic             : {TOPIC}")
-print(f"[INIT] CSV output        : {CSV_PATH}")
-print()
-
-try:
-    consumer = KafkaConsumer(
-        TOPIC,
-        bootstrap_servers=KAFKA_BROKER,
-        group_id=GROUP_ID,
-        auto_offset_reset="latest",        # only new messages from this run
-        enable_auto_commit=True,
-        auto_commit_interval_ms=1000,
-        value_deserializer=lambda m: json.loads(m.decode("utf-8")),
-        # Timeout per poll() call — lets us print heartbeat & avoids infinite block
-        consumer_timeout_ms=5000,
-        # Faster session/heartbeat so partition assignment happens quickly
-        session_timeout_ms=10000,
-        heartbeat_interval_ms=3000,
-        request_timeout_ms=15000,
-        # Fetch tuning
-        max_poll_records=100,
-        fetch_max_wait_ms=500,
-    )
-except NoBrokersAvailable:
-    print("[ERROR] Could not connect to Kafka broker at", KAFKA_BROKER)
-    print("        Make sure Kafka & Zookeeper are running.")
-    sys.exit(1)
-except KafkaError as e:
-    print(f"[ERROR] Kafka error during consumer init: {e}")
-    sys.exit(1)
-
-print("[OK] Connected to Kafka broker.\n")
-
-# ──────────────────────────────────────────────
-# FORCE PARTITION ASSIGNMENT VIA POLL
-# ──────────────────────────────────────────────
-# On kafka-python, partitions are assigned lazily during poll().
-# We explicitly call poll() in a loop until partitions are assigned.
-print("[WAIT] Requesting partition assignment...")
-
-MAX_ASSIGNMENT_WAIT = 30  # seconds
-start = time.time()
-while time.time() - start < MAX_ASSIGNMENT_WAIT:
-    consumer.poll(timeout_ms=1000)   # triggers group join & rebalance
-    assigned = consumer.assignment()
-    if assigned:
-        print(f"[OK] Partitions assigned: {assigned}")
-        break
-    print("  ... waiting for partition assignment", flush=True)
-else:
-    print("[WARN] Timed out waiting for partition assignment.")
-    print("       Will continue anyway — assignment may happen on next poll.\n")
-
-print()
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+sys.path.insert(0, os.path.join(BASE_DIR, "kafka"))
+from metrics import start_metrics
+from transport import TransportError, get_transport, describe_transport
 
 # ──────────────────────────────────────────────
-# CSV SETUP  (create header if file is new)
-# ──────────────────────────────────────────────
-os.makedirs(DATA_DIR, exist_ok=True)
-file_exists = os.path.isfile(CSV_PATH) and os.path.getsize(CSV_PATH) > 0
-
-if not file_exists:
-    with open(CSV_PATH, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
-        writer.writeheader()
-    print("[CSV] Created new CSV with header row.")
-else:
-    print("[CSV] Appending to existing CSV file.")
-
+# MAIN
 # ──────────────────────────────────────────────
-# MAIN CONSUMER LOOP
-# ──────────────────────────────────────────────
-print("\n🎧 Listening to Kafka transactions... (Ctrl+C to stop)\n")
-
-message_count = 0
-
-try:
-    while True:
-        # poll() returns a dict of {TopicPartition: [messages]}
-        records = consumer.poll(timeout_ms=2000)
-
-        if not records:
-            # No messages in this poll window — just loop again
-            continue
-
-        for tp, messages in records.items():
-            for message in messages:
-                txn = message.value
+def main():
+    # ──────────────────────────────────────────────
+    # TRANSPORT SETUP
+    # ──────────────────────────────────────────────
+    print(f"[INIT] Transport         : {describe_transport()}")
+    print(f"[INIT] Topic             : {TOPIC}")
+    print(f"[INIT] CSV output        : {CSV_PATH}")
+    print()
+
+    try:
+        consumer = get_transport().subscribe(TOPIC, group="txn-consumer")
+    except TransportError as e:
+        print(f"[ERROR] {e}")
+        print("        Make sure the broker is running (or set EQ_TRANSPORT_BACKEND).")
+        sys.exit(1)
+
+    if getattr(consumer, "group_id", None):
+        print(f"[INIT] Consumer Group ID : {consumer.group_id}")
+    print("[OK] Subscribed.\n")
+
+    # ──────────────────────────────────────────────
+    # WAIT UNTIL THE SUBSCRIPTION IS LIVE
+    # ──────────────────────────────────────────────
+    # On Kafka, partitions are assigned lazily during poll(); wait_ready() polls
+    # until they are, so the first produced messages are not missed (anything
+    # those polls fetch is returned by the first poll() below).
+    print("[WAIT] Requesting partition assignment...")
+
+    MAX_ASSIGNMENT_WAIT = 30  # seconds
+    if consumer.wait_ready(MAX_ASSIGNMENT_WAIT):
+        print("[OK] Subscription ready.")
+    else:
+        print("[WARN] Timed out waiting for partition assignment.")
+        print("       Will continue anyway — assignment may happen on next poll.\n")
+
+    print()
+
+    # ──────────────────────────────────────────────
+    # CSV SETUP  (create header if file is new)
+    # ──────────────────────────────────────────────
+    os.makedirs(DATA_DIR, exist_ok=True)
+    file_exists = os.path.isfile(CSV_PATH) and os.path.getsize(CSV_PATH) > 0
+
+    if not file_exists:
+        with open(CSV_PATH, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+        print("[CSV] Created new CSV with header row.")
+    else:
+        print("[CSV] Appending to existing CSV file.")
+
+    # ──────────────────────────────────────────────
+    # MAIN CONSUMER LOOP
+    # ──────────────────────────────────────────────
+    print("\n🎧 Listening to transactions... (Ctrl+C to stop)\n")
+
+    message_count = 0
+    metrics = start_metrics("transactions_consumer")
+
+    try:
+        while True:
+            # poll() returns the decoded messages (empty list when the window is quiet)
+            for txn in consumer.poll(timeout_ms=2000):
                 message_count += 1
+                metrics.inc("messages")
+                t0 = time.perf_counter()
 
                 # ── Print to console ──
                 print(f"[#{message_count}] {txn}")
@@ -136,7 +116,7 @@ try:
                 # ── Append to CSV (open-write-close to avoid Windows file locking) ──
                 try:
                     with open(CSV_PATH, "a", newline="", encoding="utf-8") as csvfile:
-                        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDS)
+                        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDS, extrasaction="ignore")
                         writer.writerow(txn)
                         csvfile.flush()
                         os.fsync(csvfile.fileno())  # force OS-level flush
@@ -145,18 +125,23 @@ try:
                     time.sleep(0.5)
                     try:
                         with open(CSV_PATH, "a", newline="", encoding="utf-8") as csvfile:
-                            writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDS)
+                            writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDS, extrasaction="ignore")
                             writer.writerow(txn)
                             csvfile.flush()
                             os.fsync(csvfile.fileno())
                     except Exception as retry_err:
                         print(f"[ERROR] Failed to write after retry: {retry_err}")
+                metrics.observe("archive", time.perf_counter() - t0)
+
+    except KeyboardInterrupt:
+        print(f"\n\n[STOP] Consumer stopped by user.  Total messages received: {message_count}")
+    except Exception as e:
+        print(f"\n[ERROR] Unexpected error: {e}")
+        raise
+    finally:
+        consumer.close()
+        print("[DONE] Consumer closed cleanly.")
+
 
-except KeyboardInterrupt:
-    print(f"\n\n[STOP] Consumer stopped by user.  Total messages received: {message_count}")
-except Exception as e:
-    print(f"\n[ERROR] Unexpected error: {e}")
-    raise
-finally:
-    consumer.close()
-    print("[DONE] Consumer closed cleanly.")
+if __name__ == "__main__":
+    main()
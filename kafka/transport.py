@@ -0,0 +1,431 @@
+"""
+Equilibrate — Message Transport
+One producer/consumer interface for the transaction stream, so the
+producer, raw consumer and feature engine are not hard-wired to a Kafka
+broker.
+
+Backends (transport.backend):
+  kafka    KafkaProducer / KafkaConsumer (default). Each subscriber gets a
+           fresh consumer group reading from "latest", as before.
+  redis    Redis Streams: XADD (approximate MAXLEN trim) / XREAD BLOCK
+           from "$". Every subscriber sees every message.
+  memory   In-process broadcast queues: producer and consumers run as
+           threads of one process (kafka/run_local.py). No broker hop.
+
+Interface:
+  t = get_transport()
+  t.send(topic, value, key=None, partition=None)
+                                     value is a JSON-serialisable dict;
+                                     partition pins a Kafka partition
+                                     (ignored by the other backends)
+  t.flush(); t.close()
+  sub = t.subscribe(topic, group="feature-engine")
+  sub.wait_ready(timeout)            -> True once the subscription is live
+  sub.poll(timeout_ms, max_records)  -> list of message dicts
+  sub.commit()                       acknowledge everything polled so far
+  sub.backlog()                      -> messages waiting for this subscriber
+                                        (consumer lag), or None if unknown;
+                                        Kafka refreshes the partition end
+                                        offsets at most every
+                                        transport.end_offsets_interval s
+  sub.close()
+
+A plain subscription is ephemeral (fresh Kafka group / stream tail, offsets
+auto-committed). subscribe(..., durable=True) joins the named group as-is
+and only advances it on commit(): a restarted consumer resumes after the
+last commit, so anything polled but not committed is delivered again
+(Kafka committed offsets, Redis Streams consumer group + XACK).
+
+Broker messages are encoded by wire_format.py (transport.wire_format:
+json or struct); subscribers decode either format from its header byte
+(timed as the "decode" stage, config/metrics.py).
+The in-process transport passes dicts and never serializes.
+
+Configuration (env var overrides config/equilibrate.json):
+  EQ_TRANSPORT_BACKEND       kafka | redis | memory
+  EQ_TRANSPORT_WIRE_FORMAT   json | struct (producers; default json)
+  EQ_TRANSPORT_KAFKA_BROKER  (default 127.0.0.1:9092)
+  EQ_TRANSPORT_STREAM_MAXLEN approximate Redis stream length cap (default 1000000)
+  EQ_TRANSPORT_END_OFFSETS_INTERVAL  seconds between Kafka end-offset lookups
+                             for backlog() (default 2.0)
+"""
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+sys.path.insert(0, os.path.join(BASE_DIR, "storage"))
+
+from metrics import get_metrics
+from settings import get_setting
+from tracing import get_tracer
+from wire_format import decode_message, encode_message, get_wire_format
+
+
+class TransportError(Exception):
+    """The transport backend could not be reached or configured."""
+
+
+def _decode(data):
+    """decode_message(), timed into the "decode" stage histogram (and traced)."""
+    t0 = time.perf_counter()
+    value = decode_message(data)
+    get_metrics().observe("decode", time.perf_counter() - t0)
+    if "trace_id" in value:
+        get_tracer().record(value["trace_id"], "decode", customer_id=str(value.get("customer_id", "")))
+    return value
+
+
+# ═══════════════════════════════════════════════════════════════
+# KAFKA
+# ═══════════════════════════════════════════════════════════════
+
+class KafkaTransport:
+    name = "kafka"
+
+    def __init__(self, broker=None):
+        self.broker = broker or get_setting("transport", "kafka_broker", "127.0.0.1:9092")
+        self.wire_format = get_wire_format()
+        self._producer = None
+
+    def _get_producer(self):
+        if self._producer is None:
+            from kafka import KafkaProducer
+            from kafka.errors import KafkaError
+            try:
+                self._producer = KafkaProducer(
+                    bootstrap_servers=self.broker,
+                    key_serializer=lambda k: str(k).encode("utf-8"),
+                    value_serializer=lambda v: encode_message(v, self.wire_format),
+                    acks="all",
+                )
+            except KafkaError as e:
+                raise TransportError(f"Kafka broker {self.broker}: {e}") from e
+        return self._producer
+
+    def send(self, topic, value, key=None, partition=None):
+        self._get_producer().send(topic, value=value, key=key, partition=partition)
+
+    def flush(self):
+        if self._producer is not None:
+            self._producer.flush()
+
+    def close(self):
+        if self._producer is not None:
+            self._producer.close()
+            self._producer = None
+
+    def subscribe(self, topic, group="equilibrate", durable=False):
+        if durable:
+            return KafkaSubscription(self.broker, topic, group, auto_commit=False)
+        return KafkaSubscription(self.broker, topic, f"{group}-{uuid.uuid4().hex[:8]}")
+
+
+class KafkaSubscription:
+    def __init__(self, broker, topic, group_id, auto_commit=True):
+        from kafka import KafkaConsumer
+        from kafka.errors import KafkaError
+        self.group_id = group_id
+        self.auto_commit = auto_commit
+        try:
+            self._consumer = KafkaConsumer(
+                topic,
+                bootstrap_servers=broker,
+                group_id=group_id,
+                auto_offset_reset="latest",        # only new messages from this run
+                enable_auto_commit=auto_commit,
+                auto_commit_interval_ms=1000,
+                value_deserializer=_decode,
+                consumer_timeout_ms=5000,
+                # Faster session/heartbeat so partition assignment happens quickly
+                session_timeout_ms=10000,
+                heartbeat_interval_ms=3000,
+                request_timeout_ms=15000,
+                max_poll_records=100,
+                fetch_max_wait_ms=500,
+            )
+        except KafkaError as e:
+            raise TransportError(f"Kafka broker {broker}: {e}") from e
+        self._buffer = []  # fetched by wait_ready(), handed out by the next poll()
+        self._end_offsets = {}
+        self._end_offsets_at = 0.0
+        self._end_offsets_interval = float(get_setting("transport", "end_offsets_interval", 2.0))
+
+    def wait_ready(self, timeout=30):
+        # Partitions are assigned lazily during poll(). Whatever those polls
+        # fetch is kept for poll(): the consumer position has already moved
+        # past it, so dropping it would let the next commit() skip it.
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            self._buffer.extend(self._values(self._consumer.poll(timeout_ms=1000)))
+            if self._consumer.assignment():
+                return True
+        return False
+
+    @staticmethod
+    def _values(records):
+        return [msg.value for messages in records.values() for msg in messages]
+
+    def poll(self, timeout_ms=2000, max_records=None):
+        if self._buffer:
+            n = max_records or len(self._buffer)
+            out, self._buffer = self._buffer[:n], self._buffer[n:]
+            return out
+        return self._values(self._consumer.poll(timeout_ms=timeout_ms, max_records=max_records))
+
+    def commit(self):
+        if not self.auto_commit:
+            self._consumer.commit()
+
+    def backlog(self):
+        partitions = self._consumer.assignment()
+        if not partitions:
+            return None
+        # end_offsets() is a broker round-trip; the lag controller asks on
+        # every poll, so reuse the last answer for a while. position() is local.
+        now = time.monotonic()
+        if now - self._end_offsets_at >= self._end_offsets_interval or not partitions <= self._end_offsets.keys():
+            self._end_offsets = self._consumer.end_offsets(list(partitions))
+            self._end_offsets_at = now
+        end = self._end_offsets
+        return len(self._buffer) + sum(max(0, end[tp] - self._consumer.position(tp)) for tp in partitions)
+
+    def close(self):
+        self._consumer.close()
+
+
+# ═══════════════════════════════════════════════════════════════
+# REDIS STREAMS
+# ═══════════════════════════════════════════════════════════════
+
+class RedisStreamTransport:
+    name = "redis"
+
+    def __init__(self, client=None):
+        if client is None:
+            from redis_client import get_redis
+            client = get_redis(decode_responses=False)  # binary wire formats
+        self.r = client
+        self.wire_format = get_wire_format()
+        self.maxlen = get_setting("transport", "stream_maxlen", 1_000_000)
+
+    def send(self, topic, value, key=None, partition=None):
+        self.r.xadd(topic, {b"v": encode_message(value, self.wire_format)},
+                    maxlen=self.maxlen, approximate=True)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def subscribe(self, topic, group="equilibrate", durable=False):
+        if durable:
+            return RedisStreamGroupSubscription(self.r, topic, group)
+        return RedisStreamSubscription(self.r, topic)
+
+
+def _stream_entries(reply):
+    """(entry_id, fields) pairs from an XREAD/XREADGROUP reply (RESP2 or RESP3)."""
+    if isinstance(reply, dict):  # RESP3 replies are keyed by stream
+        reply = reply.items()
+    for _stream, entries in reply or ():
+        yield from entries
+
+
+class RedisStreamSubscription:
+    def __init__(self, client, topic):
+        self.r = client
+        self.topic = topic
+        self.last_id = "$"
+
+    def wait_ready(self, timeout=30):
+        # Pin "$" to a concrete id so nothing sent after subscribing is missed
+        info = self.r.xinfo_stream(self.topic) if self.r.exists(self.topic) else None
+        self.last_id = info[b"last-generated-id"] if info else b"0-0"
+        return True
+
+    def poll(self, timeout_ms=2000, max_records=None):
+        if self.last_id == "$":
+            self.wait_ready()
+        # Blocking read must stay under the client's socket_timeout (redis.socket_timeout)
+        block = min(int(timeout_ms), 4000)
+        reply = self.r.xread({self.topic: self.last_id}, count=max_records or 500, block=block)
+        out = []
+        for entry_id, fields in _stream_entries(reply):
+            self.last_id = entry_id
+            out.append(_decode(fields[b"v"]))
+        return out
+
+    def commit(self):
+        pass
+
+    def backlog(self):
+        return None  # XREAD keeps no server-side position to compare against
+
+    def close(self):
+        pass
+
+
+class RedisStreamGroupSubscription:
+    """Consumer-group read: entries stay pending until commit() XACKs them."""
+
+    def __init__(self, client, topic, group):
+        import redis
+        self.r = client
+        self.topic = topic
+        self.group_id = group
+        self.consumer = socket.gethostname()
+        try:
+            self.r.xgroup_create(topic, group, id="$", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._read_id = b"0"  # our own unacknowledged entries first, then new ones (">")
+        self._delivered = []
+
+    def wait_ready(self, timeout=30):
+        return True
+
+    def poll(self, timeout_ms=2000, max_records=None):
+        block = min(int(timeout_ms), 4000) if self._read_id == b">" else None
+        reply = self.r.xreadgroup(self.group_id, self.consumer, {self.topic: self._read_id},
+                                  count=max_records or 500, block=block)
+        entries = list(_stream_entries(reply))
+        if self._read_id != b">":
+            # Page through the pending list; once it is exhausted switch to new entries
+            self._read_id = entries[-1][0] if entries else b">"
+        out = []
+        for entry_id, fields in entries:
+            self._delivered.append(entry_id)
+            if fields:  # pending entries trimmed from the stream come back empty
+                out.append(_decode(fields[b"v"]))
+        return out
+
+    def commit(self):
+        if self._delivered:
+            self.r.xack(self.topic, self.group_id, *self._delivered)
+            self._delivered = []
+
+    def backlog(self):
+        # "lag" is reported by Redis >= 7.0 and is None when it cannot be computed
+        for info in self.r.xinfo_groups(self.topic):
+            if info.get("name") in (self.group_id, self.group_id.encode()):
+                return info.get("lag")
+        return None
+
+    def close(self):
+        pass
+
+
+# ═══════════════════════════════════════════════════════════════
+# IN-PROCESS
+# ═══════════════════════════════════════════════════════════════
+
+class MemoryTransport:
+    """Broadcast queues inside one process (every subscriber sees every message)."""
+
+    name = "memory"
+
+    def __init__(self, maxsize=100_000):
+        self.maxsize = maxsize
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def send(self, topic, value, key=None, partition=None):
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for q in subscribers:
+            q.put(dict(value))  # blocks when a subscriber falls maxsize behind
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def subscribe(self, topic, group="equilibrate", durable=False):
+        # Nothing outlives the process, so durable subscriptions behave like plain ones
+        q = queue.Queue(maxsize=self.maxsize)
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(q)
+        return MemorySubscription(self, topic, q)
+
+
+class MemorySubscription:
+    def __init__(self, transport, topic, q):
+        self.transport = transport
+        self.topic = topic
+        self.q = q
+
+    def wait_ready(self, timeout=30):
+        return True
+
+    def poll(self, timeout_ms=2000, max_records=None):
+        try:
+            out = [self.q.get(timeout=timeout_ms / 1000)]
+        except queue.Empty:
+            return []
+        limit = max_records or 500
+        while len(out) < limit:
+            try:
+                out.append(self.q.get_nowait())
+            except queue.Empty:
+                break
+        return out
+
+    def commit(self):
+        pass
+
+    def backlog(self):
+        return self.q.qsize()
+
+    def close(self):
+        with self.transport._lock:
+            subscribers = self.transport._subscribers.get(self.topic, [])
+            if self.q in subscribers:
+                subscribers.remove(self.q)
+
+
+# ═══════════════════════════════════════════════════════════════
+# FACTORY
+# ═══════════════════════════════════════════════════════════════
+
+BACKENDS = {
+    "kafka": KafkaTransport,
+    "redis": RedisStreamTransport,
+    "memory": MemoryTransport,
+}
+
+_transport = None
+
+
+def get_transport():
+    """Return the process-wide transport (transport.backend, default kafka)."""
+    global _transport
+    if _transport is None:
+        backend = get_setting("transport", "backend", "kafka")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown transport backend '{backend}' (expected one of {sorted(BACKENDS)})")
+        _transport = BACKENDS[backend]()
+    return _transport
+
+
+def set_transport(transport):
+    """Install a specific transport instance (local runs, benchmarks)."""
+    global _transport
+    _transport = transport
+    return transport
+
+
+def describe_transport(transport=None):
+    """Human-readable transport string for startup banners."""
+    transport = transport or get_transport()
+    if transport.name == "kafka":
+        return f"kafka://{transport.broker}"
+    return transport.name
@@ -0,0 +1,264 @@
+"""
+Equilibrate — Transaction Wire Format
+Encodes transaction messages for the broker. The first byte of every
+message identifies its format, so consumers decode whatever they receive
+and producers can be switched one at a time.
+
+Formats (transport.wire_format):
+  json     UTF-8 JSON object, as before (first byte "{"; default)
+  struct   0x01 + fixed little-endian record, 46 bytes for a typical
+           transaction (JSON: ~250):
+
+             B   header (0x01)
+             B   flags (FLAG_*)
+             16s transaction_id as raw UUID bytes
+             q   customer_id
+             q   timestamp as microseconds since 1970-01-01 of the naive
+                 local timestamp (no timezone conversion either way)
+             d   amount
+             4B  transaction_type, channel, merchant_category, persona codes
+
+           A traced message (config/tracing.py) sets FLAG_TRACE and adds
+           d emitted_at + 8s trace_id (raw bytes of 16 hex chars) right
+           after the record.
+
+           A value that does not fit its slot (non-UUID id, non-numeric
+           customer, unknown enum, unusual timestamp text) is flagged or
+           coded ESCAPE and carried as a length-prefixed UTF-8 string after
+           the record, so every message decodes to exactly what was sent.
+           Messages with other keys fall back to JSON.
+
+Enum tables are part of the wire contract: append new values, never
+reorder or remove them.
+
+Usage:
+    data = encode_message(txn, "struct")
+    txn = decode_message(data)
+"""
+import json
+import struct
+from datetime import datetime, timedelta
+
+from settings import get_setting
+
+FORMATS = ("json", "struct")
+
+JSON_HEADER = ord("{")
+STRUCT_HEADER = 0x01
+
+MESSAGE_FIELDS = (
+    "transaction_id", "customer_id", "timestamp", "amount", "transaction_type",
+    "channel", "merchant_category", "is_salary", "persona",
+)
+
+# ── Enum codes (append-only) ──
+TRANSACTION_TYPES = ("DEBIT", "CREDIT")
+CHANNELS = ("UPI", "POS", "ATM", "AUTODEBIT", "NETBANKING", "BANK_TRANSFER")
+CATEGORIES = (
+    "GROCERY", "UTILITY", "RENT", "MEDICAL", "INSURANCE", "SHOPPING", "TRAVEL", "DINING",
+    "ENTERTAINMENT", "SALARY", "EMI", "ATM_WITHDRAWAL", "FOOD", "LOANAPP",
+)
+PERSONAS = ("STABLE", "OVERSPENDER", "INCOME_SHOCK", "SILENT_DRAIN", "UNKNOWN")
+ESCAPE = 0xFF
+
+ENUM_FIELDS = (
+    ("transaction_type", TRANSACTION_TYPES),
+    ("channel", CHANNELS),
+    ("merchant_category", CATEGORIES),
+    ("persona", PERSONAS),
+)
+_TYPE_CODES, _CHANNEL_CODES, _CATEGORY_CODES, _PERSONA_CODES = (
+    {v: i for i, v in enumerate(values)} for _field, values in ENUM_FIELDS
+)
+TRACE_FIELDS = ("trace_id", "emitted_at")
+_MESSAGE_KEYS = frozenset(MESSAGE_FIELDS)
+_TRACED_KEYS = frozenset(MESSAGE_FIELDS + TRACE_FIELDS)
+
+# ── Flags ──
+FLAG_TXN_ID_STR = 0x01
+FLAG_CUSTOMER_STR = 0x02
+FLAG_TIMESTAMP_STR = 0x04
+FLAG_AMOUNT_INT = 0x08
+FLAG_SALARY = 0x10
+FLAG_TRACE = 0x20
+
+RECORD = struct.Struct("<BB16sqqdBBBB")
+TRACE = struct.Struct("<d8s")
+LENGTH = struct.Struct("<H")
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+INT64 = 2 ** 63
+
+
+def get_wire_format():
+    """Configured producer format (transport.wire_format, default json)."""
+    fmt = get_setting("transport", "wire_format", "json")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown wire format '{fmt}' (expected one of {FORMATS})")
+    return fmt
+
+
+# ═══════════════════════════════════════════════════════════════
+# ENCODE
+# ═══════════════════════════════════════════════════════════════
+
+def _uuid_bytes(txn_id):
+    """16 raw bytes if txn_id is a canonical lowercase UUID string, else None."""
+    if not isinstance(txn_id, str) or len(txn_id) != 36:
+        return None
+    if txn_id[8] != "-" or txn_id[13] != "-" or txn_id[18] != "-" or txn_id[23] != "-":
+        return None
+    hex_id = txn_id.replace("-", "")
+    try:
+        raw = bytes.fromhex(hex_id)
+    except ValueError:
+        return None
+    return raw if len(raw) == 16 and raw.hex() == hex_id else None
+
+
+def _timestamp_micros(ts):
+    """Microseconds for a str(datetime) timestamp, or None if it would not round-trip."""
+    # str(datetime) is "YYYY-MM-DD HH:MM:SS" plus ".ffffff" only when microseconds != 0
+    if not isinstance(ts, str) or ts[10:11] != " ":
+        return None
+    if len(ts) == 26:
+        if ts[19] != "." or ts[20:] == "000000":
+            return None
+    elif len(ts) != 19:
+        return None
+    try:
+        dt = datetime.fromisoformat(ts)
+    except ValueError:
+        return None
+    return (dt - EPOCH) // MICROSECOND
+
+
+def _encode_struct(txn):
+    flags = 0
+    tail = []
+
+    txn_id = _uuid_bytes(txn["transaction_id"])
+    if txn_id is None:
+        flags |= FLAG_TXN_ID_STR
+        tail.append(str(txn["transaction_id"]))
+        txn_id = bytes(16)
+
+    cid = txn["customer_id"]
+    if type(cid) is not int or not -INT64 <= cid < INT64:
+        flags |= FLAG_CUSTOMER_STR
+        tail.append(str(cid))
+        cid = 0
+
+    micros = _timestamp_micros(txn["timestamp"])
+    if micros is None:
+        flags |= FLAG_TIMESTAMP_STR
+        tail.append(str(txn["timestamp"]))
+        micros = 0
+
+    amount = txn["amount"]
+    if type(amount) is int:
+        flags |= FLAG_AMOUNT_INT
+
+    if txn["is_salary"] == 1:
+        flags |= FLAG_SALARY
+
+    codes = (
+        _TYPE_CODES.get(txn["transaction_type"], ESCAPE),
+        _CHANNEL_CODES.get(txn["channel"], ESCAPE),
+        _CATEGORY_CODES.get(txn["merchant_category"], ESCAPE),
+        _PERSONA_CODES.get(txn["persona"], ESCAPE),
+    )
+    for (field, _values), code in zip(ENUM_FIELDS, codes):
+        if code == ESCAPE:
+            tail.append(str(txn[field]))
+
+    trace_id = txn.get("trace_id")
+    if trace_id is not None:
+        flags |= FLAG_TRACE
+
+    out = [RECORD.pack(STRUCT_HEADER, flags, txn_id, cid, micros, float(amount), *codes)]
+    if trace_id is not None:
+        out.append(TRACE.pack(txn["emitted_at"], bytes.fromhex(trace_id)))
+    for s in tail:
+        b = s.encode("utf-8")
+        out.append(LENGTH.pack(len(b)))
+        out.append(b)
+    return b"".join(out)
+
+
+def _is_trace_id(trace_id):
+    return (isinstance(trace_id, str) and len(trace_id) == 16
+            and all(c in "0123456789abcdef" for c in trace_id))
+
+
+def _fits_struct(txn):
+    keys = txn.keys()
+    if keys != _MESSAGE_KEYS:
+        if keys != _TRACED_KEYS or type(txn["emitted_at"]) is not float or not _is_trace_id(txn["trace_id"]):
+            return False
+    amount, salary = txn["amount"], txn["is_salary"]
+    return (type(amount) in (int, float) and (type(amount) is float or abs(amount) < 2 ** 53)
+            and type(salary) is int and salary in (0, 1))
+
+
+def encode_message(txn, fmt="json"):
+    """Serialize one transaction dict to bytes in the given format."""
+    if fmt == "struct" and _fits_struct(txn):
+        return _encode_struct(txn)
+    return json.dumps(txn).encode("utf-8")
+
+
+# ═══════════════════════════════════════════════════════════════
+# DECODE
+# ═══════════════════════════════════════════════════════════════
+
+def _decode_struct(data):
+    _h, flags, txn_id, cid, micros, amount, *codes = RECORD.unpack_from(data)
+    pos = RECORD.size
+    if flags & FLAG_TRACE:
+        emitted_at, trace_id = TRACE.unpack_from(data, pos)
+        pos += TRACE.size
+    tail = []
+    while pos < len(data):
+        (n,) = LENGTH.unpack_from(data, pos)
+        pos += LENGTH.size
+        tail.append(data[pos:pos + n].decode("utf-8"))
+        pos += n
+    tail.reverse()
+
+    if flags & FLAG_TXN_ID_STR:
+        txn_id = tail.pop()
+    else:
+        h = txn_id.hex()
+        txn_id = f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+    if flags & FLAG_CUSTOMER_STR:
+        cid = tail.pop()
+    ts = tail.pop() if flags & FLAG_TIMESTAMP_STR else str(EPOCH + micros * MICROSECOND)
+
+    t_code, ch_code, cat_code, p_code = codes
+    # Escaped enum strings were appended in ENUM_FIELDS order; build in MESSAGE_FIELDS order
+    txn = {
+        "transaction_id": txn_id,
+        "customer_id": cid,
+        "timestamp": ts,
+        "amount": int(amount) if flags & FLAG_AMOUNT_INT else amount,
+        "transaction_type": tail.pop() if t_code == ESCAPE else TRANSACTION_TYPES[t_code],
+        "channel": tail.pop() if ch_code == ESCAPE else CHANNELS[ch_code],
+        "merchant_category": tail.pop() if cat_code == ESCAPE else CATEGORIES[cat_code],
+        "is_salary": 1 if flags & FLAG_SALARY else 0,
+        "persona": tail.pop() if p_code == ESCAPE else PERSONAS[p_code],
+    }
+    if flags & FLAG_TRACE:
+        txn["trace_id"] = trace_id.hex()
+        txn["emitted_at"] = emitted_at
+    return txn
+
+
+def decode_message(data):
+    """Deserialize bytes from any supported format (detected from the first byte)."""
+    header = data[0]
+    if header == STRUCT_HEADER:
+        return _decode_struct(data)
+    if header == JSON_HEADER:
+        return json.loads(data.decode("utf-8"))
+    raise ValueError(f"Unknown wire format header byte 0x{header:02x}")
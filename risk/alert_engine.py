@@ -5,45 +5,66 @@ and generates console alerts. No emojis, production-grade output.
 
 This is a simplified version of the intervention engine.
 For full intervention logic, use alert/intervention_engine.py.
+
+Run:  python risk/alert_engine.py
 """
-import redis
 import time
+import os
+import sys
 from datetime import datetime
 
-r = redis.Redis(host="localhost", port=6379, decode_responses=True)
-
-print("=" * 60)
-print("   EQUILIBRATE — Alert Engine v3.0")
-print("   Monitoring customer risk levels...")
-print("=" * 60)
-print()
-
-while True:
-    customers = r.keys("customer:*")
-    now = datetime.now().strftime("%H:%M:%S")
-
-    counts = {"HIGH": 0, "MEDIUM": 0, "LOW": 0}
-
-    for c in customers:
-        data = r.hgetall(c)
-        level = data.get("risk_level", "LOW")
-        score = data.get("risk_score", "0")
-        hardship = data.get("hardship_type", "NONE")
-        action = data.get("recommended_action", "Continue monitoring")
-
-        counts[level] = counts.get(level, 0) + 1
-
-        if level == "HIGH":
-            print(f"  [ALERT] {c} | HIGH RISK (Score: {score}/10) | "
-                  f"Hardship: {hardship.replace('_', ' ').title()} | "
-                  f"Action: {action}")
-        elif level == "MEDIUM":
-            print(f"  [WARN]  {c} | MEDIUM (Score: {score}/10) | "
-                  f"Hardship: {hardship.replace('_', ' ').title()}")
-
-    total = len(customers)
-    h_pct = 100 * counts["HIGH"] / total if total else 0
-    print(f"\n  [{now}] Total: {total} | HIGH: {counts['HIGH']} ({h_pct:.1f}%) | "
-          f"MEDIUM: {counts['MEDIUM']} | LOW: {counts['LOW']}")
-    print(f"  Checking again in 10 seconds...\n")
-    time.sleep(10)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+sys.path.insert(0, os.path.join(BASE_DIR, "features"))
+from metrics import start_metrics
+from redis_store import get_store, customer_key
+
+
+def main():
+    store = get_store()
+
+    print("=" * 60)
+    print("   EQUILIBRATE — Alert Engine v3.0")
+    print("   Monitoring customer risk levels...")
+    print("=" * 60)
+    print()
+
+    metrics = start_metrics("alert_engine")
+    while True:
+        t0 = time.perf_counter()
+        customers = list(store.scan())
+        now = datetime.now().strftime("%H:%M:%S")
+
+        counts = {"HIGH": 0, "MEDIUM": 0, "LOW": 0}
+
+        for cid, data in zip(customers, store.batch_get(customers)):
+            c = customer_key(cid)
+            level = data.get("risk_level", "LOW")
+            score = data.get("risk_score", "0")
+            hardship = data.get("hardship_type", "NONE")
+            action = data.get("recommended_action", "Continue monitoring")
+
+            counts[level] = counts.get(level, 0) + 1
+
+            if level == "HIGH":
+                print(f"  [ALERT] {c} | HIGH RISK (Score: {score}/10) | "
+                      f"Hardship: {hardship.replace('_', ' ').title()} | "
+                      f"Action: {action}")
+            elif level == "MEDIUM":
+                print(f"  [WARN]  {c} | MEDIUM (Score: {score}/10) | "
+                      f"Hardship: {hardship.replace('_', ' ').title()}")
+
+        total = len(customers)
+        metrics.observe("scan", time.perf_counter() - t0)
+        metrics.inc("scans")
+        metrics.inc("alerts", counts["HIGH"])
+        metrics.inc("warnings", counts["MEDIUM"])
+        h_pct = 100 * counts["HIGH"] / total if total else 0
+        print(f"\n  [{now}] Total: {total} | HIGH: {counts['HIGH']} ({h_pct:.1f}%) | "
+              f"MEDIUM: {counts['MEDIUM']} | LOW: {counts['LOW']}")
+        print(f"  Checking again in 10 seconds...\n")
+        time.sleep(10)
+
+
+if __name__ == "__main__":
+    main()
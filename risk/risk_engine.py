@@ -1,192 +1,168 @@
 """
 Risk Engine v5.0 — Continuous Risk Monitor
-Re-evaluates all customer profiles every 5 seconds.
+Re-evaluates all customer profiles every 5 seconds of clock time (config/clock.py).
 This process serves as a safety-net re-evaluator and distribution reporter.
 
 The primary risk computation runs in customer_features.py per transaction.
 This engine catches customers that may have drifted and ensures consistency.
+
+Each scan walks the feature store in batches: one pipelined read and one
+pipelined write per batch instead of several round-trips per customer.
+
+Scan and per-profile scoring latency are exported by config/metrics.py.
+Traced transactions written before a scan starts get their risk_pickup hop
+when it ends (config/tracing.py). Profiles on demand (config/profiling.py).
+
+Run:  python risk/risk_engine.py
+Importing this module only defines evaluate_customer(); the monitor loop
+starts from main().
 """
-import redis
-import json
-import time
 import os
-from datetime import datetime
+import sys
 
-r = redis.Redis(host="localhost", port=6379, decode_responses=True)
-
-# ── Load policy templates ──
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-POLICY_PATH = os.path.join(BASE_DIR, "risk", "policy_templates.json")
-
-try:
-    with open(POLICY_PATH, "r", encoding="utf-8") as f:
-        POLICIES = json.load(f)
-except Exception:
-    POLICIES = {}
 
-# Use the policy engine for action lookup
-import sys as _sys
-_sys.path.insert(0, os.path.join(BASE_DIR, "risk"))
-from policy_engine import get_recommended_action
+# Shared risk rules + feature store
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+sys.path.insert(0, os.path.join(BASE_DIR, "risk"))
+sys.path.insert(0, os.path.join(BASE_DIR, "features"))
+from clock import get_clock
+from metrics import get_metrics, start_metrics
+from profiling import start_profiling
+from risk_rules import evaluate
+from tracing import get_tracer
+from redis_store import get_store, KEY_PREFIX
+from profile_codec import decode_profile
+from profile_tiering import is_stub, rehydrate
 
-print("=" * 60)
-print("  EQUILIBRATE — Risk Monitor v5.0")
-print("  Continuous risk evaluation + distribution reporting")
-print("=" * 60)
-print()
+# ── Customers evaluated per pipelined batch ──
+SCAN_BATCH = 1000
 
 
-def evaluate_customer(customer_key):
+def evaluate_customer(customer_key, store=None):
     """Re-evaluate a customer's risk based on current Redis state.
 
-    Mirrors the scoring logic in customer_features._compute_risk_score.
+    Accepts either a customer id or a "customer:{id}" key.
+    Returns the new risk level, or None if the customer has no profile.
+    """
+    store = store or get_store()
+    cid = str(customer_key)
+    if cid.startswith(KEY_PREFIX):
+        cid = cid[len(KEY_PREFIX):]
+    data = store.get(cid)
+    if is_stub(data):
+        data = rehydrate(cid, store)
+    updates = evaluate_profile(data)
+    if updates is None:
+        return None
+    store.put(cid, updates)
+    return updates["risk_level"]
+
+
+def evaluate_profile(data):
+    """Score one stored profile and return the fields to write back.
+
+    Uses the shared rules in risk_rules.py (hardship is cleared for LOW).
     """
-    data = r.hgetall(customer_key)
     if not data:
         return None
+    profile = decode_profile(data)
+    with get_metrics().timer("score"):
+        result = evaluate(profile)
+    result["risk_score"] = str(result["risk_score"])
+    result["last_risk_eval"] = get_clock().now().strftime("%Y-%m-%d %H:%M:%S")
+    return result
+
 
-    txn_count = int(data.get("txn_count", 0))
-    withdrawals = int(data.get("withdrawals", 0))
-    salary_count = int(data.get("salary_count", 0))
-    total_spend = float(data.get("total_spend", 0))
-    essential = float(data.get("essential_spend", 0))
-    discretionary = float(data.get("discretionary_spend", 0))
-    days_since_salary = int(data.get("days_since_salary", -1))
-    atm_7d = int(data.get("atm_withdrawals_7d", 0))
-    spending_change = float(data.get("spending_change_pct", 0))
-    persona = data.get("persona", "UNKNOWN")
-
-    score = 0.0
-
-    if txn_count < 3:
-        score = 0
-    else:
-        # ── Salary gap (0-3 points) ──
-        if salary_count == 0 and txn_count >= 15:
-            score += 3
-        elif salary_count == 0 and txn_count >= 8:
-            score += 2
-        elif salary_count == 0 and txn_count >= 4:
-            score += 1
-        elif days_since_salary > 45:
-            score += 2
-        elif days_since_salary > 30:
-            score += 1
-
-        # ── Withdrawal spike (0-2 points) ──
-        if atm_7d >= 12:
-            score += 2
-        elif atm_7d >= 6:
-            score += 1.5
-        elif atm_7d >= 4:
-            score += 1
-
-        # ── Spend drop (0-2 points) ──
-        if spending_change < -60:
-            score += 2
-        elif spending_change < -35:
-            score += 1
-
-        # ── Inactivity / survival mode (0-1 point) ──
-        if essential > 0 and discretionary == 0 and txn_count > 10:
-            score += 1
-        elif essential > 0 and discretionary > 0 and essential > discretionary * 4:
-            score += 0.5
-
-        # ── Persona factor ──
-        if score >= 2:
-            if persona == "INCOME_SHOCK" and salary_count == 0:
-                score += 1
-            elif persona == "SILENT_DRAIN" and txn_count < 10 and salary_count == 0:
-                score += 0.5
-
-    score = min(round(score), 10)
-
-    # Classification (calibrated for streaming demo)
-    if score >= 5:
-        risk_level = "HIGH"
-    elif score >= 3:
-        risk_level = "MEDIUM"
-    else:
-        risk_level = "LOW"
-
-    # ── Hardship classification ──
-    hardship = "NONE"
-
-    if txn_count >= 3:
-        total_spend = float(data.get("total_spend", 0))
-
-        if salary_count == 0 and txn_count >= 5 and persona in ("INCOME_SHOCK", "SILENT_DRAIN"):
-            hardship = "INCOME_SHOCK"
-        elif days_since_salary > 30 and atm_7d >= 3:
-            hardship = "INCOME_SHOCK"
-        elif essential > 0 and total_spend > 0 and (essential / total_spend) > 0.70 and txn_count >= 5:
-            hardship = "OVER_LEVERAGE"
-        elif atm_7d >= 5 and spending_change < -20:
-            hardship = "LIQUIDITY_STRESS"
-        elif atm_7d >= 8:
-            hardship = "LIQUIDITY_STRESS"
-        elif essential > 0 and discretionary == 0 and txn_count > 5:
-            hardship = "EXPENSE_COMPRESSION"
-        elif spending_change < -40 and essential > discretionary * 3 and txn_count > 5:
-            hardship = "EXPENSE_COMPRESSION"
-        elif discretionary > 0 and essential > 0 and discretionary > essential * 2.5 and discretionary > 3000:
-            hardship = "OVERSPENDING"
-        elif persona == "OVERSPENDER" and discretionary > essential * 2 and discretionary > 2000:
-            hardship = "OVERSPENDING"
-
-    # If LOW, clear hardship
-    if risk_level == "LOW":
-        hardship = "NONE"
-
-    # ── Policy lookup via policy_engine ──
-    recommended_action = get_recommended_action(hardship, risk_level)
-
-    # ── Write to Redis ──
-    r.hset(customer_key, mapping={
-        "risk_level": risk_level,
-        "risk_score": str(score),
-        "hardship_type": hardship,
-        "recommended_action": recommended_action,
-        "last_risk_eval": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    })
-
-    return risk_level
-
-
-# ── Main Loop ──
-cycle = 0
-while True:
-    cycle += 1
-    customers = r.keys("customer:*")
-    now = datetime.now().strftime("%H:%M:%S")
+def scan_portfolio(store=None, batch_size=SCAN_BATCH):
+    """Re-evaluate every customer in batches.
 
+    Returns (total, risk level counts, hardship counts).
+    """
+    store = store or get_store()
     counts = {"HIGH": 0, "MEDIUM": 0, "LOW": 0}
     hardship_counts = {}
-
-    for c in customers:
-        level = evaluate_customer(c)
-        if level:
-            counts[level] = counts.get(level, 0) + 1
+    total = 0
+
+    batch = []
+    for cid in store.scan(batch_size):
+        batch.append(cid)
+        if len(batch) >= batch_size:
+            total += _evaluate_batch(store, batch, counts, hardship_counts)
+            batch = []
+    if batch:
+        total += _evaluate_batch(store, batch, counts, hardship_counts)
+    return total, counts, hardship_counts
+
+
+def _evaluate_batch(store, customer_ids, counts, hardship_counts):
+    updates = {}
+    evaluated = 0
+    for cid, data in zip(customer_ids, store.batch_get(customer_ids)):
+        if is_stub(data):
+            # Idle customer in cold storage: count the stored result, don't rescore
+            result = data
+        else:
+            result = evaluate_profile(data)
+            if result is None:
+                continue
+            updates[cid] = result
+        evaluated += 1
+        level = result.get("risk_level", "LOW")
+        counts[level] = counts.get(level, 0) + 1
 
         # Count hardship types
-        h = r.hget(c, "hardship_type") or "NONE"
+        h = result.get("hardship_type", "NONE")
         hardship_counts[h] = hardship_counts.get(h, 0) + 1
-
-    total = len(customers)
-    h_pct = 100 * counts["HIGH"] / total if total else 0
-    m_pct = 100 * counts["MEDIUM"] / total if total else 0
-
-    # Log distribution
-    hardship_str = " | ".join(f"{k}:{v}" for k, v in sorted(hardship_counts.items()) if k != "NONE")
-
-    print(
-        f"[{now}] Scan #{cycle} | Total: {total} | "
-        f"HIGH: {counts['HIGH']} ({h_pct:.1f}%) | "
-        f"MEDIUM: {counts['MEDIUM']} ({m_pct:.1f}%) | "
-        f"LOW: {counts['LOW']}"
-    )
-    if hardship_str:
-        print(f"         Hardship: {hardship_str}")
-
-    time.sleep(5)
+    store.batch_update(updates)
+    return evaluated
+
+
+# ═══════════════════════════════════════════════════════════════
+# MAIN LOOP
+# ═══════════════════════════════════════════════════════════════
+
+def main():
+    print("=" * 60)
+    print("  EQUILIBRATE — Risk Monitor v5.0")
+    print("  Continuous risk evaluation + distribution reporting")
+    print("=" * 60)
+    print()
+
+    store = get_store()
+    metrics = start_metrics("risk_engine")
+    tracer = get_tracer()
+    profiler = start_profiling("risk_engine")
+    cycle = 0
+    while True:
+        cycle += 1
+        now = get_clock().now().strftime("%H:%M:%S")
+
+        armed = tracer.collect("risk_pickup")
+        with metrics.timer("scan"):
+            total, counts, hardship_counts = scan_portfolio(store)
+        tracer.complete(armed, "risk_pickup")
+        metrics.inc("scans")
+        metrics.inc("customers_evaluated", total)
+        profiler.tick(total)  # risk monitor profiles count customers scored
+
+        h_pct = 100 * counts["HIGH"] / total if total else 0
+        m_pct = 100 * counts["MEDIUM"] / total if total else 0
+
+        # Log distribution
+        hardship_str = " | ".join(f"{k}:{v}" for k, v in sorted(hardship_counts.items()) if k != "NONE")
+
+        print(
+            f"[{now}] Scan #{cycle} | Total: {total} | "
+            f"HIGH: {counts['HIGH']} ({h_pct:.1f}%) | "
+            f"MEDIUM: {counts['MEDIUM']} ({m_pct:.1f}%) | "
+            f"LOW: {counts['LOW']}"
+        )
+        if hardship_str:
+            print(f"         Hardship: {hardship_str}")
+
+        get_clock().sleep(5)
+
+
+if __name__ == "__main__":
+    main()
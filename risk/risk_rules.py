@@ -0,0 +1,465 @@
+"""
+Equilibrate — Risk Rules v2.0
+Single home for hardship classification and risk scoring, shared by the
+streaming feature update (customer_features.py), the risk monitor
+(risk_engine.py) and the bulk jobs (features/backfill_features.py,
+features/seed_portfolio.py).
+
+The rules themselves live in risk/risk_rules.json, next to
+policy_templates.json: hardship types in priority order, score signals
+with their point weights, level cutoffs and the minimum history. Each
+condition is a Python-style expression over the profile fields:
+
+  "when": "days_since_salary > 30 and atm_withdrawals_7d >= 3"
+
+Allowed: the fields in FIELDS (and, in score rules, "score" — the points
+from the signals above), numbers, strings, + - * /, comparisons,
+and / or / not, and "in (...)" against a list of constants. A condition,
+and every operand of and / or / not, must be a comparison (write
+"salary_count == 0", not "not salary_count").
+
+On load the file is compiled into two evaluators that apply the same
+rules: a scalar one (generated Python, one profile at a time) and a
+column-wise NumPy one for bulk jobs (*_arrays functions). The file is
+checked for changes every rules.reload_interval seconds (default 5) and
+recompiled on the next call; a file that fails to compile is reported
+and the previous rules stay in force.
+
+Configuration:
+  EQ_RULES_PATH             rule file (default risk/risk_rules.json)
+  EQ_RULES_RELOAD_INTERVAL  seconds between change checks (0 = never reload)
+
+Score structure (risk_rules.json v1, 0-10):
+  Salary gap       0-3 points  (weight: high)
+  Withdrawal spike 0-2 points  (weight: medium)
+  Spend drop       0-2 points  (weight: medium)
+  Inactivity       0-1 points  (weight: low)
+  Persona factor   0-1 points  (weight: supplemental, never standalone)
+
+HIGH (>= 5) requires convergence of multiple signals; MEDIUM is >= 3.
+"""
+import ast
+import copy
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RULES_PATH = os.path.join(BASE_DIR, "risk", "risk_rules.json")
+
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+from settings import get_setting
+from policy_engine import get_recommended_action
+
+# Profile fields a rule may read: (type, default), read from a typed or
+# stored profile as type(data.get(field, default))
+FIELDS = {
+    "salary_count": (int, 0),
+    "days_since_salary": (int, -1),
+    "atm_withdrawals_7d": (int, 0),
+    "txn_count": (int, 0),
+    "total_spend": (float, 0),
+    "essential_spend": (float, 0),
+    "discretionary_spend": (float, 0),
+    "spending_change_pct": (float, 0),
+    "persona": (str, "UNKNOWN"),
+}
+SCORE_NAME = "score"
+
+
+class RuleError(ValueError):
+    """The rule file is invalid."""
+
+
+# ═══════════════════════════════════════════════════════════════
+# EXPRESSIONS
+# ═══════════════════════════════════════════════════════════════
+
+_COMPARE = {ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">=", ast.Eq: "==", ast.NotEq: "!="}
+_ARITH = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/"}
+
+
+def parse_condition(text, names, where):
+    """Parse and check one condition; returns its AST and the field names it reads."""
+    try:
+        tree = ast.parse(text, mode="eval").body
+    except SyntaxError as e:
+        raise RuleError(f"{where}: cannot parse {text!r} ({e.msg})") from None
+    used = set()
+
+    def boolean(node):
+        # and / or / not compile to & | ~ on the NumPy path, which only agree
+        # with Python's truthiness on boolean operands
+        if not (isinstance(node, (ast.BoolOp, ast.Compare))
+                or isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not)):
+            raise RuleError(f"{where}: {ast.unparse(node)!r} is not a comparison in {text!r}")
+        check(node)
+
+    def check(node):
+        if isinstance(node, ast.BoolOp):
+            for value in node.values:
+                boolean(value)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            boolean(node.operand)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            check(node.operand)
+        elif isinstance(node, ast.BinOp) and type(node.op) in _ARITH:
+            check(node.left)
+            check(node.right)
+        elif isinstance(node, ast.Compare):
+            if len(node.ops) != 1:
+                raise RuleError(f"{where}: chained comparisons are not supported in {text!r}")
+            check(node.left)
+            if isinstance(node.ops[0], (ast.In, ast.NotIn)):
+                if not (isinstance(node.comparators[0], (ast.Tuple, ast.List))
+                        and all(isinstance(e, ast.Constant) for e in node.comparators[0].elts)):
+                    raise RuleError(f"{where}: 'in' needs a list of constants in {text!r}")
+            elif type(node.ops[0]) in _COMPARE:
+                check(node.comparators[0])
+            else:
+                raise RuleError(f"{where}: unsupported comparison in {text!r}")
+        elif isinstance(node, ast.Name):
+            if node.id not in names:
+                raise RuleError(f"{where}: unknown field {node.id!r} in {text!r}")
+            used.add(node.id)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str)):
+            pass
+        else:
+            raise RuleError(f"{where}: unsupported expression {ast.unparse(node)!r} in {text!r}")
+
+    boolean(tree)
+    return tree, used
+
+
+def _div(a, b):
+    """a / b with NumPy's answer for b == 0 (+-inf, or nan for 0 / 0)."""
+    if b:
+        return a / b
+    if a == 0 or a != a:
+        return math.nan
+    return math.inf if (a > 0) == (math.copysign(1.0, b) > 0) else -math.inf
+
+
+class _SafeDivision(ast.NodeTransformer):
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Div):
+            return ast.Call(func=ast.Name(id="_div", ctx=ast.Load()), args=[node.left, node.right], keywords=[])
+        return node
+
+
+def scalar_source(node):
+    """Python source for one profile (fields are local variables).
+
+    Division goes through _div so a zero divisor gives the same inf / nan
+    as the NumPy path instead of raising.
+    """
+    return ast.unparse(_SafeDivision().visit(copy.deepcopy(node)))
+
+
+def vector_source(node):
+    """NumPy source over column arrays (fields are local arrays)."""
+    if isinstance(node, ast.BoolOp):
+        joiner = " & " if isinstance(node.op, ast.And) else " | "
+        return "(" + joiner.join(vector_source(v) for v in node.values) + ")"
+    if isinstance(node, ast.UnaryOp):
+        operand = vector_source(node.operand)
+        return f"(~{operand})" if isinstance(node.op, ast.Not) else f"(-{operand})"
+    if isinstance(node, ast.BinOp):
+        return f"({vector_source(node.left)} {_ARITH[type(node.op)]} {vector_source(node.right)})"
+    if isinstance(node, ast.Compare):
+        op, right = node.ops[0], node.comparators[0]
+        if isinstance(op, (ast.In, ast.NotIn)):
+            values = [e.value for e in right.elts]
+            test = f"np.isin({vector_source(node.left)}, {values!r})"
+            return test if isinstance(op, ast.In) else f"(~{test})"
+        return f"({vector_source(node.left)} {_COMPARE[type(op)]} {vector_source(right)})"
+    return ast.unparse(node)
+
+
+# ═══════════════════════════════════════════════════════════════
+# COMPILER
+# ═══════════════════════════════════════════════════════════════
+
+class RuleSet:
+    """One compiled version of the rule file."""
+
+    def __init__(self, spec, source="<rules>"):
+        self.spec = spec
+        self.source = source
+        self.version = spec.get("version", 0)
+        try:
+            self.min_history = int(spec.get("min_history", 0))
+            self.max_score = spec.get("max_score", 10)
+            self.levels = sorted(((float(l["min_score"]), l["level"]) for l in spec.get("levels", [])),
+                                 reverse=True)
+            self.default_level = spec.get("default_level", "LOW")
+            self.default_hardship = spec.get("default_hardship", "NONE")
+            fields = set(FIELDS)
+            self.hardship = [
+                (rule["type"], parse_condition(rule["when"], fields, f"hardship[{i}]"))
+                for i, rule in enumerate(spec.get("hardship", []))
+            ]
+            self.signals = [
+                (group.get("signal", f"score[{g}]"), [
+                    (float(rule["points"]),
+                     parse_condition(rule["when"], fields | {SCORE_NAME}, f"score[{g}].rules[{i}]"))
+                    for i, rule in enumerate(group["rules"])
+                ])
+                for g, group in enumerate(spec.get("score", []))
+            ]
+        except (KeyError, TypeError, ValueError) as e:
+            if isinstance(e, RuleError):
+                raise
+            raise RuleError(f"malformed rule file ({e.__class__.__name__}: {e})") from None
+        self._scalar = self._compile_scalar()
+        self.classify_hardship, self.risk_score = self._scalar["classify_hardship"], self._scalar["risk_score"]
+        self._vector = None
+        self._vector_lock = threading.Lock()
+
+    # ── Scalar path: generated Python ──
+
+    def _reads(self, conditions):
+        """Lines binding each field the conditions read, in FIELDS order."""
+        used = set().union(*(u for _tree, u in conditions)) if conditions else set()
+        lines = []
+        for name, (kind, default) in FIELDS.items():
+            if name in used or name == "txn_count":
+                cast = "" if kind is str else kind.__name__
+                lines.append(f"    {name} = {cast}(data.get({name!r}, {default!r}))")
+        return lines
+
+    def _compile_scalar(self):
+        conditions = [c for _type, c in self.hardship]
+        lines = ["def classify_hardship(data):"] + self._reads(conditions)
+        lines.append(f"    if txn_count < {self.min_history}:")
+        lines.append(f"        return {self.default_hardship!r}")
+        for hardship, (tree, _used) in self.hardship:
+            lines.append(f"    if {scalar_source(tree)}:")
+            lines.append(f"        return {hardship!r}")
+        lines.append(f"    return {self.default_hardship!r}")
+
+        conditions = [c for _name, rules in self.signals for _points, c in rules]
+        lines += ["", "def risk_score(data):"] + self._reads(conditions)
+        lines.append(f"    if txn_count < {self.min_history}:")
+        lines.append("        return 0")
+        lines.append(f"    {SCORE_NAME} = 0.0")
+        for name, rules in self.signals:
+            lines.append(f"    # {name}")
+            lines.append("    points = 0.0")
+            for i, (points, (tree, _used)) in enumerate(rules):
+                lines.append(f"    {'if' if i == 0 else 'elif'} {scalar_source(tree)}:")
+                lines.append(f"        points = {points!r}")
+            lines.append(f"    {SCORE_NAME} += points")
+        lines.append(f"    return min(round({SCORE_NAME}), {self.max_score!r})")
+
+        namespace = {"_div": _div}
+        exec(compile("\n".join(lines) + "\n", f"<{os.path.basename(self.source)} v{self.version}>", "exec"),
+             namespace)
+        return namespace
+
+    def level_for(self, score):
+        for cutoff, level in self.levels:
+            if score >= cutoff:
+                return level
+        return self.default_level
+
+    # ── Vector path: generated NumPy (compiled on first bulk use) ──
+
+    def vector(self):
+        if self._vector is None:
+            with self._vector_lock:
+                if self._vector is None:
+                    self._vector = self._compile_vector()
+        return self._vector
+
+    def _compile_vector(self):
+        import numpy as np
+
+        def columns(conditions):
+            used = set().union(*(u for _tree, u in conditions)) | {"txn_count"}
+            return [f"    {name} = df[{name!r}].to_numpy()" for name in FIELDS if name in used]
+
+        conditions = [c for _type, c in self.hardship]
+        lines = ["def classify_hardship_arrays(df):"] + columns(conditions)
+        lines.append("    with np.errstate(divide='ignore', invalid='ignore'):")
+        lines.append(f"        conditions = [txn_count < {self.min_history}]")
+        lines.append(f"        choices = [{self.default_hardship!r}]")
+        for hardship, (tree, _used) in self.hardship:
+            lines.append(f"        conditions.append({vector_source(tree)})")
+            lines.append(f"        choices.append({hardship!r})")
+        lines.append(f"    return np.select(conditions, choices, default={self.default_hardship!r}).astype(object)")
+
+        conditions = [c for _name, rules in self.signals for _points, c in rules]
+        lines += ["", "def risk_score_arrays(df):"] + columns(conditions)
+        lines.append(f"    {SCORE_NAME} = np.zeros(len(df))")
+        lines.append("    with np.errstate(divide='ignore', invalid='ignore'):")
+        for name, rules in self.signals:
+            lines.append(f"        # {name}")
+            conds = ", ".join(vector_source(tree) for _points, (tree, _used) in rules)
+            points = ", ".join(repr(p) for p, _c in rules)
+            lines.append(f"        {SCORE_NAME} = {SCORE_NAME} + np.select([{conds}], [{points}], default=0.0)")
+        lines.append("    # np.round rounds half to even, like round() on the scalar path")
+        lines.append(f"    {SCORE_NAME} = np.minimum(np.round({SCORE_NAME}), {self.max_score!r}).astype(np.int64)")
+        lines.append(f"    return np.where(txn_count < {self.min_history}, 0, {SCORE_NAME})")
+
+        namespace = {"np": np}
+        exec(compile("\n".join(lines) + "\n", f"<{os.path.basename(self.source)} v{self.version} arrays>", "exec"),
+             namespace)
+        return namespace
+
+
+# ═══════════════════════════════════════════════════════════════
+# LOADING + HOT RELOAD
+# ═══════════════════════════════════════════════════════════════
+
+def load_rules(path=None):
+    """Read and compile a rule file; raises RuleError (or OSError) on failure."""
+    path = path or get_setting("rules", "path", "") or RULES_PATH
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            spec = json.load(f)
+        except json.JSONDecodeError as e:
+            raise RuleError(f"invalid JSON ({e})") from None
+    return RuleSet(spec, path)
+
+
+_rules = None
+_rules_mtime = None
+_next_check = 0.0
+_reload_lock = threading.Lock()
+
+
+def _file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_rules():
+    """The current compiled rules, reloaded when the rule file has changed."""
+    global _rules, _rules_mtime, _next_check
+    rules = _rules
+    if rules is not None and time.monotonic() < _next_check:
+        return rules
+    with _reload_lock:
+        if _rules is not None and time.monotonic() < _next_check:
+            return _rules
+        interval = get_setting("rules", "reload_interval", 5.0)
+        _next_check = time.monotonic() + interval if interval > 0 else float("inf")
+        path = get_setting("rules", "path", "") or RULES_PATH
+        mtime = _file_mtime(path)
+        if _rules is not None and mtime == _rules_mtime:
+            return _rules
+        try:
+            new = load_rules(path)
+        except (OSError, RuleError) as e:
+            if _rules is None:
+                raise
+            print(f"  [Rules] Keeping v{_rules.version}: could not reload {path} — {e}")
+            _rules_mtime = mtime  # report once per change
+            return _rules
+        if _rules is not None:
+            print(f"  [Rules] Reloaded {os.path.basename(path)}: v{_rules.version} -> v{new.version}")
+        _rules, _rules_mtime = new, mtime
+        return _rules
+
+
+def set_rules(rules):
+    """Install a RuleSet (tests, benchmarks); stops reloading from the file."""
+    global _rules, _next_check
+    with _reload_lock:
+        _rules, _next_check = rules, float("inf")
+    return rules
+
+
+# ═══════════════════════════════════════════════════════════════
+# SCALAR RULES
+# ═══════════════════════════════════════════════════════════════
+
+# Each function takes an optional RuleSet: a caller making several calls for
+# one profile fetches get_rules() once and passes it, so a reload between
+# the calls cannot mix two rule versions.
+
+def risk_level_for(score, rules=None):
+    """Map a 0-10 score to its risk level."""
+    return (rules or get_rules()).level_for(score)
+
+
+def classify_hardship(data, rules=None):
+    """Hardship type for one profile: the first matching rule in priority order."""
+    return (rules or get_rules()).classify_hardship(data)
+
+
+def risk_score(data, rules=None):
+    """Weighted 0-10 risk score for one profile."""
+    return (rules or get_rules()).risk_score(data)
+
+
+def evaluate(data, rules=None):
+    """Full risk evaluation as stored by the risk monitor.
+
+    Hardship is cleared for customers at the default (lowest) level.
+    Returns risk_level, risk_score, hardship_type and recommended_action.
+    """
+    rules = rules or get_rules()
+    score = rules.risk_score(data)
+    level = rules.level_for(score)
+    hardship = rules.classify_hardship(data) if level != rules.default_level else rules.default_hardship
+    return {
+        "risk_level": level,
+        "risk_score": score,
+        "hardship_type": hardship,
+        "recommended_action": get_recommended_action(hardship, level),
+    }
+
+
+# ═══════════════════════════════════════════════════════════════
+# COLUMN-WISE RULES (bulk jobs)
+# ═══════════════════════════════════════════════════════════════
+
+def classify_hardship_arrays(df, rules=None):
+    """classify_hardship() over every row of a profile DataFrame."""
+    return (rules or get_rules()).vector()["classify_hardship_arrays"](df)
+
+
+def risk_score_arrays(df, rules=None):
+    """risk_score() over every row of a profile DataFrame (int array)."""
+    return (rules or get_rules()).vector()["risk_score_arrays"](df)
+
+
+def evaluate_arrays(df, rules=None):
+    """evaluate() over every row of a profile DataFrame.
+
+    Returns a dict of column arrays: risk_level, risk_score, hardship_type,
+    recommended_action.
+    """
+    import numpy as np
+
+    rules = rules or get_rules()
+    vector = rules.vector()
+    score = vector["risk_score_arrays"](df)
+    levels = rules.levels
+    level = np.select([score >= cutoff for cutoff, _level in levels], [lvl for _cutoff, lvl in levels],
+                      default=rules.default_level).astype(object)
+    hardship = np.where(level != rules.default_level, vector["classify_hardship_arrays"](df),
+                        rules.default_hardship).astype(object)
+
+    # One policy lookup per distinct (hardship, level) pair
+    actions = {}
+    recommended = np.empty(len(score), dtype=object)
+    for i, key in enumerate(zip(hardship, level)):
+        action = actions.get(key)
+        if action is None:
+            action = actions[key] = get_recommended_action(*key)
+        recommended[i] = action
+    return {
+        "risk_level": level,
+        "risk_score": score,
+        "hardship_type": hardship,
+        "recommended_action": recommended,
+    }
@@ -4,12 +4,15 @@ Appends one row per customer to data/customer_history.csv after each
 transaction is processed. Acts as the bank's behavioural snapshot store.
 
 Deduplication: Prevents duplicate writes within 5 minutes per customer.
+Written rows are timed as the "snapshot" stage (config/metrics.py).
+
+Importing this module has no side effects: the feature store and the static
+customer data are created on first use.
 """
 import os
 import csv
+import sys
 import time
-import pandas as pd
-import redis
 from datetime import datetime
 
 # ── Paths ──
@@ -17,6 +20,13 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 HISTORY_CSV = os.path.join(BASE_DIR, "data", "customer_history.csv")
 CUSTOMERS_CSV = os.path.join(BASE_DIR, "data", "customers.csv")
 
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+sys.path.insert(0, os.path.join(BASE_DIR, "features"))
+from clock import get_clock
+from metrics import get_metrics
+from redis_store import get_store
+from profile_codec import decode_profile
+
 # ── CSV Headers ──
 SNAPSHOT_FIELDS = [
     "customer_id",
@@ -37,37 +47,34 @@ SNAPSHOT_FIELDS = [
     "loan_from_other_banks",
 ]
 
-# ── Redis connection ──
-r = redis.Redis(host="localhost", port=6379, decode_responses=True)
-
 # ── In-memory deduplication cache: { customer_id: last_write_timestamp } ──
 _last_write_time = {}
 
 # ── Cooldown in seconds (5 minutes) ──
 WRITE_COOLDOWN = 300
 
-# ── Load static customer data (once at startup) ──
-_customer_static = {}
+# ── Static customer data (loaded once, on first snapshot) ──
+_customer_static = None
 
 
 def _load_static_data():
     """Load static customer attributes from customers.csv into memory."""
     global _customer_static
+    if _customer_static is not None:
+        return _customer_static
+    _customer_static = {}
     try:
-        df = pd.read_csv(CUSTOMERS_CSV)
-        for _, row in df.iterrows():
-            cid = str(int(row["customer_id"]))
-            _customer_static[cid] = {
-                "emi_amount": float(row.get("emi_amount", 0)),
-                "initial_balance": float(row.get("initial_balance", 0)),
-            }
+        with open(CUSTOMERS_CSV, "r", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                cid = str(int(float(row["customer_id"])))
+                _customer_static[cid] = {
+                    "emi_amount": float(row.get("emi_amount") or 0),
+                    "initial_balance": float(row.get("initial_balance") or 0),
+                }
         print(f"  [SnapshotWriter] Loaded static data for {len(_customer_static)} customers")
     except Exception as e:
         print(f"  [SnapshotWriter] Warning: Could not load customers.csv — {e}")
-
-
-# Load on import
-_load_static_data()
+    return _customer_static
 
 
 def _ensure_csv_exists():
@@ -83,34 +90,39 @@ def _ensure_csv_exists():
 def _is_duplicate(customer_id):
     """Check if a write for this customer occurred within the last 5 minutes."""
     cid = str(customer_id)
-    now = time.time()
+    now = get_clock().time()
     last = _last_write_time.get(cid, 0)
     return (now - last) < WRITE_COOLDOWN
 
 
 def _mark_written(customer_id):
     """Record the timestamp of the latest write for this customer."""
-    _last_write_time[str(customer_id)] = time.time()
+    _last_write_time[str(customer_id)] = get_clock().time()
 
 
-def write_customer_snapshot(customer_id):
+def write_customer_snapshot(customer_id, profile=None):
     """
     Build and append a behavioural snapshot row for a customer.
     Pulls real-time features from Redis + static data from customers.csv.
     Skips if the same customer was written within the last 5 minutes.
+
+    Callers that already hold the profile (the feature update) pass it in
+    to skip the extra read.
     """
     cid = str(customer_id)
 
     # ── Deduplication check ──
     if _is_duplicate(cid):
+        get_metrics().inc("snapshots_skipped")
         return False
+    t0 = time.perf_counter()
 
     # ── Ensure CSV exists ──
     _ensure_csv_exists()
 
-    # ── Pull real-time data from Redis ──
-    key = f"customer:{cid}"
-    profile = r.hgetall(key)
+    # ── Pull real-time data from the feature store ──
+    if profile is None:
+        profile = decode_profile(get_store().get(cid))
 
     if not profile:
         return False
@@ -125,9 +137,11 @@ def write_customer_snapshot(customer_id):
     risk_level = profile.get("risk_level", "UNKNOWN")
     risk_score = profile.get("risk_score", "0")
     hardship_type = profile.get("hardship_type", "NONE")
-    last_salary_ts = profile.get("last_salary_ts", "")
+    last_salary_ts = profile.get("last_salary_date", "")
 
     # ── Compute derived features ──
+    clock_now = get_clock().now()
+
     # Essential & discretionary spend ratios
     total_categorized = essential_spend + discretionary_spend
     essential_ratio = round(essential_spend / total_categorized, 4) if total_categorized > 0 else 0.0
@@ -138,12 +152,12 @@ def write_customer_snapshot(customer_id):
     if last_salary_ts and last_salary_ts.strip():
         try:
             last_salary_dt = datetime.strptime(last_salary_ts.split(".")[0], "%Y-%m-%d %H:%M:%S")
-            days_since_salary = (datetime.now() - last_salary_dt).days
+            days_since_salary = (clock_now - last_salary_dt).days
         except (ValueError, IndexError):
             days_since_salary = -1
 
     # ── Static data from customers.csv ──
-    static = _customer_static.get(cid, {})
+    static = _load_static_data().get(cid, {})
     emi_amount = static.get("emi_amount", 0)
     account_balance = static.get("initial_balance", 0)
 
@@ -152,7 +166,7 @@ def write_customer_snapshot(customer_id):
     loan_from_other_banks = 0
 
     # ── Build the row ──
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    now = clock_now.strftime("%Y-%m-%d %H:%M:%S")
 
     row = [
         cid,                        # customer_id
@@ -181,6 +195,9 @@ def write_customer_snapshot(customer_id):
 
         _mark_written(cid)
         print(f"  [Snapshot] Wrote snapshot for customer {cid} | Risk: {risk_level} | Score: {risk_score}")
+        metrics = get_metrics()
+        metrics.observe("snapshot", time.perf_counter() - t0)
+        metrics.inc("snapshots_written")
         return True
 
     except Exception as e:
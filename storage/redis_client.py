@@ -0,0 +1,132 @@
+"""
+Equilibrate — Shared Redis Connection Factory
+Every process gets its Redis client from here instead of constructing
+redis.Redis(host="localhost", port=6379) itself.
+
+  * One ConnectionPool per process (per decode mode), created on first use
+  * TCP keepalive + connect/read timeouts
+  * hiredis reply parser when installed (parser = auto | hiredis | python)
+  * Unix-socket endpoint for co-located deployments (redis.unix_socket)
+
+Configuration (env var overrides config/equilibrate.json, see settings.py):
+  EQ_REDIS_HOST, EQ_REDIS_PORT, EQ_REDIS_DB, EQ_REDIS_PASSWORD,
+  EQ_REDIS_UNIX_SOCKET, EQ_REDIS_MAX_CONNECTIONS, EQ_REDIS_SOCKET_TIMEOUT,
+  EQ_REDIS_SOCKET_CONNECT_TIMEOUT, EQ_REDIS_SOCKET_KEEPALIVE,
+  EQ_REDIS_HEALTH_CHECK_INTERVAL, EQ_REDIS_PARSER
+
+Usage:
+    from redis_client import get_redis
+    r = get_redis()                         # str replies
+    rb = get_redis(decode_responses=False)  # bytes replies
+"""
+import os
+import socket
+import sys
+
+import redis
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "config"))
+
+from settings import get_setting
+
+# ── One pool per decode mode: {decode_responses: ConnectionPool} ──
+_pools = {}
+_clients = {}
+
+
+def _parser_class(name):
+    """Resolve the reply parser class across redis-py 4.x / 5.x layouts."""
+    if name == "auto":
+        return None  # redis-py picks hiredis automatically when available
+    candidates = {
+        "hiredis": ("_HiredisParser", "HiredisParser"),
+        "python": ("_RESP2Parser", "PythonParser"),
+    }.get(name, ())
+    for module_name in ("redis._parsers", "redis.connection"):
+        module = sys.modules.get(module_name)
+        if module is None:
+            try:
+                module = __import__(module_name, fromlist=["_"])
+            except ImportError:
+                continue
+        for attr in candidates:
+            parser = getattr(module, attr, None)
+            if parser is not None:
+                return parser
+    print(f"  [Redis] Warning: parser '{name}' unavailable, using default")
+    return None
+
+
+def _keepalive_options():
+    """TCP keepalive tuning, where the platform exposes the socket options."""
+    options = {}
+    for name, value in (("TCP_KEEPIDLE", 60), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3)):
+        opt = getattr(socket, name, None)
+        if opt is not None:
+            options[opt] = value
+    return options
+
+
+def connection_kwargs():
+    """Connection settings shared by every pool, resolved from config."""
+    kwargs = {
+        "db": get_setting("redis", "db", 0),
+        "password": get_setting("redis", "password", "") or None,
+        "socket_timeout": get_setting("redis", "socket_timeout", 5.0),
+        "socket_connect_timeout": get_setting("redis", "socket_connect_timeout", 2.0),
+        "health_check_interval": get_setting("redis", "health_check_interval", 30),
+    }
+    unix_socket = get_setting("redis", "unix_socket", "")
+    if unix_socket:
+        kwargs["path"] = unix_socket
+        kwargs["connection_class"] = redis.UnixDomainSocketConnection
+    else:
+        kwargs["host"] = get_setting("redis", "host", "localhost")
+        kwargs["port"] = get_setting("redis", "port", 6379)
+        if get_setting("redis", "socket_keepalive", True):
+            kwargs["socket_keepalive"] = True
+            kwargs["socket_keepalive_options"] = _keepalive_options()
+
+    parser = _parser_class(get_setting("redis", "parser", "auto"))
+    if parser is not None:
+        kwargs["parser_class"] = parser
+    return kwargs
+
+
+def get_pool(decode_responses=True):
+    """Return the process-wide ConnectionPool, creating it on first use."""
+    pool = _pools.get(decode_responses)
+    if pool is None:
+        pool = redis.ConnectionPool(
+            max_connections=get_setting("redis", "max_connections", 64),
+            decode_responses=decode_responses,
+            **connection_kwargs(),
+        )
+        _pools[decode_responses] = pool
+    return pool
+
+
+def get_redis(decode_responses=True):
+    """Return the shared Redis client for this process."""
+    client = _clients.get(decode_responses)
+    if client is None:
+        client = redis.Redis(connection_pool=get_pool(decode_responses))
+        _clients[decode_responses] = client
+    return client
+
+
+def describe_endpoint():
+    """Human-readable endpoint string for startup banners."""
+    unix_socket = get_setting("redis", "unix_socket", "")
+    if unix_socket:
+        return f"unix://{unix_socket}"
+    return f"{get_setting('redis', 'host', 'localhost')}:{get_setting('redis', 'port', 6379)}"
+
+
+def close_pools():
+    """Disconnect all pooled connections (e.g. at shutdown or in a forked child)."""
+    for pool in _pools.values():
+        pool.disconnect()
+    _pools.clear()
+    _clients.clear()
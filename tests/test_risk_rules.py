@@ -0,0 +1,100 @@
+"""
+Equilibrate — Risk Rule Compiler Tests
+The scalar and NumPy evaluators compiled from one rule file must agree.
+
+Run:  python -m pytest -q tests
+"""
+import json
+import os
+import random
+import sys
+
+import pandas as pd
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "risk"))
+
+from risk_rules import RULES_PATH, RuleError, RuleSet, evaluate, evaluate_arrays
+
+PERSONAS = ["INCOME_SHOCK", "SILENT_DRAIN", "OVERSPENDER", "STABLE", "UNKNOWN"]
+
+
+def random_profiles(n=5000, seed=7):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        essential = rng.choice([0.0, 1000.0, rng.uniform(0, 5000)])
+        discretionary = rng.choice([0.0, 250.0, rng.uniform(0, 8000)])
+        rows.append({
+            "salary_count": rng.choice([0, 0, 1, 2]),
+            "days_since_salary": rng.choice([-1, 30, 31, 45, 46, rng.randint(0, 90)]),
+            "atm_withdrawals_7d": rng.randint(0, 14),
+            "txn_count": rng.choice([0, 2, 3, 5, 6, 10, 11, 15, rng.randint(0, 40)]),
+            "total_spend": rng.choice([0.0, essential + discretionary]),
+            "essential_spend": essential,
+            "discretionary_spend": discretionary,
+            "spending_change_pct": rng.choice([-20.0, -35.0, -60.0, rng.uniform(-90, 50)]),
+            "persona": rng.choice(PERSONAS),
+        })
+    return rows
+
+
+def assert_paths_agree(rules, rows):
+    df = pd.DataFrame(rows)
+    vector = rules.vector()
+    assert list(vector["classify_hardship_arrays"](df)) == [rules.classify_hardship(r) for r in rows]
+    assert list(vector["risk_score_arrays"](df)) == [rules.risk_score(r) for r in rows]
+
+
+def test_shipped_rules_scalar_matches_vector():
+    with open(RULES_PATH, encoding="utf-8") as f:
+        assert_paths_agree(RuleSet(json.load(f), RULES_PATH), random_profiles())
+
+
+def test_negated_and_combined_conditions_agree():
+    spec = {
+        "min_history": 0,
+        "levels": [{"level": "HIGH", "min_score": 2}],
+        "hardship": [
+            {"type": "A", "when": "not (salary_count == 0) and not (atm_withdrawals_7d >= 4 or txn_count < 5)"},
+            {"type": "B", "when": "not persona in ('STABLE', 'UNKNOWN') and total_spend / txn_count > 300"},
+        ],
+        "score": [
+            {"signal": "s", "rules": [
+                {"when": "not (days_since_salary > 30) or -spending_change_pct > 40", "points": 1.5},
+            ]},
+            {"signal": "t", "rules": [{"when": "score >= 1 and not (essential_spend == 0)", "points": 1}]},
+        ],
+    }
+    assert_paths_agree(RuleSet(spec), random_profiles())
+
+
+@pytest.mark.parametrize("when", [
+    "not salary_count",
+    "salary_count and txn_count > 3",
+    "txn_count > 3 or essential_spend",
+    "persona",
+])
+def test_non_boolean_operands_are_rejected(when):
+    with pytest.raises(RuleError, match="not a comparison"):
+        RuleSet({"hardship": [{"type": "X", "when": when}]})
+
+
+def test_hardship_cleared_at_the_rule_files_default_level():
+    spec = {
+        "levels": [{"level": "RED", "min_score": 2}],
+        "default_level": "GREEN",
+        "default_hardship": "NO_HARDSHIP",
+        "hardship": [{"type": "BUSY", "when": "txn_count >= 5"}],
+        "score": [{"signal": "s", "rules": [{"when": "atm_withdrawals_7d >= 4", "points": 2}]}],
+    }
+    rules = RuleSet(spec)
+    rows = random_profiles(2000)
+    arrays = evaluate_arrays(pd.DataFrame(rows), rules)
+    for i, row in enumerate(rows):
+        result = evaluate(row, rules)
+        assert result["risk_level"] == arrays["risk_level"][i]
+        assert result["hardship_type"] == arrays["hardship_type"][i]
+        expected = "BUSY" if result["risk_level"] == "RED" and row["txn_count"] >= 5 else "NO_HARDSHIP"
+        assert result["hardship_type"] == expected
@@ -0,0 +1,45 @@
+"""
+Equilibrate — Trace Report Smoke Test
+Runs benchmarks/trace_report.py's entry point in a fresh interpreter, so
+its own sys.path setup is what resolves load_traces()'s imports, against
+fakeredis holding a few recorded traces.
+
+Run:  python -m pytest -q tests
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = r"""
+import sys
+sys.path.insert(0, {benchmarks!r})
+sys.argv = ["trace_report.py", "--last", "5"]
+
+import fakeredis
+import trace_report
+import redis_client
+from tracing import HOPS, Tracer
+
+fake = fakeredis.FakeRedis(decode_responses=True)
+redis_client.get_redis = lambda decode_responses=True: fake
+tracer = Tracer(client=fake)
+for i in range(8):
+    for n, hop in enumerate(HOPS):
+        tracer.record(f"t{{i}}", hop, at=1000.0 + i + 0.01 * n, customer_id=str(i))
+tracer.flush()
+trace_report.main()
+"""
+
+
+def test_trace_report_runs():
+    pytest.importorskip("fakeredis")
+    script = SCRIPT.format(benchmarks=os.path.join(BASE_DIR, "benchmarks"))
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=60,
+                            cwd=BASE_DIR)
+    assert result.returncode == 0, result.stderr
+    assert "5 traces, 5 reached the dashboard" in result.stdout
+    assert "emit -> decode" in result.stdout